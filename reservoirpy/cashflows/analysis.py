@@ -171,13 +171,9 @@ def timevalue(cflo, prate, base_date=0, utility=None):
     if not isinstance(prate, pd.Series):
         raise TypeError("`prate` must be a pandas.Series")
     verify_period_range(cflo + [prate])
-    retval = pd.Series([0] * len(cflo), dtype=np.float64)
-    factor = to_discount_factor(prate=prate, base_date=base_date)
-    for index, xcflo in enumerate(cflo):
-        netval = 0
-        for time, _ in enumerate(xcflo):
-            netval += xcflo[time] * factor[time]
-        retval[index] = netval
+    factor = np.asarray(to_discount_factor(prate=prate, base_date=base_date))
+    values = np.vstack([np.asarray(xcflo, dtype=np.float64) for xcflo in cflo])
+    retval = pd.Series(values @ factor, dtype=np.float64)
     if len(retval) == 1:
         return retval[0]
     return retval
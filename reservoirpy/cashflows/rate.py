@@ -20,6 +20,8 @@ In addition, it is possible to compute discount and compounidng factors.
 
 * ``to_discount_factor``: Returns a list of discount factors calculated as 1 / (1 + r)^(t - t0).
 * ``to_compound_factor``: Returns a list of compounding factors calculated as (1 + r)^(t - t0).
+* ``discount_factor_matrix``: Returns an array of discount factors of constant
+  periodic rates, one row by rate.
 
 
 Finally, also it is possible to compute a fixed equivalent rate given interest
@@ -599,34 +601,45 @@ def to_discount_factor(nrate=None, erate=None, prate=None, base_date=None):
 
     if nrate is not None:
         pyr = getpyr(nrate)
-        prate = nrate.copy()
-        for i,_ in enumerate(nrate):
-            prate[i] = nrate[i] / pyr  # periodic rate
+        prate = nrate / pyr  # periodic rate
 
     if erate is not None:
         pyr = getpyr(erate)
-        prate = erate.copy()
-        for i,_ in enumerate(erate):
-            prate[i] = 100 * (np.power(1 + erate[i]/100, 1. / pyr) - 1) # periodic rate
+        prate = 100 * (np.power(1 + erate/100, 1. / pyr) - 1) # periodic rate
 
     pyr = getpyr(prate)
+    assert base_date is not None, 'base_date must be given'
 
-    factor = [x/100 for x in prate]
-
-    for index, _ in enumerate(factor):
-        if index == 0:
-            factor[0] = 1 / (1 + factor[0])
-        else:
-            factor[index] = factor[index-1] / (1 + factor[index])
+    factor = np.cumprod(1 / (1 + np.asarray(prate, dtype=np.float64) / 100))
 
     if isinstance(base_date, str):
         base_date = pd.Period(base_date, freq=prate.axes[0].freq)
         base_date = period2pos(prate.axes[0], base_date)
 
-    div = factor[base_date]
-    for index, _ in enumerate(factor):
-        factor[index] = factor[index] / div
-    return factor
+    return (factor / factor[base_date]).tolist()
+
+def discount_factor_matrix(prate, nper, base_date=0):
+    """Returns an array of discount factors calculated as 1 / (1 + r)^(t - t0)
+    for constant periodic interest rates, one row by rate.
+
+    Args:
+        prate (float, list): Periodic interest rates.
+        nper (int): Number of periods.
+        base_date (int): basis time.
+
+    Returns:
+        `numpy.ndarray` of shape (rates, nper).
+
+    **Example**
+
+    >>> discount_factor_matrix([0, 10], 3) # doctest: +ELLIPSIS
+    array([[1.        , 1.        , 1.        ],
+           [1.        , 0.9090..., 0.8264...]])
+
+    """
+    prate = np.atleast_1d(np.asarray(prate, dtype=np.float64))
+    time = np.arange(nper, dtype=np.float64) - base_date
+    return np.power(1 + prate[:, np.newaxis] / 100, -time[np.newaxis, :])
 
 def to_compound_factor(nrate=None, erate=None, prate=None, base_date=0):
     """Returns a list of compounding factors calculated as (1 + r)^(t - t0).
@@ -1 +1,2 @@
-from .kr import Kr, KrWaterOil, KrGasOil, kr_curve, sw_denormalize, sw_normalize
\ No newline at end of file
+from .kr import (Kr, KrWaterOil, KrGasOil, kr_curve, kr_curve_jac, kr_curve_deriv, let_curve,
+    let_curve_deriv, kr_table_deriv, kr_fit_batch, sw_denormalize, sw_normalize)
\ No newline at end of file
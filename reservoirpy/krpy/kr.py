@@ -1,8 +1,9 @@
 import pandas as pd 
 import numpy as np
-from scipy.interpolate import interp1d
+from scipy.interpolate import interp1d, PchipInterpolator
 import matplotlib.pyplot as plt
 from scipy.optimize import curve_fit
+from concurrent.futures import ProcessPoolExecutor
 
 
 def kr_curve(sn:np.ndarray, n:float, krend:float) -> np.ndarray:
@@ -24,6 +25,146 @@ def kr_curve(sn:np.ndarray, n:float, krend:float) -> np.ndarray:
     """
     return krend * np.power(sn,n)
 
+def kr_curve_jac(sn:np.ndarray, n:float, krend:float) -> np.ndarray:
+    """kr_curve_jac [Analytic Jacobian of kr_curve with respect to the exponent and end-point]
+
+    Parameters
+    ----------
+    sn : np.ndarray
+        [Saturation Array]
+    n : float
+        [Exponent]
+    krend : float
+        [End-point]
+
+    Returns
+    -------
+    np.ndarray
+        [Array of shape (len(sn),2) with the columns dkr/dn and dkr/dkrend]
+    """
+    sn = np.atleast_1d(sn).astype(float)
+    sn_n = np.power(sn,n)
+
+    #sn^n * ln(sn) tends to 0 when sn -> 0
+    log_sn = np.log(np.where(sn>0,sn,1))
+    return np.stack([krend * sn_n * log_sn, sn_n], axis=1)
+
+def kr_curve_deriv(sn:np.ndarray, n:float, krend:float) -> tuple:
+    """kr_curve_deriv [Corey relative permeability curve and its derivative with respect to the normalized saturation]
+
+    Parameters
+    ----------
+    sn : np.ndarray
+        [Normalized saturation Array]
+    n : float
+        [Exponent]
+    krend : float
+        [End-point]
+
+    Returns
+    -------
+    tuple
+        [Relative permeability curve and dkr/dsn arrays]
+    """
+    sn = np.asarray(sn, dtype=float)
+    kr = krend * np.power(sn,n)
+
+    #sn^(n-1) is infinite at sn=0 when n<1. The derivative is only kept where it is defined
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dkr = n * krend * np.power(sn,n-1)
+    return kr, np.where(np.isfinite(dkr), dkr, 0)
+
+def let_curve(sn:np.ndarray, l:float, e:float, t:float, krend:float) -> np.ndarray:
+    """let_curve [Estimate Relative permeability curve with the LET (Lomeland-Ebeltoft-Thomas) model]
+
+    Parameters
+    ----------
+    sn : np.ndarray
+        [Normalized saturation Array]
+    l : float
+        [L parameter. Shape of the lower part of the curve]
+    e : float
+        [E parameter. Position of the slope of the curve]
+    t : float
+        [T parameter. Shape of the upper part of the curve]
+    krend : float
+        [End-point]
+
+    Returns
+    -------
+    np.ndarray
+        [Relative permeability curve]
+    """
+    sn = np.asarray(sn, dtype=float)
+    a = np.power(sn,l)
+    return krend * a / (a + e * np.power(1-sn,t))
+
+def let_curve_deriv(sn:np.ndarray, l:float, e:float, t:float, krend:float) -> tuple:
+    """let_curve_deriv [LET relative permeability curve and its derivative with respect to the normalized saturation]
+
+    Parameters
+    ----------
+    sn : np.ndarray
+        [Normalized saturation Array]
+    l : float
+        [L parameter]
+    e : float
+        [E parameter]
+    t : float
+        [T parameter]
+    krend : float
+        [End-point]
+
+    Returns
+    -------
+    tuple
+        [Relative permeability curve and dkr/dsn arrays]
+    """
+    sn = np.asarray(sn, dtype=float)
+    a = np.power(sn,l)
+    b = e * np.power(1-sn,t)
+    den = a + b
+    kr = krend * a / den
+
+    #sn^(l-1) is infinite at sn=0 when l<1 and (1-sn)^(t-1) at sn=1 when t<1.
+    #The derivative is only kept where it is defined
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a_1 = np.power(sn,l-1)
+        b_1 = e * np.power(1-sn,t-1)
+
+        # d(a/(a+b)) = (a'b - ab')/(a+b)^2 with a' = l*sn^(l-1) and b' = -t*e*(1-sn)^(t-1)
+        dkr = krend * (l * a_1 * b + t * a * b_1) / np.power(den,2)
+    return kr, np.where(np.isfinite(dkr), dkr, 0)
+
+def kr_table_deriv(s:np.ndarray, s_table:np.ndarray, kr_table:np.ndarray) -> tuple:
+    """kr_table_deriv [Evaluate a tabulated relative permeability curve with a monotone piecewise cubic (PCHIP) interpolation]
+
+    Parameters
+    ----------
+    s : np.ndarray
+        [Saturation Array to evaluate]
+    s_table : np.ndarray
+        [Saturation of the table. Must be increasing]
+    kr_table : np.ndarray
+        [Relative permeability of the table. Must be monotone]
+
+    Returns
+    -------
+    tuple
+        [Relative permeability curve and dkr/ds arrays]
+    """
+    interp = PchipInterpolator(s_table, kr_table, extrapolate=False)
+    return _eval_pchip(interp, s)
+
+def _eval_pchip(interp:PchipInterpolator, s:np.ndarray) -> tuple:
+    """_eval_pchip [Evaluate a PCHIP interpolator and its derivative holding the end values outside the table]"""
+    x = interp.x
+    s = np.asarray(s, dtype=float)
+    s_clip = np.clip(s, x[0], x[-1])
+    kr = interp(s_clip)
+    dkr = np.where(s == s_clip, interp(s_clip, nu=1), 0)
+    return kr, dkr
+
 def sw_normalize(sw:np.ndarray, swir:float, sor:float) -> np.ndarray:
     """sw_normalize [Convert array of water saturation to normalized water saturation]
 
@@ -64,13 +205,132 @@ def sw_denormalize(swn:np.ndarray, swir:float, sor:float) -> np.ndarray:
     sw = swn * (1 - swir - sor) + swir 
     return sw
 
+def _fit_kr_curve(sn:np.ndarray, kr:np.ndarray) -> dict:
+    """_fit_kr_curve [Fit a single Corey curve with the analytic Jacobian and return parameters and diagnostics]"""
+    mask = np.isfinite(sn) & np.isfinite(kr)
+    sn = sn[mask]
+    kr = kr[mask]
+
+    result = {'n':np.nan, 'krend':np.nan, 'n_std':np.nan, 'krend_std':np.nan,
+        'rmse':np.nan, 'r2':np.nan, 'points':sn.shape[0], 'success':False}
+
+    if sn.shape[0] < 2:
+        return result
+
+    p0 = [2, np.clip(kr.max(),1e-3,1)]
+    try:
+        popt, pcov = curve_fit(kr_curve, sn, kr, p0=p0, jac=kr_curve_jac, bounds=([0.01,0], [np.inf, 1]))
+    except (RuntimeError, ValueError):
+        return result
+
+    res = kr - kr_curve(sn,*popt)
+    ss_tot = np.sum(np.power(kr - kr.mean(),2))
+
+    result.update({
+        'n':popt[0],
+        'krend':popt[1],
+        'n_std':np.sqrt(pcov[0,0]),
+        'krend_std':np.sqrt(pcov[1,1]),
+        'rmse':np.sqrt(np.mean(np.power(res,2))),
+        'r2':1 - np.sum(np.power(res,2))/ss_tot if ss_tot > 0 else np.nan,
+        'success':True
+    })
+    return result
+
+def _fit_kr_sample(args) -> dict:
+    """_fit_kr_sample [Fit all the curves of one SCAL sample. Module level to be picklable by the process pool]"""
+    sample, sat, curves, normalize, end_names = args
+
+    smin, smax = sat.min(), sat.max()
+    if normalize and smax > smin:
+        sn = (sat - smin) / (smax - smin)
+    else:
+        sn = sat
+
+    row = {'sample':sample, end_names[0]:smin, end_names[1]:1-smax}
+
+    for phase, kr in curves.items():
+        #The displacing phase follows the normalized saturation, oil follows its complement
+        x = 1 - sn if phase == 'o' else sn
+        fit_result = _fit_kr_curve(x, kr)
+        row[f'n{phase}'] = fit_result['n']
+        row[f'kr{phase}end'] = fit_result['krend']
+        row[f'n{phase}_std'] = fit_result['n_std']
+        row[f'kr{phase}end_std'] = fit_result['krend_std']
+        row[f'rmse_kr{phase}'] = fit_result['rmse']
+        row[f'r2_kr{phase}'] = fit_result['r2']
+        row[f'points_kr{phase}'] = fit_result['points']
+        row[f'success_kr{phase}'] = fit_result['success']
+    return row
+
+def kr_fit_batch(
+    df:pd.DataFrame,
+    sample:str='sample',
+    sat:str='sw',
+    curves:dict={'w':'krw','o':'kro'},
+    end_names:list=['swir','sor'],
+    normalize:bool=True,
+    processes:int=None,
+    chunksize:int=16
+) -> pd.DataFrame:
+    """kr_fit_batch [Fit Corey exponents and end-points for many SCAL samples given in a long-format table]
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        [Long-format table with one row per (sample, saturation) measurement]
+    sample : str, optional
+        [Column name with the sample identifier], by default 'sample'
+    sat : str, optional
+        [Column name with the displacing phase saturation], by default 'sw'
+    curves : dict, optional
+        [Phase letter to column name of the kr measurements. The phase 'o' is fitted
+        against the complement of the normalized saturation], by default {'w':'krw','o':'kro'}
+    end_names : list, optional
+        [Names of the lower and upper saturation end-points], by default ['swir','sor']
+    normalize : bool, optional
+        [Normalize the saturation of each sample with its own end-points], by default True
+    processes : int, optional
+        [Number of worker processes. If 1 the samples are fitted serially], by default None
+    chunksize : int, optional
+        [Samples sent to each worker per task], by default 16
+
+    Returns
+    -------
+    pd.DataFrame
+        [Tidy table indexed by sample with the end-points, fitted parameters, their standard errors
+        and fit diagnostics (rmse, r2, points and success) for every curve]
+    """
+    assert isinstance(df,pd.DataFrame)
+    assert all(i in df.columns for i in [sample,sat] + list(curves.values()))
+    assert len(end_names) == 2
+
+    df_sorted = df.sort_values([sample,sat])
+    tasks = []
+    for s, g in df_sorted.groupby(sample, sort=False):
+        tasks.append((
+            s,
+            g[sat].values.astype(float),
+            {k:g[v].values.astype(float) for (k,v) in curves.items()},
+            normalize,
+            end_names
+        ))
+
+    if processes == 1:
+        rows = [_fit_kr_sample(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            rows = list(executor.map(_fit_kr_sample, tasks, chunksize=chunksize))
+
+    return pd.DataFrame(rows).set_index('sample')
+
 
 class Kr(pd.DataFrame):
     
     def __init__(self, *args, **kwargs):
         wet_col = kwargs.pop("index", 'sw')
         wet = kwargs.pop('wet',None)
-        assert wet_col in ['sw','sl','so']
+        assert wet_col in ['sw','sl','so','sg']
         assert isinstance(wet,(list,np.ndarray,type(None)))
         super().__init__(*args, **kwargs)
                 
@@ -128,6 +388,14 @@ class KrWaterOil:
         self.nw = kwargs.pop('nw',1)
         self.no = kwargs.pop('no',1)
         self.np = kwargs.pop('np',1)
+        self.lw = kwargs.pop('lw',1)
+        self.ew = kwargs.pop('ew',1)
+        self.tw = kwargs.pop('tw',1)
+        self.lo = kwargs.pop('lo',1)
+        self.eo = kwargs.pop('eo',1)
+        self.to = kwargs.pop('to',1)
+        self.model = kwargs.pop('model','corey')
+        self.table = kwargs.pop('table',None)
         self.kr = kwargs.pop('kr', None)
 
     #Properties
@@ -218,32 +486,158 @@ class KrWaterOil:
     @kr.setter
     def kr(self,value):
         if value is not None:
-            assert isinstance(value,kr_df)
+            assert isinstance(value,Kr)
         self._kr = value
 
+    @property
+    def lw(self):
+        return self._lw
+
+    @lw.setter
+    def lw(self,value):
+        assert isinstance(value,(int,float))
+        assert value >= 0
+        self._lw = value
+
+    @property
+    def ew(self):
+        return self._ew
+
+    @ew.setter
+    def ew(self,value):
+        assert isinstance(value,(int,float))
+        assert value > 0
+        self._ew = value
+
+    @property
+    def tw(self):
+        return self._tw
+
+    @tw.setter
+    def tw(self,value):
+        assert isinstance(value,(int,float))
+        assert value >= 0
+        self._tw = value
+
+    @property
+    def lo(self):
+        return self._lo
+
+    @lo.setter
+    def lo(self,value):
+        assert isinstance(value,(int,float))
+        assert value >= 0
+        self._lo = value
+
+    @property
+    def eo(self):
+        return self._eo
+
+    @eo.setter
+    def eo(self,value):
+        assert isinstance(value,(int,float))
+        assert value > 0
+        self._eo = value
+
+    @property
+    def to(self):
+        return self._to
+
+    @to.setter
+    def to(self,value):
+        assert isinstance(value,(int,float))
+        assert value >= 0
+        self._to = value
+
+    @property
+    def model(self):
+        return self._model
+
+    @model.setter
+    def model(self,value):
+        assert value in ['corey','let','table'], "model must be 'corey', 'let' or 'table'"
+        self._model = value
+
+    @property
+    def table(self):
+        return self._table
+
+    @table.setter
+    def table(self,value):
+        #Tabulated curves define the end-points and are interpolated with monotone cubic splines
+        if value is not None:
+            assert isinstance(value,Kr)
+            assert value.index.is_monotonic_increasing, "Water saturation must be increasing"
+            assert value['krw'].is_monotonic_increasing, "krw must be increasing"
+            assert value['kro'].is_monotonic_decreasing, "kro must be decreasing"
+            self.swir = float(value.index.min())
+            self.sor = float(1 - value.index.max())
+            self._table_interp = {i:PchipInterpolator(value.index.values, value[i].values, extrapolate=False) for i in ['krw','kro']}
+        else:
+            self._table_interp = None
+        self._table = value
+
     #Methods
 
+    def evaluate(self, sw) -> dict:
+        """evaluate [Evaluate the relative permeability model and its derivatives with respect to water saturation]
+
+        Parameters
+        ----------
+        sw : np.ndarray
+            [Water saturation Array]
+
+        Returns
+        -------
+        dict
+            [Arrays krw, kro, dkrw and dkro. Derivatives are dkr/dsw and are zero outside the end-points]
+        """
+        sw = np.atleast_1d(sw).astype(float)
+
+        if self.model == 'table':
+            assert self.table is not None, 'table is not defined'
+            krw, dkrw = _eval_pchip(self._table_interp['krw'], sw)
+            kro, dkro = _eval_pchip(self._table_interp['kro'], sw)
+            return {'krw':krw, 'kro':kro, 'dkrw':dkrw, 'dkro':dkro}
+
+        ds = 1 - self.swir - self.sor
+        swn = np.clip(sw_normalize(sw, self.swir, self.sor),0,1)
+        inside = (sw > self.swir) & (sw < 1 - self.sor)
+
+        if self.model == 'corey':
+            krw, dkrw = kr_curve_deriv(swn, self.nw, self.krwend)
+            kro, dkro = kr_curve_deriv(1-swn, self.no, self.kroend)
+        else:
+            krw, dkrw = let_curve_deriv(swn, self.lw, self.ew, self.tw, self.krwend)
+            kro, dkro = let_curve_deriv(1-swn, self.lo, self.eo, self.to, self.kroend)
+
+        #Chain rule dsn/dsw = 1/(1-swir-sor). Oil curve is a function of 1-swn
+        dkrw = np.where(inside, dkrw/ds, 0)
+        dkro = np.where(inside, -dkro/ds, 0)
+
+        return {'krw':krw, 'kro':kro, 'dkrw':dkrw, 'dkro':dkro}
+
     def build_kr(self, n=10):
 
         #Make Normalized Sw and So
         swn = np.linspace(0,1,n)
         son = 1 - swn 
 
+        #Calculate Sw from endpoints
+        sw = sw_denormalize(swn, self.swir, self.sor)
+
         #Calculate Krw, kro  and pc
-        kro = kr_curve(son,self.no,self.kroend)
-        kro = np.append(kro,0)
-        
-        krw = kr_curve(swn,self.nw,self.krwend)
-        krw = np.append(krw,1)
+        kr_eval = self.evaluate(sw)
+
+        kro = np.append(kr_eval['kro'],0)
+        krw = np.append(kr_eval['krw'],1)
         
         pcwo = self.pcend * np.power(son,self.np) 
         pcwo = np.append(pcwo,0)
 
-        #Calculate Sw from endpoints
-        sw = sw_denormalize(swn, self.swir, self.sor)
         sw = np.append(sw,1)
 
-        kr_table = kr_df({
+        kr_table = Kr({
             'sw':sw,
             'krw':krw,
             'kro':kro,
@@ -378,12 +772,15 @@ class KrWaterOil:
         else:
             raise ValueError('kr is not defiend')
 
-    def to_ecl(self):
+    def to_ecl(self, n=None):
         
+        if n is not None:
+            self.build_kr(n=n)
+
         assert self.kr is not None
         string = "SWOF\n"
         
-        string += self.kr.reset_index().to_string(header=False, index=False) +'/\n'
+        string += self.kr[['krw','kro','pcwo']].reset_index().to_string(header=False, index=False) +'/\n'
         
         return string
 
@@ -394,7 +791,7 @@ class KrWaterOil:
         if krw is not None:
             krw_array = df[krw].values
         
-            popt, pcov = curve_fit(kr_curve, sw, krw_array, bounds=([0.01,0], [np.inf, 1]))
+            popt, pcov = curve_fit(kr_curve, sw, krw_array, jac=kr_curve_jac, bounds=([0.01,0], [np.inf, 1]))
             
             print(f'Krw parameters\n-----\n n: {popt[0]}\n krend: {popt[1]}')
             self.nw = popt[0]
@@ -403,12 +800,28 @@ class KrWaterOil:
         if kro is not None:
             kro_array = df[kro].values
         
-            popt, pcov = curve_fit(kr_curve, 1-sw, kro_array, bounds=([0.01,0], [np.inf, 1]))
+            popt, pcov = curve_fit(kr_curve, 1-sw, kro_array, jac=kr_curve_jac, bounds=([0.01,0], [np.inf, 1]))
             
             print(f'Kro parameters\n-----\n n: {popt[0]}\n krend: {popt[1]}')
             self.no = popt[0]
             self.kroend = popt[1]      
 
+    @staticmethod
+    def fit_batch(df:pd.DataFrame, sample:str='sample', sw:str='sw', krw:str='krw', kro:str='kro', **kwargs) -> pd.DataFrame:
+        """fit_batch [Fit water-oil Corey curves for many samples. See kr_fit_batch]
+
+        Returns
+        -------
+        pd.DataFrame
+            [Parameter table. Columns swir, sor, nw, krwend, no and kroend can be passed to KrWaterOil]
+        """
+        curves = {}
+        if krw is not None:
+            curves['w'] = krw
+        if kro is not None:
+            curves['o'] = kro
+        return kr_fit_batch(df, sample=sample, sat=sw, curves=curves, end_names=['swir','sor'], **kwargs)
+
     
 class KrGasOil:
 
@@ -421,6 +834,14 @@ class KrGasOil:
         self.no = kwargs.pop('no',1)
         self.ng = kwargs.pop('ng',1)
         self.np = kwargs.pop('np',1)
+        self.lg = kwargs.pop('lg',1)
+        self.eg = kwargs.pop('eg',1)
+        self.tg = kwargs.pop('tg',1)
+        self.lo = kwargs.pop('lo',1)
+        self.eo = kwargs.pop('eo',1)
+        self.to = kwargs.pop('to',1)
+        self.model = kwargs.pop('model','corey')
+        self.table = kwargs.pop('table',None)
         self.kr = kwargs.pop('kr', None)
 
     #Properties
@@ -514,22 +935,149 @@ class KrGasOil:
             assert isinstance(value,Kr)
         self._kr = value
 
+    @property
+    def lg(self):
+        return self._lg
+
+    @lg.setter
+    def lg(self,value):
+        assert isinstance(value,(int,float))
+        assert value >= 0
+        self._lg = value
+
+    @property
+    def eg(self):
+        return self._eg
+
+    @eg.setter
+    def eg(self,value):
+        assert isinstance(value,(int,float))
+        assert value > 0
+        self._eg = value
+
+    @property
+    def tg(self):
+        return self._tg
+
+    @tg.setter
+    def tg(self,value):
+        assert isinstance(value,(int,float))
+        assert value >= 0
+        self._tg = value
+
+    @property
+    def lo(self):
+        return self._lo
+
+    @lo.setter
+    def lo(self,value):
+        assert isinstance(value,(int,float))
+        assert value >= 0
+        self._lo = value
+
+    @property
+    def eo(self):
+        return self._eo
+
+    @eo.setter
+    def eo(self,value):
+        assert isinstance(value,(int,float))
+        assert value > 0
+        self._eo = value
+
+    @property
+    def to(self):
+        return self._to
+
+    @to.setter
+    def to(self,value):
+        assert isinstance(value,(int,float))
+        assert value >= 0
+        self._to = value
+
+    @property
+    def model(self):
+        return self._model
+
+    @model.setter
+    def model(self,value):
+        assert value in ['corey','let','table'], "model must be 'corey', 'let' or 'table'"
+        self._model = value
+
+    @property
+    def table(self):
+        return self._table
+
+    @table.setter
+    def table(self,value):
+        #Tabulated curves define the end-points and are interpolated with monotone cubic splines
+        if value is not None:
+            assert isinstance(value,Kr)
+            assert value.index.is_monotonic_increasing, "Gas saturation must be increasing"
+            assert value['krg'].is_monotonic_increasing, "krg must be increasing"
+            assert value['kro'].is_monotonic_decreasing, "kro must be decreasing"
+            self.sgc = float(value.index.min())
+            self.slc = float(1 - value.index.max())
+            self._table_interp = {i:PchipInterpolator(value.index.values, value[i].values, extrapolate=False) for i in ['krg','kro']}
+        else:
+            self._table_interp = None
+        self._table = value
+
     #Methods
 
+    def evaluate(self, sg) -> dict:
+        """evaluate [Evaluate the relative permeability model and its derivatives with respect to gas saturation]
+
+        Parameters
+        ----------
+        sg : np.ndarray
+            [Gas saturation Array]
+
+        Returns
+        -------
+        dict
+            [Arrays krg, kro, dkrg and dkro. Derivatives are dkr/dsg and are zero outside the end-points]
+        """
+        sg = np.atleast_1d(sg).astype(float)
+
+        if self.model == 'table':
+            assert self.table is not None, 'table is not defined'
+            krg, dkrg = _eval_pchip(self._table_interp['krg'], sg)
+            kro, dkro = _eval_pchip(self._table_interp['kro'], sg)
+            return {'krg':krg, 'kro':kro, 'dkrg':dkrg, 'dkro':dkro}
+
+        ds = 1 - self.slc - self.sgc
+        sgn = np.clip((sg - self.sgc) / ds,0,1)
+        inside = (sg > self.sgc) & (sg < 1 - self.slc)
+
+        if self.model == 'corey':
+            krg, dkrg = kr_curve_deriv(sgn, self.ng, self.krgend)
+            kro, dkro = kr_curve_deriv(1-sgn, self.no, self.kroend)
+        else:
+            krg, dkrg = let_curve_deriv(sgn, self.lg, self.eg, self.tg, self.krgend)
+            kro, dkro = let_curve_deriv(1-sgn, self.lo, self.eo, self.to, self.kroend)
+
+        #Chain rule dsgn/dsg = 1/(1-slc-sgc). Oil curve is a function of 1-sgn
+        dkrg = np.where(inside, dkrg/ds, 0)
+        dkro = np.where(inside, -dkro/ds, 0)
+
+        return {'krg':krg, 'kro':kro, 'dkrg':dkrg, 'dkro':dkro}
+
     def build_kr(self, n=10):
 
         #Make Normalized Sw and So
         sgn = np.linspace(0,1,n)
-        son = 1 - sgn 
-
-        #Calculate Krw, kro  and pc
-        kro = self.kroend * np.power(son,self.no)
-        krg = self.krgend * np.power(sgn,self.ng)
-        pcgo = self.pcend * np.power(sgn,self.np) 
 
         #Calculate Sg from endpoints
         sg = sgn * (1 - self.slc - self.sgc) + self.sgc
         sl = 1-sg
+
+        #Calculate Krw, kro  and pc
+        kr_eval = self.evaluate(sg)
+        kro = kr_eval['kro']
+        krg = kr_eval['krg']
+        pcgo = self.pcend * np.power(sgn,self.np) 
+
         kr_table = Kr({
             'sl':sl,
             'sg':sg,
@@ -659,12 +1207,15 @@ class KrGasOil:
         else:
             raise ValueError('kr is not defiend')
         
-    def to_ecl(self):
+    def to_ecl(self, n=None):
         
+        if n is not None:
+            self.build_kr(n=n)
+
         assert self.kr is not None
         string = "SGOF\n"
         
-        string += self.kr.reset_index().to_string(header=False, index=False) +'/\n'
+        string += self.kr[['krg','kro','pcgo']].reset_index().to_string(header=False, index=False) +'/\n'
         
         return string
 
@@ -675,17 +1226,33 @@ class KrGasOil:
         if krg is not None:
             krg_array = df[krg].values
         
-            popt, pcov = curve_fit(kr_curve, sg, krg_array, bounds=([0.01,0], [np.inf, 1]))
+            popt, pcov = curve_fit(kr_curve, sg, krg_array, jac=kr_curve_jac, bounds=([0.01,0], [np.inf, 1]))
             
             print(f'Krg parameters\n-----\n n: {popt[0]}\n krend: {popt[1]}')
-            self.nw = popt[0]
+            self.ng = popt[0]
             self.krgend = popt[1]
             
         if kro is not None:
             kro_array = df[kro].values
         
-            popt, pcov = curve_fit(kr_curve, 1-sg, kro_array, bounds=([0.01,0], [np.inf, 1]))
+            popt, pcov = curve_fit(kr_curve, 1-sg, kro_array, jac=kr_curve_jac, bounds=([0.01,0], [np.inf, 1]))
             
             print(f'Kro parameters\n-----\n n: {popt[0]}\n krend: {popt[1]}')
             self.no = popt[0]
-            self.kroend = popt[1]     
\ No newline at end of file
+            self.kroend = popt[1]
+
+    @staticmethod
+    def fit_batch(df:pd.DataFrame, sample:str='sample', sg:str='sg', krg:str='krg', kro:str='kro', **kwargs) -> pd.DataFrame:
+        """fit_batch [Fit gas-oil Corey curves for many samples. See kr_fit_batch]
+
+        Returns
+        -------
+        pd.DataFrame
+            [Parameter table. Columns sgc, slc, ng, krgend, no and kroend can be passed to KrGasOil]
+        """
+        curves = {}
+        if krg is not None:
+            curves['g'] = krg
+        if kro is not None:
+            curves['o'] = kro
+        return kr_fit_batch(df, sample=sample, sat=sg, curves=curves, end_names=['sgc','slc'], **kwargs)
@@ -1,2 +1,3 @@
-from .mbe import OilReservoir,GasReservoir, f, eo, eg, efw,production_mechanisms_plot,ProductionHistory
-from .aquifer import PotAquifer
\ No newline at end of file
+from .mbe import OilReservoir,GasReservoir, f, eo, eg, efw,production_mechanisms_plot,ProductionHistory, mbe_fit_batch, forecast_np_batch, gas_fit_batch
+from .aquifer import (PotAquifer, RadialAquifer, VanEverdingenHurstAquifer, CarterTracyAquifer, FetkovichAquifer,
+    wd_radial, pd_radial, stehfest)
\ No newline at end of file
@@ -1,5 +1,9 @@
 import pandas as pd
 import numpy as np
+from math import factorial
+from functools import lru_cache
+from scipy.special import ive, kve
+from scipy.signal import fftconvolve
 
 class PotAquifer:
     ## Pot aquifer model MBE Tarek Ahmed Reservoir Engineer Handbook
@@ -29,3 +33,349 @@ class PotAquifer:
         return self.k * dp
         
 
+
+
+############################################################
+## Transient aquifers
+## Dimensionless solutions for a radial aquifer are obtained by numerical
+## Laplace inversion (Stehfest) and tabulated once per outer radius ratio
+
+def _stehfest_coefficients(n=12):
+    v = np.zeros(n)
+    half = n//2
+    for i in range(1,n+1):
+        s = 0
+        for k in range((i+1)//2, min(i,half)+1):
+            s += (np.power(k,half)*factorial(2*k)) / (factorial(half-k)*factorial(k)*factorial(k-1)*factorial(i-k)*factorial(2*k-i))
+        v[i-1] = np.power(-1,half+i) * s
+    return v
+
+def stehfest(f, t, n=12):
+    """stehfest [Numerical inversion of a Laplace transform with the Gaver-Stehfest algorithm]
+
+    Parameters
+    ----------
+    f : callable
+        [Laplace space function. It must accept numpy arrays]
+    t : np.ndarray
+        [Times to evaluate]
+    n : int, optional
+        [Number of terms. Must be even], by default 12
+
+    Returns
+    -------
+    np.ndarray
+        [Inverted function at t]
+    """
+    t = np.atleast_1d(t).astype(float)
+    v = _stehfest_coefficients(n)
+    ln2_t = np.log(2) / t
+    s = ln2_t[:,np.newaxis] * np.arange(1,n+1)[np.newaxis,:]
+    return ln2_t * np.sum(v[np.newaxis,:] * f(s), axis=1)
+
+def _laplace_wd(s, red=None):
+    # Cumulative influx of a radial aquifer at constant terminal pressure
+    x = np.sqrt(s)
+    if red is None:
+        return kve(1,x) / (s*x*kve(0,x))
+    y = red*x
+    e = np.exp(2*(x-y))
+    num = ive(1,y)*kve(1,x) - e*kve(1,y)*ive(1,x)
+    den = kve(0,x)*ive(1,y) + e*ive(0,x)*kve(1,y)
+    return num / (s*x*den)
+
+def _laplace_pd(s, red=None):
+    # Pressure of a radial aquifer at constant terminal rate
+    x = np.sqrt(s)
+    if red is None:
+        return kve(0,x) / (s*x*kve(1,x))
+    y = red*x
+    e = np.exp(2*(x-y))
+    num = kve(0,x)*ive(1,y) + e*ive(0,x)*kve(1,y)
+    den = ive(1,y)*kve(1,x) - e*kve(1,y)*ive(1,x)
+    return num / (s*x*den)
+
+_td_table = np.logspace(-4,9,651)
+
+@lru_cache(maxsize=None)
+def _dimensionless_table(kind, red=None):
+    #Tables are computed once for every aquifer type and outer radius ratio
+    if kind == 'wd':
+        values = stehfest(lambda s: _laplace_wd(s,red), _td_table)
+        return _td_table, values, None
+    pd_values = stehfest(lambda s: _laplace_pd(s,red), _td_table)
+    dpd_values = stehfest(lambda s: s*_laplace_pd(s,red), _td_table)
+    return _td_table, pd_values, dpd_values
+
+def _interp_log(td, table, values, small):
+    td = np.atleast_1d(td).astype(float)
+    log_td = np.log(np.clip(td, table[0], table[-1]))
+    out = np.interp(log_td, np.log(table), values)
+    return np.where(td < table[0], small(td), out)
+
+def wd_radial(td, red=None):
+    """wd_radial [Dimensionless cumulative water influx of a radial aquifer (van Everdingen-Hurst)]
+
+    Parameters
+    ----------
+    td : np.ndarray
+        [Dimensionless time]
+    red : float, optional
+        [Ratio of aquifer to reservoir radius. If None the aquifer is infinite], by default None
+
+    Returns
+    -------
+    np.ndarray
+        [Dimensionless cumulative influx]
+    """
+    table, values, _ = _dimensionless_table('wd', red)
+    return _interp_log(td, table, values, lambda t: 2*np.sqrt(np.maximum(t,0)/np.pi))
+
+def pd_radial(td, red=None):
+    """pd_radial [Dimensionless pressure and its time derivative of a radial aquifer at constant terminal rate]
+
+    Parameters
+    ----------
+    td : np.ndarray
+        [Dimensionless time]
+    red : float, optional
+        [Ratio of aquifer to reservoir radius. If None the aquifer is infinite], by default None
+
+    Returns
+    -------
+    tuple
+        [pd and dpd/dtd arrays]
+    """
+    table, pd_values, dpd_values = _dimensionless_table('pd', red)
+    _pd = _interp_log(td, table, pd_values, lambda t: 2*np.sqrt(np.maximum(t,0)/np.pi))
+    _dpd = _interp_log(td, table, dpd_values, lambda t: 1/np.sqrt(np.pi*np.maximum(t,1e-300)))
+    return _pd, _dpd
+
+class RadialAquifer:
+    ## Common parameters of radial aquifers. Field units: k [md], h [ft], re, ra [ft], mu [cP], cw, cf [1/psi], time [days]
+    def __init__(self,**kwargs):
+        self.k = kwargs.pop('k',None)
+        self.h = kwargs.pop('h',None)
+        self.phi = kwargs.pop('phi',None)
+        self.mu = kwargs.pop('mu',1)
+        self.cw = kwargs.pop('cw',3e-6)
+        self.cf = kwargs.pop('cf',0)
+        self.re = kwargs.pop('re',None)
+        self.ra = kwargs.pop('ra',None)
+        self.angle = kwargs.pop('angle',360)
+
+    @property
+    def k(self):
+        return self._k
+
+    @k.setter 
+    def k(self, value):
+        assert isinstance(value,(int, float, type(None))), 'k must be a number'
+        self._k = value
+
+    @property
+    def h(self):
+        return self._h
+
+    @h.setter 
+    def h(self, value):
+        assert isinstance(value,(int, float, type(None))), 'h must be a number'
+        self._h = value
+
+    @property
+    def phi(self):
+        return self._phi
+
+    @phi.setter 
+    def phi(self, value):
+        assert isinstance(value,(int, float, type(None))), 'phi must be a number'
+        self._phi = value
+
+    @property
+    def mu(self):
+        return self._mu
+
+    @mu.setter 
+    def mu(self, value):
+        assert isinstance(value,(int, float)), 'mu must be a number'
+        assert value > 0, 'mu must be greater than 0'
+        self._mu = value
+
+    @property
+    def cw(self):
+        return self._cw
+
+    @cw.setter 
+    def cw(self, value):
+        assert isinstance(value,(int, float)), 'cw must be a number'
+        self._cw = value
+
+    @property
+    def cf(self):
+        return self._cf
+
+    @cf.setter 
+    def cf(self, value):
+        assert isinstance(value,(int, float)), 'cf must be a number'
+        self._cf = value
+
+    @property
+    def re(self):
+        return self._re
+
+    @re.setter 
+    def re(self, value):
+        assert isinstance(value,(int, float, type(None))), 're must be a number'
+        self._re = value
+
+    @property
+    def ra(self):
+        return self._ra
+
+    @ra.setter 
+    def ra(self, value):
+        assert isinstance(value,(int, float, type(None))), 'ra must be a number'
+        self._ra = value
+
+    @property
+    def angle(self):
+        return self._angle
+
+    @angle.setter 
+    def angle(self, value):
+        assert isinstance(value,(int, float)), 'angle must be a number'
+        assert value > 0 and value <= 360, 'angle must be between 0 and 360'
+        self._angle = value
+
+    @property
+    def ct(self):
+        return self.cw + self.cf
+
+    @property
+    def red(self):
+        return None if self.ra is None else self.ra / self.re
+
+    @property
+    def b(self):
+        #Aquifer constant [bbl/psi]
+        return 1.119 * self.phi * self.ct * np.power(self.re,2) * self.h * (self.angle/360)
+
+    def td(self, time):
+        time = np.atleast_1d(time).astype(float)
+        return 0.006328 * self.k * time / (self.phi * self.mu * self.ct * np.power(self.re,2))
+
+    @staticmethod
+    def _check_history(pressure, time):
+        pressure = np.atleast_1d(pressure).astype(float)
+        time = np.atleast_1d(time).astype(float)
+        assert pressure.ndim == 1 and pressure.shape == time.shape, 'pressure and time must be 1D arrays with the same shape'
+        assert np.all(np.diff(time) > 0), 'time must be increasing'
+        return pressure, time - time[0]
+
+class VanEverdingenHurstAquifer(RadialAquifer):
+    ## van Everdingen-Hurst unsteady state model. Reservoir Engineering Handbook Tarek Ahmed 4 Ed. 
+    def we(self, pressure, time):
+        """we [Cumulative water influx by superposition of the dimensionless influx]
+
+        Parameters
+        ----------
+        pressure : np.ndarray
+            [Pressure at the reservoir-aquifer boundary. The first value is the initial pressure]
+        time : np.ndarray
+            [Time of every pressure in days]
+
+        Returns
+        -------
+        np.ndarray
+            [Cumulative water influx in bbl]
+        """
+        pressure, time = self._check_history(pressure, time)
+        n = pressure.shape[0] - 1
+        we = np.zeros(n+1)
+        if n == 0:
+            return we
+
+        # Pressure drops at the begining of every step: dp1=(p0-p1)/2, dpj=(pj-2 - pj)/2
+        p_ext = np.append(pressure[0],pressure)
+        dp = 0.5*(p_ext[:-2] - p_ext[2:])
+        td = self.td(time)
+        dt = np.diff(time)
+
+        if np.allclose(dt, dt[0]):
+            # Uniform steps. The superposition is a convolution solved with FFT
+            wd = wd_radial(np.arange(1,n+1) * td[1], self.red)
+            we[1:] = self.b * fftconvolve(dp, wd)[:n]
+        else:
+            for i in range(1,n+1):
+                we[i] = self.b * np.dot(dp[:i], wd_radial(td[i] - td[:i], self.red))
+        return we
+
+class CarterTracyAquifer(RadialAquifer):
+    ## Carter-Tracy approximation. Reservoir Engineering Handbook Tarek Ahmed 4 Ed. 
+    def we(self, pressure, time):
+        """we [Cumulative water influx with the Carter-Tracy recursion]
+
+        Parameters
+        ----------
+        pressure : np.ndarray
+            [Pressure at the reservoir-aquifer boundary. The first value is the initial pressure]
+        time : np.ndarray
+            [Time of every pressure in days]
+
+        Returns
+        -------
+        np.ndarray
+            [Cumulative water influx in bbl]
+        """
+        pressure, time = self._check_history(pressure, time)
+        td = self.td(time)
+        _pd, _dpd = pd_radial(td, self.red)
+        dp = (pressure[0] - pressure).tolist()
+        td_l, pd_l, dpd_l = td.tolist(), _pd.tolist(), _dpd.tolist()
+        b = self.b
+
+        we = [0.0]
+        for i in range(1,len(td_l)):
+            we.append(we[i-1] + (td_l[i]-td_l[i-1]) * (b*dp[i] - we[i-1]*dpd_l[i]) / (pd_l[i] - td_l[i-1]*dpd_l[i]))
+        return np.array(we)
+
+class FetkovichAquifer(RadialAquifer):
+    ## Fetkovich pseudo steady state model for finite aquifers. Reservoir Engineering Handbook Tarek Ahmed 4 Ed. 
+    @property
+    def wi(self):
+        #Initial volume of water in the aquifer [bbl]
+        return (np.pi*(np.power(self.ra,2)-np.power(self.re,2))*self.h*self.phi/5.615)*(self.angle/360)
+
+    @property
+    def j(self):
+        #Aquifer productivity index [bbl/day/psi]
+        return 0.00708*self.k*self.h*(self.angle/360) / (self.mu*(np.log(self.ra/self.re) - 0.75))
+
+    def we(self, pressure, time):
+        """we [Cumulative water influx with the Fetkovich recursion]
+
+        Parameters
+        ----------
+        pressure : np.ndarray
+            [Pressure at the reservoir-aquifer boundary. The first value is the initial pressure]
+        time : np.ndarray
+            [Time of every pressure in days]
+
+        Returns
+        -------
+        np.ndarray
+            [Cumulative water influx in bbl]
+        """
+        assert self.ra is not None, 'Fetkovich aquifer must be finite. Set ra'
+        pressure, time = self._check_history(pressure, time)
+        pi = pressure[0]
+        wei = self.ct * self.wi * pi
+        decay = (1 - np.exp(-self.j * pi * np.diff(time) / wei)).tolist()
+        p_avg = (0.5*(pressure[:-1] + pressure[1:])).tolist()
+
+        we = [0.0]
+        pa = pi
+        for i in range(len(decay)):
+            we.append(we[i] + (wei/pi) * (pa - p_avg[i]) * decay[i])
+            pa = pi * (1 - we[i+1]/wei)
+        return np.array(we)
@@ -2,14 +2,13 @@ import numpy as np
 import pandas as pd
 from ...pvtpy.black_oil import Oil, Water, Gas 
 from ...krpy import KrWaterOil, KrGasOil
-from ...wellproductivitypy.decline import bsw_to_wor
-from .aquifer import PotAquifer
+from .aquifer import PotAquifer, RadialAquifer
 import matplotlib.pyplot as plt
 import statsmodels.formula.api as smf
-import statsmodels.api as sm
 import json
 import os
 from scipy.optimize import curve_fit, root
+from concurrent.futures import ProcessPoolExecutor
 
 def production_mechanisms_plot(ax=None):
     #Create the Axex
@@ -55,6 +54,184 @@ def eg(boi,bg,bgi):
 def efw(boi,cw,swi,cf,dp):
     return boi*((cw*swi+cf)/(1-swi))*dp
 
+def _sample_parameter(value, n_draws, rng):
+    """_sample_parameter [Return n_draws samples from a scalar, an array of draws or a frozen scipy distribution]"""
+    if hasattr(value,'rvs'):
+        return np.asarray(value.rvs(size=n_draws, random_state=rng), dtype=float)
+    value = np.asarray(value, dtype=float)
+    if value.ndim == 0:
+        return np.full(n_draws, value.item())
+    assert value.shape == (n_draws,), f'Parameter draws must have shape ({n_draws},)'
+    return value
+
+def _cumulative_influx(aquifer, pi, pressure, time=None):
+    """_cumulative_influx [Cumulative water influx at every pressure of a history that starts at pi]"""
+    pressure = np.atleast_1d(pressure).astype(float)
+    if aquifer is None:
+        return np.zeros(pressure.shape)
+    if isinstance(aquifer, PotAquifer):
+        return np.atleast_1d(aquifer.we(pi - pressure)).astype(float)
+    assert time is not None, 'Transient aquifers need the time in days of every pressure'
+    time = np.atleast_1d(time).astype(float)
+    if time[0] == 0:
+        return aquifer.we(pressure, time)
+    return aquifer.we(np.append(pi,pressure), np.append(0,time))[1:]
+
+def _interp_uniform(x, values):
+    """_interp_uniform [Row-wise linear interpolation of values tabulated on a uniform [0,1] grid]"""
+    g = values.shape[1] - 1
+    pos = np.clip(np.nan_to_num(x),0,1)*g
+    i0 = np.minimum(np.floor(pos).astype(int), g-1)
+    w = pos - i0
+    rows = np.arange(values.shape[0])
+    return np.where(np.isnan(x), np.nan, values[rows,i0]*(1-w) + values[rows,i0+1]*w)
+
+def _forecast_np_engine(arrays_list, np_guesses, n_list):
+    """_forecast_np_engine [Material balance forecast for many reservoirs at once. Each pressure step
+    is advanced for all reservoirs with array operations]
+
+    Parameters
+    ----------
+    arrays_list : list
+        [Forecast arrays of each reservoir as returned by OilReservoir._forecast_arrays. All
+        of them must have the same number of pressure steps]
+    np_guesses : list
+        [Np increments used by Tarner's method below the bubble point]
+    n_list : list
+        [Original oil in place of each reservoir]
+
+    Returns
+    -------
+    list
+        [Forecast DataFrame of each reservoir]
+    """
+    assert len(set(a['pressure'].shape for a in arrays_list)) == 1, 'All forecasts must have the same number of pressure steps'
+    stack = lambda k: np.stack([a[k] for a in arrays_list])
+    col = lambda k: np.array([a[k] for a in arrays_list])[:,np.newaxis]
+
+    pressure = stack('pressure')
+    bo, rs, muo = stack('bo'), stack('rs'), stack('muo')
+    bw, cw, muw = stack('bw'), stack('cw'), stack('muw')
+    bg, mug = stack('bg'), stack('mug')
+    winj, we = stack('winj'), stack('we')
+    krw, kro_w, krg_kro = stack('krw'), stack('kro_w'), stack('krg_kro')
+    use_wor = np.array([a['use_wor'] for a in arrays_list])
+    pb, m, cf, swi = col('pb')[:,0], col('m')[:,0], col('cf')[:,0], col('swi')[:,0]
+
+    n_res, n_steps = pressure.shape
+    guesses = np.atleast_1d(np_guesses).astype(float)[np.newaxis,:]
+    guesses_dev = guesses - guesses.mean()
+
+    _sw = np.zeros((n_res,n_steps))
+    _sw[:,0] = swi
+    _so = np.zeros((n_res,n_steps))
+    _so[:,0] = 1 - swi
+    _sg = np.zeros((n_res,n_steps))
+    _np = np.zeros((n_res,n_steps))
+    _wp = np.zeros((n_res,n_steps))
+    _gp = np.zeros((n_res,n_steps))
+    _wor = np.zeros((n_res,n_steps))
+    _gor = np.zeros((n_res,n_steps))
+    _bsw = np.zeros((n_res,n_steps))
+    np_cum = np.zeros(n_res)
+
+    #Terms that do not depend on the saturations are evaluated for all the steps at once
+    dp = np.zeros((n_res,n_steps))
+    dp[:,1:] = pressure[:,:-1] - pressure[:,1:]
+    _eo = np.zeros((n_res,n_steps))
+    _eo[:,1:] = eo(bo[:,1:],bo[:,:-1],rs[:,1:],rs[:,:-1],bg[:,1:])
+    _eg = np.zeros((n_res,n_steps))
+    _eg[:,1:] = eg(bo[:,1:],bg[:,1:],bg[:,:-1])
+    num_base = _eo + m[:,np.newaxis]*_eg + we + winj*bw
+    above_pb = pressure >= pb[:,np.newaxis]
+    so_factor = (1-swi)[:,np.newaxis]*(bo/bo[:,0,np.newaxis])
+    mob = (muo*bo)/(mug*bg)
+    wor_any = np.any(use_wor)
+    ss = np.sum(guesses_dev*guesses_dev)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i in range(1,n_steps):
+            # F = N[Eo + m*Eg + Efw] + We + Winj*Bw
+            num = num_base[:,i] + efw(bo[:,i-1],cw[:,i],_sw[:,i-1],cf,dp[:,i])
+            above = above_pb[:,i]
+
+            #Above bubble point
+            if above.any():
+                if wor_any:
+                    _krw = _interp_uniform(_sw[:,i-1], krw)
+                    _kro = _interp_uniform(_sw[:,i-1], kro_w)
+                    bsw = np.where(use_wor & (_krw > 0), 1/(1+((_kro*muw[:,i])/(_krw*muo[:,i]))), 0)
+                    wor = np.where(bsw < 1, bsw/(1-bsw), np.inf)
+                    _bsw[:,i] = np.where(above, bsw, 0)
+                    _wor[:,i] = np.where(above, wor, 0)
+
+                # Np = (num - Wp*Bw)/Bo with Wp = mean(WOR)*Np solved in closed form
+                wor_mean = 0.5*(_wor[:,i] + _wor[:,i-1])
+                np_above = num / (bo[:,i] + wor_mean*bw[:,i])
+                so_above = so_factor[:,i]*(1-(np_cum+np_above))
+
+                _np[:,i] = np.where(above, np_above, 0)
+                _wp[:,i] = np.where(above, wor_mean*np_above, 0)
+                _gp[:,i] = np.where(above, np_above*rs[:,i], 0)
+                _gor[:,i] = np.where(above, rs[:,i], 0)
+                _so[:,i] = np.where(above, so_above, 0)
+                _sw[:,i] = np.where(above, 1-so_above, 0)
+
+            #Below bubble point. Tarners Method
+            # Reservoir Engineering Handbook Tarek Ahmed 4 Ed. pg 843
+            below = ~above
+            if below.any():
+                _bo, _bg, _rs = bo[:,i,np.newaxis], bg[:,i,np.newaxis], rs[:,i,np.newaxis]
+
+                #Gp increment from the volumetric balance for every Np guess
+                gp_guess1 = ((num[:,np.newaxis] - guesses*_bo)/_bg) + guesses*_rs
+
+                #Gp increment from the instantaneous GOR for every Np guess
+                so_guess = so_factor[:,i,np.newaxis]*(1-(np_cum[:,np.newaxis]+guesses))
+                sg_guess = 1 - so_guess - _sw[:,i-1,np.newaxis]
+                kr_ratio = np.stack([_interp_uniform(sg_guess[:,j], krg_kro) for j in range(guesses.shape[1])],axis=1)
+                gor_guess = _rs + kr_ratio*mob[:,i,np.newaxis]
+                gp_guess2 = 0.5*(_gor[:,i-1,np.newaxis]+gor_guess)*guesses
+
+                # Fit both to lines and intersect them
+                b1 = np.sum(guesses_dev*gp_guess1,axis=1)/ss
+                b2 = np.sum(guesses_dev*gp_guess2,axis=1)/ss
+                a1 = gp_guess1.mean(axis=1) - b1*guesses.mean()
+                a2 = gp_guess2.mean(axis=1) - b2*guesses.mean()
+
+                np_below = (a1 - a2)/(b2 - b1)
+                gp_below = a1 + b1*np_below
+
+                so_below = so_factor[:,i]*(1-(np_cum+np_below))
+                sg_below = 1 - so_below - _sw[:,i-1]
+                gor_below = rs[:,i] + _interp_uniform(sg_below, krg_kro)*mob[:,i]
+
+                _np[:,i] = np.where(below, np_below, _np[:,i])
+                _gp[:,i] = np.where(below, gp_below, _gp[:,i])
+                _so[:,i] = np.where(below, so_below, _so[:,i])
+                _sg[:,i] = np.where(below, sg_below, _sg[:,i])
+                _sw[:,i] = np.where(below, _sw[:,i-1], _sw[:,i])
+                _gor[:,i] = np.where(below, gor_below, _gor[:,i])
+
+            np_cum = np_cum + _np[:,i]
+
+    results = []
+    for r,n in enumerate(n_list):
+        results.append(pd.DataFrame(
+            {
+                'np':_np[r].cumsum()*n,
+                'gp':_gp[r].cumsum()*n,
+                'wp':_wp[r].cumsum()*n,
+                'wor':_wor[r],
+                'gor':_gor[r],
+                'bsw':_bsw[r],
+                'sw':_sw[r],
+                'so':_so[r],
+                'sg':_sg[r]}, 
+                index=pressure[r]
+        ))
+    return results
+
 class ProductionHistory(pd.DataFrame):
     def __init__(self, *args, **kwargs):
 
@@ -155,6 +332,7 @@ class OilReservoir:
         assert isinstance(value,(int,float)), "pi must be numeric"
         assert value >= 0, "pi must be equal o greater than 0"
         self._pi = value
+        self._initial_conditions = None
 
     @property
     def n(self):
@@ -195,7 +373,7 @@ class OilReservoir:
 
     @aquifer.setter 
     def aquifer(self,value):
-        assert isinstance(value,(PotAquifer, type(None))), "we must be an aquifer model"
+        assert isinstance(value,(PotAquifer, RadialAquifer, type(None))), "we must be an aquifer model"
         self._aquifer = value
 
     @property
@@ -226,6 +404,7 @@ class OilReservoir:
     def oil(self,value):
         assert isinstance(value,(Oil,type(None))), "oil must be pvtpy.black_oil.oil"
         self._oil = value
+        self._initial_conditions = None
 
     @property
     def gas(self):
@@ -235,6 +414,7 @@ class OilReservoir:
     def gas(self,value):
         assert isinstance(value,(Gas,type(None))), "gas must be pvtpy.black_oil.gas"
         self._gas = value
+        self._initial_conditions = None
 
     @property
     def water(self):
@@ -244,6 +424,33 @@ class OilReservoir:
     def water(self,value):
         assert isinstance(value,(Water,type(None))), "water must be pvtpy.black_oil.water"
         self._water = value
+        self._initial_conditions = None
+
+    @property
+    def initial_conditions(self):
+        """initial_conditions [PVT properties at initial pressure. They are cached and
+        recalculated only when pi, the fluids or their PVT tables change]
+
+        Returns
+        -------
+        dict
+            [boi, rsi and bgi]
+        """
+        key = (
+            self.pi,
+            id(self.oil.pvt) if self.oil is not None else None,
+            id(self.gas.pvt) if self.gas is not None else None
+        )
+        if self._initial_conditions is None or self._initial_conditions['key'] != key:
+            oil_initial_conditions = self.oil.pvt.interpolate(self.pi, property=['bo','rs'])
+            gas_initial_conditions = self.gas.pvt.interpolate(self.pi, property='bg')
+            self._initial_conditions = {
+                'key':key,
+                'boi':oil_initial_conditions['bo'].iloc[0],
+                'rsi':oil_initial_conditions['rs'].iloc[0],
+                'bgi':gas_initial_conditions['bg'].iloc[0]
+            }
+        return self._initial_conditions
 
     def calculate_mbe_parameters(self,**kwargs):
 
@@ -254,61 +461,31 @@ class OilReservoir:
 
         pvt = pd.concat([oil_pvt,gas_pvt,water_pvt],axis=1,ignore_index=False)
 
-        self.production_history[pvt.columns] = pvt
+        self.production_history[pvt.columns] = pvt.values
 
+        #Water influx from the aquifer model when it is not given. Transient aquifers use the 'time' column in days
         if 'we' not in self.production_history.columns:
-            self.production_history['we'] = 0
+            time = self.production_history['time'].values if 'time' in self.production_history.columns else None
+            self.production_history['we'] = _cumulative_influx(self.aquifer, self.pi, self.production_history.index.values, time)
+
+        ph = self.production_history
+        ic = self.initial_conditions
 
         #Calculate rp
-        self.production_history['rp'] = self.production_history['gp']*1000/self.production_history['np']
+        ph['rp'] = ph['gp'].values*1000/ph['np'].values
 
         #Calculate MBE parameters
-        self.production_history['delta_p'] = self.pi - self.production_history.index
-
-        oil_initial_conditions = self.oil.pvt.interpolate(self.pi)
-        gas_initial_conditions = self.gas.pvt.interpolate(self.pi)
-
-        self.production_history['F'] = self.production_history.apply(
-            lambda x: f(
-                x['np'],
-                x['bo'],
-                x['rp'],
-                x['rs'],
-                x['bg'],
-                x['wp'],
-                x['bw']
-            ),
-            axis=1
-        )
-        self.production_history['Eo'] = self.production_history.apply(
-            lambda x: eo(
-                x['bo'],
-                oil_initial_conditions['bo'].iloc[0],
-                x['rs'],
-                oil_initial_conditions['rs'].iloc[0],
-                x['bg']
-            ), axis=1
-        )
-        self.production_history['Eg'] = self.production_history.apply(
-            lambda x: eg(
-                oil_initial_conditions['bo'].iloc[0],
-                x['bg'],
-                gas_initial_conditions['bg'].iloc[0],
-            ),axis=1
-        )
-        self.production_history['Efw'] = self.production_history.apply(
-            lambda x: efw(
-                oil_initial_conditions['bo'].iloc[0],
-                x['cw'],
-                self.swi,
-                self.cf,
-                x['delta_p']
-            ),axis=1
-        )
+        ph['delta_p'] = self.pi - ph.index.values
+
+        #The linear MBE functions are element-wise so they are evaluated over whole columns
+        ph['F'] = f(ph['np'].values, ph['bo'].values, ph['rp'].values, ph['rs'].values,
+            ph['bg'].values, ph['wp'].values, ph['bw'].values)
+        ph['Eo'] = eo(ph['bo'].values, ic['boi'], ph['rs'].values, ic['rsi'], ph['bg'].values)
+        ph['Eg'] = eg(ic['boi'], ph['bg'].values, ic['bgi'])
+        ph['Efw'] = efw(ic['boi'], ph['cw'].values, self.swi, self.cf, ph['delta_p'].values)
 
     def ho_params(self):
-        oil_initial_conditions = self.oil.pvt.interpolate(self.pi)
-        gas_initial_conditions = self.gas.pvt.interpolate(self.pi)
+        ic = self.initial_conditions
         self.production_history['F_div_Eo'] = self.production_history['F']/self.production_history['Eo']
         self.production_history['Eg_div_Eo'] = self.production_history['Eg']/self.production_history['Eo']
         self.production_history['mEg'] = self.m*self.production_history['Eg']
@@ -316,14 +493,13 @@ class OilReservoir:
 
         #terms Havlena & Odeh 
         # #http://www.fekete.com/SAN/WebHelp/FeketeHarmony/Harmony_WebHelp/Content/HTML_Files/Reference_Material/Analysis_Method_Theory/Material_Balance_Theory.htm
-        self.production_history['ho_y'] = (self.production_history['F'] - self.production_history['we']*self.production_history['bo'])/(self.production_history['Eo'] + oil_initial_conditions['bo'].iloc[0]*self.production_history['Efw'])
-        self.production_history['ho_x'] = (self.production_history['Eg'] + gas_initial_conditions['bg'].iloc[0]*self.production_history['Efw'])/(self.production_history['Eo'] + oil_initial_conditions['bo'].iloc[0]*self.production_history['Efw'])
+        self.production_history['ho_y'] = (self.production_history['F'] - self.production_history['we']*self.production_history['bo'])/(self.production_history['Eo'] + ic['boi']*self.production_history['Efw'])
+        self.production_history['ho_x'] = (self.production_history['Eg'] + ic['bgi']*self.production_history['Efw'])/(self.production_history['Eo'] + ic['boi']*self.production_history['Efw'])
 
 
     def fit(self, fit_m=False, m=None, factor=1,**kwargs):
         assert self.production_history is not None
-        oil_initial_conditions = self.oil.pvt.interpolate(self.pi)
-        gas_initial_conditions = self.gas.pvt.interpolate(self.pi)
+        ic = self.initial_conditions
         if fit_m:
             if m is None:
                 def mbe(mbe_parameters,n,m):
@@ -334,7 +510,7 @@ class OilReservoir:
                 popt, pcov = curve_fit(mbe, self.production_history[['Eo','Eg','Efw','we']], self.production_history['F']*factor, bounds=(0, [np.inf, np.inf]),**kwargs)
                 self.n = popt[0]/factor
                 self.m = popt[1]
-                self.g = self.m * self.n * oil_initial_conditions['bo'].iloc[0] / gas_initial_conditions['bg'].iloc[0]
+                self.g = self.m * self.n * ic['boi'] / ic['bgi']
 
                 return pcov
             else:
@@ -346,7 +522,7 @@ class OilReservoir:
                 popt, pcov = curve_fit(mbe, self.production_history[['Eo','Eg','Efw','we']], self.production_history['F']*factor, bounds=(0, np.inf),**kwargs)
                 self.n = popt[0]/factor
                 self.m = m
-                self.g = self.m * self.n * oil_initial_conditions['bo'].iloc[0] / gas_initial_conditions['bg'].iloc[0]
+                self.g = self.m * self.n * ic['boi'] / ic['bgi']
 
                 return pcov
 
@@ -363,17 +539,121 @@ class OilReservoir:
             self.g = 0
             return pcov
 
+    def fit_monte_carlo(self, n_draws=1000, swi=None, cf=None, aquifer_k=None, fit_m=False, m=None, seed=None, drop_nonphysical=True):
+        """fit_monte_carlo [Probabilistic Havlena-Odeh history match. The uncertain parameters are sampled
+        and the linear MBE is solved by least squares for all the draws at once. As in fit, n and m are
+        bounded at zero]
+
+        Parameters
+        ----------
+        n_draws : int, optional
+            [Number of draws], by default 1000
+        swi : float, array or scipy.stats frozen distribution, optional
+            [Initial water saturation. If None the reservoir swi is used], by default None
+        cf : float, array or scipy.stats frozen distribution, optional
+            [Formation compressibility. If None the reservoir cf is used], by default None
+        aquifer_k : float, array or scipy.stats frozen distribution, optional
+            [Pot aquifer constant. If None the 'we' column of the production history is used], by default None
+        fit_m : bool, optional
+            [Include the gas cap in the match. If False m is 0 as in fit], by default False
+        m : float, optional
+            [Known gas cap ratio when fit_m is True. If None m is fitted along with N], by default None
+        seed : int, optional
+            [Seed of the random generator], by default None
+        drop_nonphysical : bool, optional
+            [Drop the draws with a negative aquifer_k or without a positive n. If False they are
+            kept and flagged by the physical column], by default True
+
+        Returns
+        -------
+        pd.DataFrame
+            [One row per draw, indexed by draw, with the sampled parameters, the matched n, m, g,
+            the rmse of F and the physical flag]
+        """
+        assert self.production_history is not None
+        if 'F' not in self.production_history.columns:
+            self.calculate_mbe_parameters()
+
+        rng = np.random.default_rng(seed)
+        ic = self.initial_conditions
+        ph = self.production_history
+
+        _swi = _sample_parameter(self.swi if swi is None else swi, n_draws, rng)
+        _cf = _sample_parameter(self.cf if cf is None else cf, n_draws, rng)
+
+        #Stacked arrays with shape (draws, time)
+        _f = ph['F'].values[np.newaxis,:]
+        _eo = ph['Eo'].values[np.newaxis,:]
+        _eg = ph['Eg'].values[np.newaxis,:]
+        _efw = efw(ic['boi'], ph['cw'].values[np.newaxis,:], _swi[:,np.newaxis], _cf[:,np.newaxis], ph['delta_p'].values[np.newaxis,:])
+
+        if aquifer_k is None:
+            _k = np.full(n_draws, np.nan)
+            _we = ph['we'].values[np.newaxis,:]
+        else:
+            _k = _sample_parameter(aquifer_k, n_draws, rng)
+            _we = _k[:,np.newaxis] * ph['delta_p'].values[np.newaxis,:]
+
+        _y = np.broadcast_to(_f - _we, (n_draws, ph.shape[0]))
+
+        if fit_m and m is None:
+            # F - We = N*(Eo + Efw) + N*m*(Eg + Efw). Linear in a=N and b=N*m
+            _x1 = np.broadcast_to(_eo + _efw, _y.shape)
+            _x2 = np.broadcast_to(_eg + _efw, _y.shape)
+            a11 = np.sum(_x1*_x1,axis=1)
+            a12 = np.sum(_x1*_x2,axis=1)
+            a22 = np.sum(_x2*_x2,axis=1)
+            b1 = np.sum(_x1*_y,axis=1)
+            b2 = np.sum(_x2*_y,axis=1)
+            det = a11*a22 - a12*a12
+            _a = (a22*b1 - a12*b2)/det
+            _b = (a11*b2 - a12*b1)/det
+
+            #Bounded least squares. If the solution is not feasible the best one with a single
+            #coefficient at its bound is taken
+            yy = np.sum(_y*_y,axis=1)
+            a_only = np.maximum(b1/a11, 0)
+            b_only = np.maximum(b2/a22, 0)
+            use_a = (yy - 2*a_only*b1 + a_only*a_only*a11) <= (yy - 2*b_only*b2 + b_only*b_only*a22)
+            feasible = (_a >= 0) & (_b >= 0)
+            _a = np.where(feasible, _a, np.where(use_a, a_only, 0))
+            _b = np.where(feasible, _b, np.where(use_a, 0, b_only))
+            _n = _a
+            with np.errstate(divide='ignore', invalid='ignore'):
+                _m = np.where(_n > 0, _b/_n, np.nan)
+            _pred = _a[:,np.newaxis]*_x1 + _b[:,np.newaxis]*_x2
+        else:
+            _m_value = m if fit_m else 0
+            _m = np.full(n_draws, float(_m_value))
+            _x = np.broadcast_to(_eo + _m_value*_eg + (1+_m_value)*_efw, _y.shape)
+            _n = np.maximum(np.sum(_x*_y,axis=1)/np.sum(_x*_x,axis=1), 0)
+            _pred = _n[:,np.newaxis]*_x
+
+        _rmse = np.sqrt(np.mean(np.power(_y - _pred,2),axis=1))
+
+        draws = pd.DataFrame({
+            'swi':_swi,
+            'cf':_cf,
+            'aquifer_k':_k,
+            'n':_n,
+            'm':_m,
+            'g':_m * _n * ic['boi'] / ic['bgi'],
+            'rmse':_rmse,
+            'physical':(_n > 0) & ~(_k < 0)
+        })
+        draws.index.name = 'draw'
+        if drop_nonphysical:
+            draws = draws[draws['physical']]
+        return draws
+
     def drive_index(self):
 
         assert self.production_history is not None
 
-        oil_initial_conditions = self.oil.pvt.interpolate(self.pi)
-        gas_initial_conditions = self.gas.pvt.interpolate(self.pi)
+        ic = self.initial_conditions
+        ph = self.production_history
 
-        self.production_history['A'] = self.production_history.apply(
-            lambda x: x['np']*(x['bo'] + (x['rp'] - oil_initial_conditions['rs'].iloc[0]) * x['bg']),
-            axis=1
-        )   
+        ph['A'] = ph['np'].values*(ph['bo'].values + (ph['rp'].values - ic['rsi']) * ph['bg'].values)
         
         #Depletion Drive
         self.production_history['DDI'] = (self.n * self.production_history['Eo']) / self.production_history['F'] 
@@ -413,10 +693,9 @@ class OilReservoir:
 
     def ho_mbe(self):
         mod = smf.ols(formula='F ~ Eo_mEg_Efw', data=self.production_history).fit()
-        oil_pvti=self.oil.pvt.interpolate(self.pi)
-        gas_pvti=self.gas.pvt.interpolate(self.pi)
+        ic = self.initial_conditions
         OOIP = round(mod.params['Eo_mEg_Efw']/1e6,2)
-        OGIP = round((self.m*OOIP*1e6*oil_pvti['bo'].iloc[0]/gas_pvti['bg'].iloc[0])/1e9,2)
+        OGIP = round((self.m*OOIP*1e6*ic['boi']/ic['bgi'])/1e9,2)
         print(f"Original Oil In Place {OOIP} MMbbl")
         print(f"Original Gas In Place {OGIP} Bscf")
 
@@ -432,23 +711,25 @@ class OilReservoir:
         self.n = OOIP.item()*1e6,
         self.g = OGIP.item()*1e9,
 
-    def forecast_np(self,pressure, wp=False, winj=0, swi=None, np_max_iter=20,
-        er_np=0.05,start_initial_conditions=True,np_guesses=[1e-4,2e-4,3e-4]):
-        """
-        Make a prediction of Cummulative with a given pressure
-        """
-        
+    def _forecast_arrays(self, pressure, wp=False, winj=0, swi=None, start_initial_conditions=True, kr_points=201, time=None):
+        """_forecast_arrays [Pressure grid, PVT, aquifer and kr arrays used by the forecast engine]"""
         # Assert pressure is One dimession
         assert isinstance(pressure,(int,float,list,np.ndarray))
-        pressure = np.atleast_1d(pressure)
+        pressure = np.atleast_1d(pressure).astype(float)
         assert pressure.ndim==1
+        if time is not None:
+            time = np.atleast_1d(time).astype(float)
+            assert time.shape == pressure.shape, 'time must have the same shape as pressure'
         
         #Add the Initial pressure if forecast start from initial Conditions
         if start_initial_conditions:
             pressure = np.append(pressure,self.pi)
+            time = None if time is None else np.append(time,0)
 
         #Sort Pressure descening order
-        pressure = np.sort(pressure)[::-1]
+        order = np.argsort(pressure)[::-1]
+        pressure = pressure[order]
+        time = None if time is None else time[order]
         
         # Assert all pressure are less than initial pressure
         assert np.all(pressure <= self.pi)
@@ -457,153 +738,66 @@ class OilReservoir:
         if isinstance(winj,np.ndarray):
             assert winj.shape == pressure.shape
         else:
-            winj = np.full(pressure.shape,winj)
-
-        #Interest pressure condictions
-        oil_int = self.oil.pvt.interpolate(pressure)
-        water_int = self.water.pvt.interpolate(pressure)
-        gas_int = self.gas.pvt.interpolate(pressure)
-        water_int['winj'] = winj
-
-        _use_wor = self.kr_wo is not None if wp==True else False
-
-        _sw = self.swi if swi is None else swi
-        _sw = np.zeros(pressure.shape)
-        _sw[0] = self.swi if swi is None else swi
-        _so = np.zeros(pressure.shape)
-        _so[0]=1-_sw[0]
-        _sg = np.zeros(pressure.shape)
-        _np = np.zeros(pressure.shape)
-        _wp = np.zeros(pressure.shape)
-        _gp = np.zeros(pressure.shape)        
-        _wor = np.zeros(pressure.shape)
-        _gor = np.zeros(pressure.shape)
-        _bsw = np.zeros(pressure.shape)
-
-        for i in range(1,len(oil_int)):
-            #Estimate parameters from PVT table at pressure interest
-            bo_p = oil_int['bo'].iloc[i]
-            bo_p_minus_1 = oil_int['bo'].iloc[i-1]
-            bw_p = water_int['bw'].iloc[i]
-            rs_p = oil_int['rs'].iloc[i]
-            rs_p_minus_1 = oil_int['rs'].iloc[i-1]
-            bg_p = gas_int['bg'].iloc[i]
-            mug_p = gas_int['mug'].iloc[i]
-            bg_p_minus_1 = gas_int['bg'].iloc[i-1]
-            cw_p = water_int['cw'].iloc[i]
-            dp = oil_int.index[i]-oil_int.index[i-1]
-            muo_p = oil_int['muo'].iloc[i]
-            muw_p = water_int['muw'].iloc[i]
-
-            #Estimate Linear Form MBE material balance Parameters
-            _eo = eo(bo_p,bo_p_minus_1,rs_p,rs_p_minus_1,bg_p)
-            _eg = eg(bo_p,bg_p,bg_p_minus_1)
-            _efw = efw(bo_p_minus_1,cw_p,_sw[i],self.cf,dp)
-
-            #If aquifer model exist call the method we with parameter dp
-            we = 0 if self.aquifer is None else self.aquifer.we(dp)
-
-            if oil_int.index[i] >= self.oil.pb:
-
-                # Numerator part of the MBE.  F = N[Eo + m*Eg + Efw] + We + Winj*Bw + Ginj*Binj
-                num = (_eo + self.m*_eg + _efw) + we + water_int['winj'].iloc[i]*bw_p
-
-                #If WOR is used 
-                if _use_wor:
-                    kr_int = self.kr_wo.interpolate(_sw[i-1])['krw'].iloc[0]
-                    _kro = kr_int['kro']
-                    _krw = kr_int['krw']
-                    _bsw[i] = 1/(1+((_kro*muw_p)/(_krw*muo_p)))
-                    _wor[i] = bsw_to_wor(_bsw[i])
-
-                    # Guess np with out wor
-                    np_guess = np.zeros(np_max_iter)
-                    np_guess[0] = num / bo_p
-                    np_it = 0
-                    e_np = 0.1
-
-                    while e_np >= er_np and np_it < np_max_iter-1:
-                        wp = np.mean((_wor[i],_wor[i-1]))*(np_guess[np_it])
-                        np_guess[np_it+1] = (num - wp*bw_p)/bo_p
-                        
-                        #Calculate error
-                        e_np = np.abs(np_guess[np_it+1]-np_guess[np_it])/np_guess[np_it+1]
-
-                        np_it+=1
-                    _np[i] = np_guess[np_it]
-                    _wp[i] = wp
-                else:
-                    _np[i] = num / bo_p
-                
-                #Estimate Gp
-                _gp[i] = _np[i] * rs_p
-                _gor[i] = _gp[i]/_np[i]
+            winj = np.full(pressure.shape,winj,dtype=float)
+
+        #PVT at the pressures of interest are pulled once into arrays
+        oil_int = self.oil.pvt.interpolate(pressure, property=['bo','rs','muo'])
+        water_int = self.water.pvt.interpolate(pressure, property=['bw','cw','muw'])
+        gas_int = self.gas.pvt.interpolate(pressure, property=['bg','mug'])
+
+        arrays = {i:oil_int[i].values for i in oil_int.columns}
+        arrays.update({i:water_int[i].values for i in water_int.columns})
+        arrays.update({i:gas_int[i].values for i in gas_int.columns})
+        arrays['pressure'] = pressure
+
+        #Water influx for every pressure step. Volumes are divided by N as the engine works per unit of N
+        we_cum = _cumulative_influx(self.aquifer, self.pi, pressure, time)
+        arrays['we'] = np.append(0,np.diff(we_cum))/self.n
+        arrays['winj'] = winj/self.n
+
+        #Relative permeabilities tabulated once on a uniform saturation grid
+        s_grid = np.linspace(0,1,kr_points)
+        arrays['use_wor'] = self.kr_wo is not None if wp==True else False
+        if arrays['use_wor']:
+            kr_wo = self.kr_wo.evaluate(s_grid)
+            arrays['krw'] = kr_wo['krw']
+            arrays['kro_w'] = kr_wo['kro']
+        else:
+            arrays['krw'] = np.zeros(kr_points)
+            arrays['kro_w'] = np.ones(kr_points)
 
-                #Estimate Saturations
-                _so[i] = (1-_sw[0])*(1-_np.sum())*(bo_p/oil_int['bo'].iloc[0])
-                _sw[i] = 1 - _so[i]
+        if self.kr_go is not None:
+            kr_go = self.kr_go.evaluate(s_grid)
+            with np.errstate(divide='ignore'):
+                arrays['krg_kro'] = np.where(kr_go['kro']>0, kr_go['krg']/np.maximum(kr_go['kro'],1e-300), np.inf)
+        else:
+            arrays['krg_kro'] = np.full(kr_points,np.nan)
 
-            else:
-                lg = len(np_guesses) # Length of np_guesses
-                gp_guess1 = np.zeros(lg)
-                gp_guess2 = np.zeros(lg)
-
-                for j in range(lg):
-
-                    # Tarners Method for Pressure below Bubble Point
-                    # Reservoir Engineering Handbook Tarek Ahmed 4 Ed. pg 843
-                    gp_guess1[j] = (((_eo + self.m*_eg + _efw) + we + water_int['winj'].iloc[i]*bw_p - (_np.sum()+np_guesses[j])*bo_p)/bg_p) + (_np.sum() + np_guesses[j])*rs_p
-                    
-                    #Estimate Saturations
-                    _so_guess = (1-_sw[0])*(1-_np.sum()+np_guesses[j])*(bo_p/oil_int['bo'].iloc[0])
-                    
-                    #Relative Permeability Ratio Krg/kro
-                    kr_ratio = self.kr_go.interpolate(_so_guess)['krg_kro'].iloc[0]
-
-                    #Instantaneus GOR
-                    gor_guess = rs_p + kr_ratio*((muo_p*bo_p)/(mug_p*bg_p))
-
-                    #Estimate Gp
-                    gp_guess2[j] = _gp[i-1] + np.mean(_gor[i-1]+gor_guess)*(np_guesses[j])
-                
-                
-                # Fit 2 lines to a linear equation to solve
-                X_reg = sm.add_constant(np.array(_np.sum() + np_guesses))
-                mod1 = sm.OLS(gp_guess1,X_reg).fit()
-                mod2 = sm.OLS(gp_guess2,X_reg).fit()
+        arrays['pb'] = float(np.atleast_1d(self.oil.pb)[0])
+        arrays['m'] = float(self.m or 0)
+        arrays['cf'] = float(self.cf)
+        arrays['swi'] = float(self.swi if swi is None else swi)
+        return arrays
 
-                mod1_params = mod1.params
-                mod2_params = mod2.params
-                
-                #Build system lilear equations
-                params_stack = np.stack([mod1_params,mod2_params], axis=0)
-                _a = np.stack([params_stack[:,1]*-1,np.ones(2)], axis=1)
-                _b = params_stack[:,0]
-
-                solve_np_gp = np.linalg.solve(_a,_b)
-
-                _np[i] = solve_np_gp[0] - _np[i-1]
-                _gp[i] = solve_np_gp[1] - _gp[i-1]
-                _so[i] = (1-_sw[0])*(1-_np.sum())*(bo_p/oil_int['bo'].iloc[0])
-                _sg[i] = 1 - _so[i] - _sw[i-1]
-                _sw[i] = _sw[i-1]
-                krg_kro = self.kr_go.interpolate(_so[i])['krg_kro'].iloc[0]
-                _gor[i] = rs_p + krg_kro*((muo_p*bo_p)/(mug_p*bg_p))
-
-            _df = pd.DataFrame(
-                {
-                    'np':_np.cumsum()*self.n,
-                    'gp':_gp.cumsum()*self.n,
-                    'wp':_wp.cumsum()*self.n,
-                    'wor':_wor,
-                    'gor':_gor,
-                    'bsw':_bsw,
-                    'sw':_sw,
-                    'so':_so,
-                    'sg':_sg}, 
-                    index=pressure
-            )
-        return _df
+    def forecast_np(self,pressure, wp=False, winj=0, swi=None, np_max_iter=20,
+        er_np=0.05,start_initial_conditions=True,np_guesses=[1e-4,2e-4,3e-4],kr_points=201,time=None):
+        """
+        Make a prediction of Cummulative with a given pressure
+
+        PVT and relative permeabilities are evaluated once into arrays and the
+        steps are solved with array math. Above the bubble point the Np-Wp
+        coupling is solved in closed form, so np_max_iter and er_np are kept
+        only for backwards compatibility. Below the bubble point Tarner's
+        method is applied with the np_guesses increments. Transient aquifers
+        need the time in days of every pressure.
+        """
+        arrays = self._forecast_arrays(pressure, wp=wp, winj=winj, swi=swi,
+            start_initial_conditions=start_initial_conditions, kr_points=kr_points, time=time)
+
+        if np.any(arrays['pressure'] < arrays['pb']):
+            assert self.kr_go is not None, 'kr_go must be defined to forecast below the bubble point'
+
+        return _forecast_np_engine([arrays], np_guesses, [self.n])[0]
 
 class GasReservoir:
     def __init__(self,**kwargs):
@@ -617,7 +811,19 @@ class GasReservoir:
         self.kr_gw = kwargs.pop('kr_gw',None)
         self.k = kwargs.pop('k',0)
         self.phi = kwargs.pop('phi',0)
+        self.production_history = kwargs.pop('production_history',None)
                 
+    # Properties
+    @property
+    def production_history(self):
+        return self._production_history
+
+    @production_history.setter 
+    def production_history(self,value):
+        if value is not None:
+            assert isinstance(value,ProductionHistory)
+        self._production_history = value
+
     # Properties
     @property
     def kr_gw(self):
@@ -626,7 +832,7 @@ class GasReservoir:
     @kr_gw.setter 
     def kr_gw(self,value):
         if value is not None:
-            assert isinstance(value,gas_oil_kr)
+            assert isinstance(value,(KrWaterOil,KrGasOil))
         self._kr_gw = value
 
     @property
@@ -659,6 +865,7 @@ class GasReservoir:
         assert isinstance(value,(int,float)), "pi must be numeric"
         assert value >= 0, "pi must be equal o greater than 0"
         self._pi = value
+        self._initial_conditions = None
 
     @property
     def g(self):
@@ -676,7 +883,7 @@ class GasReservoir:
 
     @aquifer.setter 
     def aquifer(self,value):
-        assert isinstance(value,(pot_aquifer, type(None))), "we must be an aquifer model"
+        assert isinstance(value,(PotAquifer, RadialAquifer, type(None))), "we must be an aquifer model"
         self._aquifer = value
 
     @property
@@ -705,8 +912,9 @@ class GasReservoir:
 
     @gas.setter 
     def gas(self,value):
-        assert isinstance(value,(gas,type(None))), "gas must be pvtpy.black_oil.gas"
+        assert isinstance(value,(Gas,type(None))), "gas must be pvtpy.black_oil.gas"
         self._gas = value
+        self._initial_conditions = None
 
     @property
     def water(self):
@@ -714,9 +922,169 @@ class GasReservoir:
 
     @water.setter 
     def water(self,value):
-        assert isinstance(value,(water,type(None))), "water must be pvtpy.black_oil.water"
+        assert isinstance(value,(Water,type(None))), "water must be pvtpy.black_oil.water"
         self._water = value
 
+    @property
+    def initial_conditions(self):
+        """initial_conditions [Gas properties at initial pressure. They are cached and
+        recalculated only when pi, the gas or its PVT table change]
+
+        Returns
+        -------
+        dict
+            [bgi, zi and pzi]
+        """
+        key = (self.pi, id(self.gas.pvt) if self.gas is not None else None)
+        if self._initial_conditions is None or self._initial_conditions['key'] != key:
+            gas_initial_conditions = self.gas.interpolate_arrays(self.pi, property=['bg','z'])
+            self._initial_conditions = {
+                'key':key,
+                'bgi':gas_initial_conditions['bg'].item(),
+                'zi':gas_initial_conditions['z'].item(),
+                'pzi':self.pi/gas_initial_conditions['z'].item()
+            }
+        return self._initial_conditions
+
+    def _mbe_terms(self, pressure, gp=0, wp=0, we=None, time=None):
+        """_mbe_terms [Havlena-Odeh gas terms over arrays of pressure and cumulative production]"""
+        pressure = np.atleast_1d(pressure).astype(float)
+        ic = self.initial_conditions
+        gas_int = self.gas.interpolate_arrays(pressure, property=['bg','z'])
+        if self.water is not None and self.water.pvt is not None:
+            water_int = self.water.pvt.interpolate(pressure, property=['bw','cw'])
+            bw, cw = water_int['bw'].values, water_int['cw'].values
+        else:
+            bw, cw = np.ones(pressure.shape), np.zeros(pressure.shape)
+
+        if we is None:
+            we = _cumulative_influx(self.aquifer, self.pi, pressure, time)
+
+        delta_p = self.pi - pressure
+        terms = {
+            'bg':gas_int['bg'],
+            'z':gas_int['z'],
+            'pz':pressure/gas_int['z'],
+            'bw':bw,
+            'cw':cw,
+            'we':np.broadcast_to(we,pressure.shape).astype(float),
+            'delta_p':delta_p,
+            'F':gp*gas_int['bg'] + wp*bw,
+            'Eg':gas_int['bg'] - ic['bgi'],
+            'Efw':ic['bgi']*((cw*self.swi + self.cf)/(1-self.swi))*delta_p,
+        }
+        return terms
+
+    def calculate_mbe_parameters(self,**kwargs):
+        """calculate_mbe_parameters [Add p/z and the Havlena-Odeh terms F, Eg and Efw to the production history.
+        Columns: gp [scf], wp [bbl], and optionally we [bbl] and time [days]]"""
+        assert self.production_history is not None
+        ph = self.production_history
+        wp = ph['wp'].values if 'wp' in ph.columns else 0
+        we = ph['we'].values if 'we' in ph.columns else None
+        time = ph['time'].values if 'time' in ph.columns else None
+
+        terms = self._mbe_terms(ph.index.values, gp=ph['gp'].values, wp=wp, we=we, time=time)
+        for (k,v) in terms.items():
+            ph[k] = v
+
+        #Havlena-Odeh straight line F/(Eg+Efw) = G + We/(Eg+Efw)
+        ph['F_div_Et'] = ph['F']/(ph['Eg'] + ph['Efw'])
+        ph['we_div_Et'] = ph['we']/(ph['Eg'] + ph['Efw'])
+
+    def fit(self, factor=1, **kwargs):
+        """fit [Fit G to the Havlena-Odeh equation F = G(Eg + Efw) + We]
+
+        Returns
+        -------
+        np.ndarray
+            [Covariance of the fitted parameter]
+        """
+        assert self.production_history is not None
+        if 'F' not in self.production_history.columns:
+            self.calculate_mbe_parameters()
+
+        def mbe(mbe_parameters,g):
+            f = g*(mbe_parameters['Eg'] + mbe_parameters['Efw']) + mbe_parameters['we']
+            return f.values
+
+        #Start from the closed form least squares solution
+        if 'p0' not in kwargs:
+            et = (self.production_history['Eg'] + self.production_history['Efw']).values
+            y = (self.production_history['F'] - self.production_history['we']).values
+            kwargs['p0'] = [max(np.sum(et*y)/np.sum(et*et),1e-6)*factor]
+
+        popt, pcov = curve_fit(mbe, self.production_history[['Eg','Efw','we']], self.production_history['F']*factor, bounds=(0, np.inf), **kwargs)
+        self.g = popt[0]/factor
+        return pcov
+
+    def pz_fit(self):
+        """pz_fit [Fit the p/z straight line p/z = pi/zi * (1 - Gp/G) of a volumetric reservoir]
+
+        Returns
+        -------
+        dict
+            [Intercept, slope and the original gas in place g]
+        """
+        assert self.production_history is not None
+        if 'pz' not in self.production_history.columns:
+            self.calculate_mbe_parameters()
+        slope, intercept = np.polyfit(self.production_history['gp'].values, self.production_history['pz'].values, 1)
+        self.g = -intercept/slope
+        return {'intercept':intercept, 'slope':slope, 'g':self.g}
+
+    def forecast_gp(self, pressure, wp=0, time=None, start_initial_conditions=True):
+        """forecast_gp [Forecast cumulative gas production over an array of pressures]
+
+        Parameters
+        ----------
+        pressure : list or np.ndarray
+            [Pressures to forecast]
+        wp : float or np.ndarray, optional
+            [Cumulative water production at every pressure in bbl], by default 0
+        time : np.ndarray, optional
+            [Time in days of every pressure. Needed by transient aquifers], by default None
+        start_initial_conditions : bool, optional
+            [Add the initial pressure to the forecast], by default True
+
+        Returns
+        -------
+        pd.DataFrame
+            [gp, rf, pz, z, bg and we indexed by pressure]
+        """
+        assert isinstance(pressure,(int,float,list,np.ndarray))
+        pressure = np.atleast_1d(pressure).astype(float)
+        assert pressure.ndim==1
+        wp = np.broadcast_to(np.atleast_1d(wp).astype(float), pressure.shape)
+        if time is not None:
+            time = np.atleast_1d(time).astype(float)
+            assert time.shape == pressure.shape, 'time must have the same shape as pressure'
+
+        if start_initial_conditions:
+            pressure = np.append(pressure,self.pi)
+            wp = np.append(wp,0)
+            time = None if time is None else np.append(time,0)
+
+        order = np.argsort(pressure)[::-1]
+        pressure = pressure[order]
+        wp = wp[order]
+        time = None if time is None else time[order]
+        assert np.all(pressure <= self.pi)
+
+        terms = self._mbe_terms(pressure, wp=wp, time=time)
+
+        # Gp*Bg + Wp*Bw = G(Eg + Efw) + We
+        gp = (self.g*(terms['Eg'] + terms['Efw']) + terms['we'] - wp*terms['bw'])/terms['bg']
+
+        return pd.DataFrame({
+            'gp':gp,
+            'rf':gp/self.g,
+            'pz':terms['pz'],
+            'z':terms['z'],
+            'bg':terms['bg'],
+            'we':terms['we']
+        }, index=pd.Index(pressure,name='pressure'))
+
     #Methods
     def plot(self,
         ax=None,
@@ -737,11 +1105,8 @@ class GasReservoir:
         #Get the ax
         pzax= ax or plt.gca()
 
-        #Get interpolated pz
-        zi = self.gas.pvt.interpolate(self.pi, property = 'z')
-        
         #get pz
-        pz = self.pi / zi.iloc[0,0]
+        pz = self.initial_conditions['pzi']
 
         #Plot
         pzax.plot([0,self.g/1e6],[pz,0],**pz_kw)
@@ -776,10 +1141,139 @@ class GasReservoir:
             )
 
 
-                
-
-
-                
-
-
-
+def _fit_reservoir(args):
+    """_fit_reservoir [Fit one reservoir. Module level to be picklable by the process pool]"""
+    reservoir, fit_kw = args
+    if 'F' not in reservoir.production_history.columns:
+        reservoir.calculate_mbe_parameters()
+    pcov = reservoir.fit(**fit_kw)
+    return reservoir, np.atleast_2d(pcov)
+
+def mbe_fit_batch(reservoirs, processes=None, chunksize=1, **kwargs):
+    """mbe_fit_batch [History match many reservoirs in a process pool]
+
+    Parameters
+    ----------
+    reservoirs : list or dict
+        [Reservoir objects with a production history and a fit method (OilReservoir, GasReservoir).
+        If a dict is given its keys are used as the index of the result]
+    processes : int, optional
+        [Number of worker processes. If 1 the reservoirs are fitted serially], by default None
+    chunksize : int, optional
+        [Reservoirs sent to each worker per task], by default 1
+    kwargs :
+        [Keyword arguments passed to the fit method of every reservoir]
+
+    Returns
+    -------
+    pd.DataFrame
+        [One row per reservoir with the fitted n, m, g and the standard error of the first fitted
+        parameter. The fitted state is also copied back into the given reservoir objects]
+    """
+    assert isinstance(reservoirs,(list,dict))
+    names = list(reservoirs.keys()) if isinstance(reservoirs,dict) else list(range(len(reservoirs)))
+    res_list = list(reservoirs.values()) if isinstance(reservoirs,dict) else reservoirs
+
+    tasks = [(r,kwargs) for r in res_list]
+    if processes == 1:
+        results = [_fit_reservoir(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_fit_reservoir, tasks, chunksize=chunksize))
+
+    rows = []
+    for name, original, (fitted, pcov) in zip(names, res_list, results):
+        #Workers act on copies. Bring the fitted parameters and MBE columns back
+        original.__dict__.update(fitted.__dict__)
+        rows.append({
+            'reservoir':name,
+            'n':getattr(original,'n',None),
+            'm':getattr(original,'m',None),
+            'g':getattr(original,'g',None),
+            'std':np.sqrt(pcov[0,0])/kwargs.get('factor',1)
+        })
+
+    return pd.DataFrame(rows).set_index('reservoir')
+
+def gas_fit_batch(reservoirs):
+    """gas_fit_batch [Fit G of many gas reservoirs at once. The one parameter Havlena-Odeh
+    least squares F - We = G(Eg + Efw) is solved in closed form for all the tanks]
+
+    Parameters
+    ----------
+    reservoirs : list or dict
+        [GasReservoir objects with production history. If a dict is given its keys are used as index]
+
+    Returns
+    -------
+    pd.DataFrame
+        [One row per reservoir with g, its standard error, the rmse of F and the number of points.
+        The fitted g is also set on every reservoir]
+    """
+    assert isinstance(reservoirs,(list,dict))
+    names = list(reservoirs.keys()) if isinstance(reservoirs,dict) else list(range(len(reservoirs)))
+    res_list = list(reservoirs.values()) if isinstance(reservoirs,dict) else reservoirs
+
+    x_list, y_list = [], []
+    for r in res_list:
+        assert isinstance(r,GasReservoir)
+        if 'F' not in r.production_history.columns:
+            r.calculate_mbe_parameters()
+        ph = r.production_history
+        x_list.append(ph['Eg'].values + ph['Efw'].values)
+        y_list.append(ph['F'].values - ph['we'].values)
+
+    #Ragged histories are padded with zeros, which do not contribute to the sums
+    lengths = np.array([i.shape[0] for i in x_list])
+    x = np.zeros((len(x_list),lengths.max()))
+    y = np.zeros((len(x_list),lengths.max()))
+    for i,(xi,yi) in enumerate(zip(x_list,y_list)):
+        x[i,:xi.shape[0]] = xi
+        y[i,:yi.shape[0]] = yi
+
+    sxx = np.sum(x*x,axis=1)
+    g = np.maximum(np.sum(x*y,axis=1)/sxx,0)
+    sse = np.sum(np.power(y - g[:,np.newaxis]*x,2),axis=1)
+    dof = np.maximum(lengths - 1,1)
+
+    for r,gi in zip(res_list,g):
+        r.g = float(gi)
+
+    return pd.DataFrame({
+        'reservoir':names,
+        'g':g,
+        'std':np.sqrt(sse/dof/sxx),
+        'rmse':np.sqrt(sse/lengths),
+        'points':lengths
+    }).set_index('reservoir')
+
+def forecast_np_batch(reservoirs, pressure, np_guesses=[1e-4,2e-4,3e-4], **kwargs):
+    """forecast_np_batch [Forecast many reservoirs or scenarios simultaneously]
+
+    Parameters
+    ----------
+    reservoirs : list or dict
+        [OilReservoir objects. If a dict is given its keys are used as the first index level]
+    pressure : list or np.ndarray
+        [Pressures to forecast. The same grid is used for every reservoir]
+    np_guesses : list, optional
+        [Np increments used by Tarner's method below the bubble point], by default [1e-4,2e-4,3e-4]
+    kwargs :
+        [wp, winj, swi, start_initial_conditions, kr_points and time as in OilReservoir.forecast_np]
+
+    Returns
+    -------
+    pd.DataFrame
+        [Forecasts indexed by reservoir and pressure]
+    """
+    assert isinstance(reservoirs,(list,dict))
+    names = list(reservoirs.keys()) if isinstance(reservoirs,dict) else list(range(len(reservoirs)))
+    res_list = list(reservoirs.values()) if isinstance(reservoirs,dict) else reservoirs
+
+    arrays_list = [r._forecast_arrays(pressure, **kwargs) for r in res_list]
+    for r, a in zip(res_list, arrays_list):
+        if np.any(a['pressure'] < a['pb']):
+            assert r.kr_go is not None, 'kr_go must be defined to forecast below the bubble point'
+
+    results = _forecast_np_engine(arrays_list, np_guesses, [r.n for r in res_list])
+    return pd.concat(results, keys=names, names=['reservoir','pressure'])
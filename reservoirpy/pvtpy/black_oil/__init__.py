@@ -1,4 +1,4 @@
-from .pvt import Pvt, Oil, Water, properties_df,Chromatography, Gas
+from .pvt import Pvt, Oil, Water, properties_df,Chromatography, Gas, interpolate_arrays, pseudo_pressure_table
 from .correlations import n2_correction, co2_correction, h2s_correction, pb, rs, \
     bo, rho_oil, co, muod, muo,rsw, bw, cw, muw, rhow, rhog, z_factor, bg, eg, critical_properties,\
         critical_properties_correction, cg
\ No newline at end of file
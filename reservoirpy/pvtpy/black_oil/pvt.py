@@ -55,11 +55,89 @@ class Pvt(pd.DataFrame):
         int_df = pd.DataFrame(int_dict, index=p)
         int_df.index.name = 'pressure'
         return int_df 
+
+    def to_arrays(self):
+        """to_arrays [Pvt table as a dictionary of numpy arrays sorted by increasing pressure]
+
+        Returns
+        -------
+        dict
+            [pressure and one array per column]
+        """
+        order = np.argsort(self.index.values)
+        arrays = {'pressure':self.index.values[order].astype(float)}
+        for i in self.columns:
+            arrays[i] = self[i].values[order].astype(float)
+        return arrays
          
     @property   
     def _constructor(self):
         return Pvt
 
+def interpolate_arrays(arrays,value,property=None):
+    """interpolate_arrays [Linear interpolation with linear extrapolation of Pvt arrays. It gives the same
+    values as Pvt.interpolate without building interpolators or DataFrames]
+
+    Parameters
+    ----------
+    arrays : dict
+        [Arrays as returned by Pvt.to_arrays]
+    value : np.ndarray
+        [Pressures to interpolate]
+    property : str or list, optional
+        [Properties to interpolate. If None all are interpolated], by default None
+
+    Returns
+    -------
+    dict
+        [Interpolated arrays with the shape of value]
+    """
+    p = np.asarray(value, dtype=float)
+    xp = arrays['pressure']
+
+    if isinstance(property, str):
+        properties = [property]
+    elif isinstance(property, list):
+        properties = property
+    else:
+        properties = [i for i in arrays if i != 'pressure']
+
+    #Position of every pressure in the table. End segments are used to extrapolate
+    idx = np.clip(np.searchsorted(xp, p) - 1, 0, xp.shape[0] - 2)
+    w = (p - xp[idx]) / (xp[idx+1] - xp[idx])
+
+    int_dict = {}
+    for i in properties:
+        fp = arrays[i]
+        int_dict[i] = fp[idx] + w*(fp[idx+1] - fp[idx])
+    return int_dict
+
+def pseudo_pressure_table(arrays):
+    """pseudo_pressure_table [Real gas pseudo-pressure m(p) = integral of 2p/(mug*z) dp from 0 to p.
+    It is integrated once over the whole table with a cumulative trapezoid]
+
+    Parameters
+    ----------
+    arrays : dict
+        [Arrays as returned by Pvt.to_arrays. Must contain z and mug]
+
+    Returns
+    -------
+    dict
+        [pressure in psi and mp in psi^2/cP sorted by increasing pressure]
+    """
+    assert all(i in arrays for i in ['z','mug']), 'z and mug are needed to estimate the pseudo-pressure'
+    p = arrays['pressure']
+    integrand = 2*p/(arrays['z']*arrays['mug'])
+
+    #The integrand is zero at zero pressure
+    if p[0] > 0:
+        p = np.append(0,p)
+        integrand = np.append(0,integrand)
+
+    mp = np.append(0,np.cumsum(0.5*(integrand[1:] + integrand[:-1])*np.diff(p)))
+    return {'pressure':p, 'mp':mp}
+
 #Default Correlations
 oil_def_corr = {
     'pb':'standing',
@@ -184,6 +262,19 @@ class Oil:
         if value is not None:
             assert isinstance(value,Pvt), f'{type(value)} not accepted. Name must be reservoirpy.pvtpy.black_oil.pvt'
         self._pvt = value
+        self._pvt_arrays = None
+
+    @property
+    def pvt_arrays(self):
+        """pvt_arrays [Pvt table as numpy arrays. They are cached until the pvt table changes]"""
+        assert self.pvt is not None, 'PVT not defined'
+        if self._pvt_arrays is None or self._pvt_arrays[0] is not self._pvt:
+            self._pvt_arrays = (self._pvt, self._pvt.to_arrays())
+        return self._pvt_arrays[1]
+
+    def interpolate_arrays(self, value, property=None):
+        """interpolate_arrays [Interpolate the cached Pvt arrays. See pvtpy.black_oil.interpolate_arrays]"""
+        return interpolate_arrays(self.pvt_arrays, value, property=property)
 
     @property
     def correlations(self):
@@ -375,6 +466,19 @@ class Water:
     def pvt(self,value):
         assert isinstance(value,(Pvt,type(None))), f'{type(value)} not accepted. Name must be reservoirpy.pvtpy.black_oil.pvt'
         self._pvt = value
+        self._pvt_arrays = None
+
+    @property
+    def pvt_arrays(self):
+        """pvt_arrays [Pvt table as numpy arrays. They are cached until the pvt table changes]"""
+        assert self.pvt is not None, 'PVT not defined'
+        if self._pvt_arrays is None or self._pvt_arrays[0] is not self._pvt:
+            self._pvt_arrays = (self._pvt, self._pvt.to_arrays())
+        return self._pvt_arrays[1]
+
+    def interpolate_arrays(self, value, property=None):
+        """interpolate_arrays [Interpolate the cached Pvt arrays. See pvtpy.black_oil.interpolate_arrays]"""
+        return interpolate_arrays(self.pvt_arrays, value, property=property)
 
     @property
     def correlations(self):
@@ -525,6 +629,8 @@ class Gas:
         self.h2s = kwargs.pop('h2s',0)
         self.n2 = kwargs.pop('n2',0)
         self.correlations = kwargs.pop('correlations',gas_def_corr.copy())
+        self._pvt_arrays = None
+        self._pseudo_pressure_table = None
 
 
     #####################################################
@@ -567,6 +673,38 @@ class Gas:
     def pvt(self,value):
         assert isinstance(value,(Pvt,type(None))), 'PVT must be a instance of reservoirpy.pvtpy.black_oil.pvt object'
         self._pvt = value 
+        self._pvt_arrays = None
+        self._pseudo_pressure_table = None
+
+    @property
+    def pvt_arrays(self):
+        """pvt_arrays [Pvt table as numpy arrays. They are cached until the pvt table changes]"""
+        assert self.pvt is not None, 'PVT not defined'
+        if self._pvt_arrays is None or self._pvt_arrays[0] is not self._pvt:
+            self._pvt_arrays = (self._pvt, self._pvt.to_arrays())
+        return self._pvt_arrays[1]
+
+    def interpolate_arrays(self, value, property=None):
+        """interpolate_arrays [Interpolate the cached Pvt arrays. See pvtpy.black_oil.interpolate_arrays]"""
+        return interpolate_arrays(self.pvt_arrays, value, property=property)
+
+    @property
+    def pseudo_pressure_table(self):
+        """pseudo_pressure_table [Cumulative pseudo-pressure table. It is cached until the pvt table changes]"""
+        assert self.pvt is not None, 'PVT not defined'
+        if self._pseudo_pressure_table is None or self._pseudo_pressure_table[0] is not self._pvt:
+            self._pseudo_pressure_table = (self._pvt, pseudo_pressure_table(self.pvt_arrays))
+        return self._pseudo_pressure_table[1]
+
+    def pseudo_pressure(self, value):
+        """pseudo_pressure [Interpolate the pseudo-pressure m(p) in psi^2/cP at any pressure]"""
+        return interpolate_arrays(self.pseudo_pressure_table, value, property='mp')['mp']
+
+    def pseudo_pressure_to_pressure(self, value):
+        """pseudo_pressure_to_pressure [Invert the pseudo-pressure. m(p) is monotonic so the table
+        is interpolated with the axes swapped]"""
+        table = self.pseudo_pressure_table
+        return interpolate_arrays({'pressure':table['mp'],'p':table['pressure']}, value, property='p')['p']
 
     @property
     def chromatography(self):
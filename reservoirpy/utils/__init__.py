@@ -1 +1 @@
-from .formula import intercept_curves, time_normalize, time_normalize_pivot
\ No newline at end of file
+from .formula import intercept_curves, intercept_curves_batch, interp_rows, bracketed_root, time_normalize, time_normalize_pivot
\ No newline at end of file
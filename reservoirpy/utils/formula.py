@@ -1,51 +1,203 @@
 import numpy as np
-from scipy.interpolate import interp1d
+import warnings
 import pandas as pd
 
-def intercept_curves(x1,y1,x2,y2, n=20):
-    x1= np.atleast_1d(x1)
-    x2= np.atleast_1d(x2)
-    y1= np.atleast_1d(y1)
-    y2= np.atleast_1d(y2)
+def _sort_rows(x, y):
+    order = np.argsort(x, axis=-1, kind='stable')
+    return np.take_along_axis(x, order, axis=-1), np.take_along_axis(y, order, axis=-1)
 
-    #Create interpolation objects for both curves
-    curve_inter_1 = interp1d(x1,y1) 
-    curve_inter_2 = interp1d(x2,y2)
+def interp_rows(x, xp, fp):
+    """interp_rows [Row-wise linear interpolation with linear extrapolation from the end segments.
+    Every row of x is interpolated on the same row of xp, fp]
 
-    # Determine x range in the curves
-    mins = np.array([x1.min(),x2.min()])
-    maxs = np.array([x1.max(),x2.max()])
+    Parameters
+    ----------
+    x : np.ndarray
+        [Points of shape (rows, m)]
+    xp : np.ndarray
+        [Increasing abscissas of shape (rows, k)]
+    fp : np.ndarray
+        [Values of shape (rows, k)]
 
-    #lower and upper range
-    lower = mins.max()
-    upper = maxs.min()
+    Returns
+    -------
+    np.ndarray
+        [Interpolated values of shape (rows, m)]
+    """
+    x, xp, fp = np.atleast_2d(x), np.atleast_2d(xp), np.atleast_2d(fp)
+    rows = np.arange(xp.shape[0])[:,np.newaxis]
 
-    x_arr = np.linspace(lower,upper,n)
+    #Shift every row to its own range so a single searchsorted locates the points of all the rows
+    #Non finite points give NaN and do not enter the span
+    values = np.concatenate([xp.ravel(), x.ravel()])
+    values = values[np.isfinite(values)]
+    span = values.max() - values.min() if values.shape[0] > 0 else 0
+    offset = rows * (span + 1)
+    idx = np.searchsorted((xp + offset).ravel(), (x + offset).ravel()).reshape(x.shape) - rows * xp.shape[1]
+    idx = np.clip(idx - 1, 0, xp.shape[1] - 2)
+    x0, x1 = xp[rows, idx], xp[rows, idx+1]
+    y0, y1 = fp[rows, idx], fp[rows, idx+1]
+    return y0 + (x - x0) * (y1 - y0) / (x1 - x0)
 
-    #Interpolate the entire the range for y curves
-    y1_arr = curve_inter_1(x_arr)
-    y2_arr = curve_inter_2(x_arr)
+def intercept_curves_batch(x1, y1, x2, y2, which='last'):
+    """intercept_curves_batch [Exact intersections of many pairs of piecewise linear curves.
+    The difference of two piecewise linear curves is linear between the union of their
+    breakpoints, so every bracket found on that grid holds a single root that is solved
+    exactly. All the pairs are solved at once]
 
-    # make the difference between the y curves and establish the sign
-    y_sign = np.sign(y1_arr - y2_arr)
+    Parameters
+    ----------
+    x1, y1 : np.ndarray
+        [First curves. Shape (k1,) shared by all the pairs or (cases, k1)]
+    x2, y2 : np.ndarray
+        [Second curves. Shape (k2,) or (cases, k2)]
+    which : str, optional
+        ['first' or 'last' intersection when there are many], by default 'last'
 
-    #diferentiate the signs
-    y_dif = np.diff(y_sign)
-    
-    #Find the values is not zero
-    ix = np.where(y_dif!=0)[0]
-    
-    if ix.shape == (0,):
-        idx = 0
-        points = np.zeros((1,2))
+    Returns
+    -------
+    x, y, found : np.ndarray
+        [Intersection of every pair. x and y are NaN where the curves do not intersect]
+    """
+    assert which in ['first','last']
+    x1, y1, x2, y2 = [np.atleast_2d(np.asarray(i, dtype=float)) for i in [x1, y1, x2, y2]]
+    n_cases = max(x1.shape[0], x2.shape[0])
+    x1, y1 = [np.broadcast_to(i, (n_cases, i.shape[1])) for i in _sort_rows(x1, y1)]
+    x2, y2 = [np.broadcast_to(i, (n_cases, i.shape[1])) for i in _sort_rows(x2, y2)]
+
+    #Union of the breakpoints inside the common range
+    lower = np.maximum(x1[:,0], x2[:,0])[:,np.newaxis]
+    upper = np.minimum(x1[:,-1], x2[:,-1])[:,np.newaxis]
+    grid = np.sort(np.concatenate([x1, x2], axis=1), axis=1)
+    grid = np.clip(grid, lower, upper)
+
+    d = interp_rows(grid, x1, y1) - interp_rows(grid, x2, y2)
+
+    #Brackets with a sign change, or nodes where the curves touch
+    d0, d1 = d[:,:-1], d[:,1:]
+    dx = grid[:,1:] - grid[:,:-1]
+    bracket = ((d0 * d1 < 0) | (d0 == 0)) & (dx > 0)
+    #The last node closes the range
+    bracket = np.concatenate([bracket, (d[:,[-1]] == 0)], axis=1)
+
+    found = bracket.any(axis=1)
+    if which == 'first':
+        k = np.argmax(bracket, axis=1)
     else:
-        points = np.zeros((ix.shape[0],2))
-        for i,v in enumerate(ix):
-            points[i,0] = ((x_arr[v+1]-x_arr[v])/(y_sign[v+1]-y_sign[v]))*(-y_sign[v]) + x_arr[v] 
-        
-        points[:,1] = curve_inter_1(points[:,0])
-        idx = 1
-    return points, idx
+        k = bracket.shape[1] - 1 - np.argmax(bracket[:,::-1], axis=1)
+
+    rows = np.arange(n_cases)
+    k_seg = np.minimum(k, d.shape[1] - 2)
+    dk0, dk1 = d[rows, k_seg], d[rows, k_seg+1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = np.where(
+            d[rows, k] == 0,
+            grid[rows, k],
+            grid[rows, k_seg] - dk0 * (grid[rows, k_seg+1] - grid[rows, k_seg]) / (dk1 - dk0)
+        )
+    x = np.where(found, x, np.nan)
+    y = np.full(n_cases, np.nan)
+    if found.any():
+        y[found] = interp_rows(x[found][:,np.newaxis], x1[found], y1[found])[:,0]
+    return x, y, found
+
+def intercept_curves(x1,y1,x2,y2, n=None):
+    """intercept_curves [Intersections of two piecewise linear curves. They are exact; n is
+    deprecated and ignored]
+
+    Returns
+    -------
+    points, idx
+        [Array of shape (intersections, 2) with x and y, and 1 if there are intersections.
+        If there are none, points is a single row of zeros and idx is 0]
+    """
+    if n is not None:
+        warnings.warn('n is deprecated and ignored. The intersections are exact', DeprecationWarning, stacklevel=2)
+    x1, y1 = _sort_rows(np.atleast_1d(np.asarray(x1, dtype=float)), np.atleast_1d(np.asarray(y1, dtype=float)))
+    x2, y2 = _sort_rows(np.atleast_1d(np.asarray(x2, dtype=float)), np.atleast_1d(np.asarray(y2, dtype=float)))
+
+    # Determine x range in the curves
+    lower = max(x1[0], x2[0])
+    upper = min(x1[-1], x2[-1])
+    grid = np.unique(np.concatenate([x1, x2]))
+    grid = grid[(grid >= lower) & (grid <= upper)]
+
+    if grid.shape[0] < 2:
+        return np.zeros((1,2)), 0
+
+    d = np.interp(grid, x1, y1) - np.interp(grid, x2, y2)
+
+    #Nodes where the curves touch and brackets with a sign change
+    roots = list(grid[d == 0])
+    ix = np.where(d[:-1] * d[1:] < 0)[0]
+    roots.extend(grid[ix] - d[ix] * (grid[ix+1] - grid[ix]) / (d[ix+1] - d[ix]))
+
+    if len(roots) == 0:
+        return np.zeros((1,2)), 0
+
+    points = np.zeros((len(roots),2))
+    points[:,0] = np.sort(roots)
+    points[:,1] = np.interp(points[:,0], x1, y1)
+    return points, 1
+
+def bracketed_root(f, a, b, fa=None, fb=None, xtol=1e-6, ftol=1e-8, max_iter=50):
+    """bracketed_root [Vectorized root bracketing with the Illinois variant of regula falsi.
+    Every element keeps its own bracket and stops when it converges, so f is only evaluated
+    on the elements that are still active]
+
+    Parameters
+    ----------
+    f : callable
+        [f(x, idx) returns the function at x for the elements idx]
+    a, b : np.ndarray
+        [Brackets. f(a) and f(b) must have opposite signs]
+    fa, fb : np.ndarray, optional
+        [Function at the brackets if already known], by default None
+
+    Returns
+    -------
+    x, converged : np.ndarray
+        [Roots and convergence flags. Elements without a valid bracket are NaN]
+    """
+    a = np.atleast_1d(np.asarray(a, dtype=float)).copy()
+    b = np.atleast_1d(np.asarray(b, dtype=float)).copy()
+    a, b = np.broadcast_arrays(a, b)
+    a, b = a.copy(), b.copy()
+    all_idx = np.arange(a.shape[0])
+    fa = f(a, all_idx) if fa is None else np.asarray(fa, dtype=float).copy()
+    fb = f(b, all_idx) if fb is None else np.asarray(fb, dtype=float).copy()
+
+    x = np.full(a.shape, np.nan)
+    valid = (fa * fb <= 0)
+    x[valid & (fa == 0)] = a[valid & (fa == 0)]
+    x[valid & (fb == 0)] = b[valid & (fb == 0)]
+    converged = valid & ((fa == 0) | (fb == 0))
+    active = valid & ~converged
+    side = np.zeros(a.shape, dtype=int)
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        idx = np.where(active)[0]
+        c = (a[idx]*fb[idx] - b[idx]*fa[idx]) / (fb[idx] - fa[idx])
+        fc = f(c, idx)
+        x[idx] = c
+
+        #Keep the bracket and halve the value of the retained end (Illinois)
+        left = fa[idx]*fc < 0
+        il, ir = idx[left], idx[~left]
+        b[il], fb[il] = c[left], fc[left]
+        fa[il[side[il] == -1]] *= 0.5
+        side[il] = -1
+        a[ir], fa[ir] = c[~left], fc[~left]
+        fb[ir[side[ir] == 1]] *= 0.5
+        side[ir] = 1
+
+        done = (np.abs(fc) <= ftol) | (np.abs(b[idx] - a[idx]) <= xtol*(1 + np.abs(c)))
+        converged[idx[done]] = True
+        active[idx[done]] = False
+
+    return x, converged
 
 def time_normalize(df):
     assert isinstance(df, pd.DataFrame)
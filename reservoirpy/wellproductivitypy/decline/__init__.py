@@ -1,3 +1,7 @@
-from .declination import forecast_curve, forecast_econlimit, Declination, HybridDeclination
-from .wor import WorDeclination, wor_to_bsw, bsw_to_wor, wor_forecast
-from .dca import DCA
\ No newline at end of file
+from .declination import (forecast_curve, forecast_econlimit, Declination, HybridDeclination,
+    day_offsets, arps_rate, arps_cumulative, arps_time_to_rate, arps_forecast,
+    arps_jacobian, anomaly_mask, decline_fit_batch, arps_switch_time, modified_arps_rate,
+    modified_arps_cumulative, hybrid_forecast)
+from .wor import WorDeclination, wor_to_bsw, bsw_to_wor, wor_forecast, wor_forecast_arrays
+from .dca import DCA
+from .probabilistic import ProbabilisticDeclination, QuantileSketch
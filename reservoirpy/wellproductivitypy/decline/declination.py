@@ -1,13 +1,265 @@
 import pandas as pd
 import numpy as np
 from scipy.optimize import curve_fit
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, timedelta
 import matplotlib.pyplot as plt
 from .dca import DCA
 
+############################################################################################
+# Arps arrays core
+
+def day_offsets(dates, ti):
+  """day_offsets [Days elapsed from ti to each date as int64]
+
+  Parameters
+  ----------
+  dates : [pd.Series, pd.DatetimeIndex, np.ndarray]
+      [Dates]
+  ti : [date]
+      [Reference date]
+
+  Returns
+  -------
+  [np.ndarray]
+      [Day offsets]
+  """
+  dates = pd.DatetimeIndex(dates).values.astype('datetime64[D]')
+  ti = np.datetime64(pd.Timestamp(ti).date(),'D')
+  return (dates - ti).astype(np.int64)
+
+def _arps_params(*params):
+  """_arps_params [Broadcast the curve parameters to one value per curve with a trailing
+  axis for the time, so scalars give (periods,) and arrays give (curves, periods)]"""
+  params = np.broadcast_arrays(*[np.asarray(i,dtype=float) for i in params])
+  if params[0].ndim == 0:
+    return params
+  return [i[...,np.newaxis] for i in params]
+
+def arps_rate(days, qi, di, b):
+  """arps_rate [Arps rate of many curves at once]
+
+  Parameters
+  ----------
+  days : [np.ndarray]
+      [Days elapsed from the date of qi]
+  qi : [float, np.ndarray]
+      [Initial flow]
+  di : [float, np.ndarray]
+      [Anual declination rate]
+  b : [float, np.ndarray]
+      [Arp's parameter. 0 is exponential and 1 harmonic]
+
+  Returns
+  -------
+  [np.ndarray]
+      [Rate. (periods,) for scalar parameters and (curves, periods) for arrays]
+  """
+  qi, di, b = _arps_params(qi, di, b)
+  return _arps_rate(np.asarray(days, dtype=float), qi, di, b)
+
+def _arps_rate(days, qi, di, b):
+  """_arps_rate [arps_rate of parameters already broadcasted]"""
+  d = di/365
+  b_safe = np.where(b == 0, 1, b)
+  with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+    q = np.where(
+      b == 0,
+      qi*np.exp(-d*days),
+      qi/np.power(1+b_safe*d*days,1/b_safe)
+    )
+  return q
+
+def arps_cumulative(days, qi, di, b):
+  """arps_cumulative [Arps closed form cumulative production from the date of qi]
+
+  Parameters
+  ----------
+  days : [np.ndarray]
+      [Days elapsed from the date of qi]
+  qi : [float, np.ndarray]
+      [Initial flow]
+  di : [float, np.ndarray]
+      [Anual declination rate]
+  b : [float, np.ndarray]
+      [Arp's parameter. 0 is exponential and 1 harmonic]
+
+  Returns
+  -------
+  [np.ndarray]
+      [Cumulative production. Same shape as arps_rate]
+  """
+  qi, di, b = _arps_params(qi, di, b)
+  return _arps_cumulative(np.asarray(days, dtype=float), qi, di, b)
+
+def _arps_cumulative(days, qi, di, b):
+  """_arps_cumulative [arps_cumulative of parameters already broadcasted]"""
+  d = di/365
+  d_safe = np.where(d == 0, 1, d)
+  b_hyp = np.where((b == 0) | (b == 1), 0.5, b)
+  with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+    exponential = (qi/d_safe)*(1 - np.exp(-d_safe*days))
+    harmonic = (qi/d_safe)*np.log(1 + d_safe*days)
+    hyperbolic = (qi/((1-b_hyp)*d_safe))*(1 - np.power(1 + b_hyp*d_safe*days,(b_hyp-1)/b_hyp))
+    cum = np.where(b == 0, exponential, np.where(b == 1, harmonic, hyperbolic))
+  return np.where(d == 0, qi*days, cum)
+
+def arps_time_to_rate(q, qi, di, b):
+  """arps_time_to_rate [Days from the date of qi until the rate declines to q]
+
+  Parameters
+  ----------
+  q : [float, np.ndarray]
+      [Rate]
+  qi : [float, np.ndarray]
+      [Initial flow]
+  di : [float, np.ndarray]
+      [Anual declination rate]
+  b : [float, np.ndarray]
+      [Arp's parameter]
+
+  Returns
+  -------
+  [np.ndarray]
+      [Days]
+  """
+  q, qi, di, b = np.broadcast_arrays(*[np.asarray(i,dtype=float) for i in [q, qi, di, b]])
+  d = di/365
+  b_safe = np.where(b == 0, 1, b)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    t = np.where(
+      b == 0,
+      np.log(qi/q)/d,
+      (np.power(qi/q,b_safe) - 1)/(b_safe*d)
+    )
+  return t
+
+def arps_switch_time(di, b, dlim):
+  """arps_switch_time [Days until the decline of a hyperbolic curve, di/(1+b*di*t), falls to
+  dlim. Curves that start below dlim switch at once and exponential curves never switch]
+
+  Parameters
+  ----------
+  di : [float, np.ndarray]
+      [Anual declination rate]
+  b : [float, np.ndarray]
+      [Arp's parameter]
+  dlim : [float, np.ndarray]
+      [Anual declination rate of the exponential tail]
+
+  Returns
+  -------
+  [np.ndarray]
+      [Days]
+  """
+  di, b, dlim = np.broadcast_arrays(*[np.asarray(i,dtype=float) for i in [di, b, dlim]])
+  with np.errstate(divide='ignore', invalid='ignore'):
+    t = np.where(
+      b == 0,
+      np.inf,
+      np.where(di > dlim, (di/dlim - 1)/(b*di/365), 0)
+    )
+  return t
+
+def _modified_arps(days, qi, di, b, dlim):
+  """_modified_arps [Rate and cumulative of modified Arps curves already broadcasted]"""
+  tlim = arps_switch_time(di, b, dlim)
+  tlim_finite = np.where(np.isfinite(tlim), tlim, 0)
+  qlim = _arps_rate(tlim_finite, qi, di, b)
+  cum_lim = _arps_cumulative(tlim_finite, qi, di, b)
+  zero = np.zeros_like(dlim)
+
+  hyperbolic = days < tlim
+  q = np.where(
+    hyperbolic,
+    _arps_rate(days, qi, di, b),
+    _arps_rate(days - tlim_finite, qlim, dlim, zero)
+  )
+  cum = np.where(
+    hyperbolic,
+    _arps_cumulative(days, qi, di, b),
+    cum_lim + _arps_cumulative(days - tlim_finite, qlim, dlim, zero)
+  )
+  return q, cum
+
+def modified_arps_rate(days, qi, di, b, dlim):
+  """modified_arps_rate [Rate of hyperbolic curves that switch to an exponential decline dlim
+  when their decline reaches it (modified Arps). The switch of every curve is a mask, so many
+  curves are evaluated in one broadcast as in arps_rate]
+
+  Parameters
+  ----------
+  days : [np.ndarray]
+      [Days elapsed from the date of qi]
+  qi : [float, np.ndarray]
+      [Initial flow]
+  di : [float, np.ndarray]
+      [Anual declination rate]
+  b : [float, np.ndarray]
+      [Arp's parameter]
+  dlim : [float, np.ndarray]
+      [Anual declination rate of the exponential tail]
+
+  Returns
+  -------
+  [np.ndarray]
+      [Rate. Same shape as arps_rate]
+  """
+  qi, di, b, dlim = _arps_params(qi, di, b, dlim)
+  return _modified_arps(np.asarray(days, dtype=float), qi, di, b, dlim)[0]
+
+def modified_arps_cumulative(days, qi, di, b, dlim):
+  """modified_arps_cumulative [Closed form cumulative of modified Arps curves. See modified_arps_rate]
+
+  Returns
+  -------
+  [np.ndarray]
+      [Cumulative production. Same shape as arps_rate]
+  """
+  qi, di, b, dlim = _arps_params(qi, di, b, dlim)
+  return _modified_arps(np.asarray(days, dtype=float), qi, di, b, dlim)[1]
+
+def arps_forecast(days, qi, di, b, npi=0, dlim=None):
+  """arps_forecast [Rates, period volumes and cumulatives of many Arps curves in one broadcast.
+  Each period goes from one day to the next one, so n days give n-1 periods. The volume is
+  the closed form cumulative between the days of the period]
+
+  Parameters
+  ----------
+  days : [np.ndarray]
+      [int64 days elapsed from the date of qi. (days,) or (curves, days)]
+  qi : [float, np.ndarray]
+      [Initial flow]
+  di : [float, np.ndarray]
+      [Anual declination rate]
+  b : [float, np.ndarray]
+      [Arp's parameter]
+  npi : [float, np.ndarray], optional
+      [Cumulative production at the first day], by default 0
+  dlim : [float, np.ndarray], optional
+      [If given the curves are modified Arps with an exponential tail of decline dlim], by default None
+
+  Returns
+  -------
+  [tuple]
+      [rate at the start of each period, volume and cumulative at the end of each period]
+  """
+  days = np.asarray(days, dtype=float)
+  if dlim is None:
+    qi, di, b = _arps_params(qi, di, b)
+    q = _arps_rate(days[...,:-1], qi, di, b)
+    cum = _arps_cumulative(days, qi, di, b)
+  else:
+    qi, di, b, dlim = _arps_params(qi, di, b, dlim)
+    q, cum = _modified_arps(days, qi, di, b, dlim)
+    q = q[...,:-1]
+  volume = np.diff(cum, axis=-1)
+  cum = cum[...,1:] - cum[...,:1] + _arps_params(npi)[0]
+  return q, volume, cum
+
 ############################################################################################
 # Forecast Function
-def forecast_curve(range_time,qi,di,ti,b,npi=0, gas=False, fluid_rate=None, gor=None, bsw=None):
+def forecast_curve(range_time,qi,di,ti,b,npi=0, gas=False, fluid_rate=None, gor=None, bsw=None, dlim=None):
   """forecast_curve [Estimate a Forecast curve given Decline curve parameters]
 
   Parameters
@@ -26,45 +278,34 @@ def forecast_curve(range_time,qi,di,ti,b,npi=0, gas=False, fluid_rate=None, gor=
       [Initial cumulative production], by default 0
   gas : bool, optional
       [If True the colunm names change], by default False
+  dlim : float, optional
+      [Decline of the exponential tail of a modified Arps curve], by default None
 
   Returns
   -------
   [type]
       [description]
   """
-  ##Convert dates to number for apply regression methods
-
-  days_number = range_time.apply(lambda x: x.toordinal()) 
-  ti_day = ti.toordinal()
-
   #Estimate the difference in days between the dates to forecast and Initial Ti
-     
-  day_diff = days_number-ti_day                          
+  day_diff = day_offsets(range_time, ti)
+
+  q, diff_q, cum = arps_forecast(day_diff, qi, di, b, npi=npi, dlim=dlim)
+  diff_period = np.diff(day_diff)
+  time = pd.DatetimeIndex(range_time)[:-1]
 
-  if b == 0:
-    q = qi*np.exp(-(di/365)*day_diff) 
-  elif (b>0)&(b<=1):
-    q = qi/np.power(1+b*(di/365)*day_diff,1/b)
-
-  #diff_period = np.append(np.array([0]),np.diff(days_number))
-  diff_period = np.diff(days_number,append=0)
-  diff_q = diff_period * q 
-  cum = diff_q.cumsum()
-  cum = cum + npi
-  
   if gas:
     df_dict = {
-      'time':range_time[:-1],
-      'qg':q[:-1],
-      'vg':diff_q[:-1],
-      'gp':cum[:-1],
+      'time':time,
+      'qg':q,
+      'vg':diff_q,
+      'gp':cum,
     }
   else:
     df_dict = {
-          'time':range_time[:-1],
-          'qo':q[:-1],
-          'vo':diff_q[:-1],
-          'np':cum[:-1],
+          'time':time,
+          'qo':q,
+          'vo':diff_q,
+          'np':cum,
     }
   
   #Caculate water rate by providing either fluid rate or bsw. 
@@ -73,25 +314,24 @@ def forecast_curve(range_time,qi,di,ti,b,npi=0, gas=False, fluid_rate=None, gor=
     #If fluid rate and Bsw are provided the 'fluid_rate' parameters has priority
     if fluid_rate is not None:
       qw = fluid_rate - q 
+      diff_qw = diff_period * fluid_rate - diff_q
     elif bsw is not None:
       qw = (bsw*q)/(1-bsw) 
+      diff_qw = (bsw*diff_q)/(1-bsw)
       
-    diff_qw = diff_period * qw
-    cumw = diff_qw.cumsum()
     df_dict.update({
-        'qw':qw[:-1],
-        'vw':diff_qw[:-1],
-        'wp':cumw[:-1],      
+        'qw':qw,
+        'vw':diff_qw,
+        'wp':diff_qw.cumsum(),      
     })
      
   if gor is not None:
     qg = (gor/1000) * q
-    diff_qg = diff_period * qg
-    cumg = diff_qg.cumsum()
+    diff_qg = (gor/1000) * diff_q
     df_dict.update({
-        'qg':qg[:-1],
-        'vg':diff_qg[:-1],
-        'gp':cumg[:-1],      
+        'qg':qg,
+        'vg':diff_qg,
+        'gp':diff_qg.cumsum(),      
     })
   forecast = pd.DataFrame(df_dict)
   forecast = forecast.set_index('time')
@@ -118,10 +358,8 @@ def forecast_econlimit(t,qt,qi,di,ti,b, fr, end_date=None,npi=0,gas=False, fluid
             -Column 'cum' cummulative flow rate
   """
   # Estimate the time at economic limit
-  if b == 0:
-    date_until = pd.Timestamp.fromordinal(int(np.log(qi / qt) * (1/(di/365))) + ti.toordinal())
-  elif (b > 0) & (b <= 1):
-    date_until = pd.Timestamp.fromordinal(int((np.power(qi / qt, b) - 1)/(b * (di/365))) + ti.toordinal())
+  if (b >= 0) & (b <= 1):
+    date_until = pd.Timestamp.fromordinal(int(arps_time_to_rate(qt, qi, di, b)) + ti.toordinal())
   else:
     raise ValueError('b must be between 0 and 1')
 
@@ -140,6 +378,248 @@ def forecast_econlimit(t,qt,qi,di,ti,b, fr, end_date=None,npi=0,gas=False, fluid
 
   return f, Np
 
+############################################################################################
+# Decline fit functions
+
+def arps_jacobian(days, qi, di, b):
+  """arps_jacobian [Analytic derivatives of the Arps rate with respect to qi, di and b]
+
+  Parameters
+  ----------
+  days : [np.ndarray]
+      [Days elapsed from the date of qi]
+  qi : [float]
+      [Initial flow]
+  di : [float]
+      [Anual declination rate]
+  b : [float]
+      [Arp's parameter]
+
+  Returns
+  -------
+  [np.ndarray]
+      [(days, 3) derivatives]
+  """
+  days = np.asarray(days, dtype=float)
+  dt = (di/365)*days
+  if b == 0:
+    u = np.ones_like(days)
+    dq_dqi = np.exp(-dt)
+    q = qi*dq_dqi
+    dq_db = q*np.power(dt,2)/2
+  else:
+    u = 1 + b*dt
+    dq_dqi = np.power(u,-1/b)
+    q = qi*dq_dqi
+    dq_db = q*(np.log(u)/np.power(b,2) - dt/(b*u))
+  dq_ddi = -q*(days/365)/u
+  return np.column_stack([dq_dqi, dq_ddi, dq_db])
+
+def anomaly_mask(days, rate, codes=None, xstd=2):
+  """anomaly_mask [Flag the points whose log rate derivative is beyond xstd standard
+  deviations from the mean derivative of its well. Points must be sorted by well and time]
+
+  Parameters
+  ----------
+  days : [np.ndarray]
+      [Days of each point]
+  rate : [np.ndarray]
+      [Rate of each point. Must be positive]
+  codes : [np.ndarray], optional
+      [Integer well code of each point. If None all the points belong to one well], by default None
+  xstd : int, optional
+      [Number of standard deviations], by default 2
+
+  Returns
+  -------
+  [np.ndarray]
+      [Boolean mask of anomalies]
+  """
+  days = np.asarray(days, dtype=float)
+  lnq = np.log(np.asarray(rate, dtype=float))
+  codes = np.zeros(days.shape[0], dtype=int) if codes is None else np.asarray(codes)
+  n_wells = codes.max() + 1 if codes.shape[0] > 0 else 0
+
+  same = codes[1:] == codes[:-1]
+  slp = np.full(days.shape[0], np.nan)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    slp[1:] = np.where(same, -np.diff(lnq) / np.diff(days), np.nan)
+  #The first point of each well takes the derivative of the second one
+  first = np.append(True, ~same)
+  first_idx = np.where(first[:-1] & same)[0]
+  slp[first_idx] = slp[first_idx+1]
+
+  valid = np.isfinite(slp)
+  counts = np.bincount(codes[valid], minlength=n_wells)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    mu = np.bincount(codes[valid], weights=slp[valid], minlength=n_wells) / counts
+    sig = np.sqrt(np.bincount(codes[valid], weights=np.power(slp[valid] - mu[codes[valid]],2), minlength=n_wells) / counts)
+    limit = mu + xstd*sig
+    return valid & (np.abs(slp) > limit[codes])
+
+def _fit_arps(days, rate, b=None, p0=None):
+  """_fit_arps [Fit qi, di and b, or qi and di if b is fixed, with the analytic jacobian]"""
+  if p0 is None:
+    #Exponential fit of the log rate
+    slope, intercept = np.polyfit(days, np.log(rate), 1)
+    p0 = [np.exp(intercept), -slope*365 if slope < 0 else 1e-3, 0.5]
+  if b is None:
+    popt, pcov = curve_fit(
+      lambda t, qi, di, b: arps_rate(t, qi, di, b),
+      days, rate, p0=p0, bounds=(0, [np.inf, np.inf, 1]),
+      jac=lambda t, qi, di, b: arps_jacobian(t, qi, di, b)
+    )
+  else:
+    popt, pcov = curve_fit(
+      lambda t, qi, di: arps_rate(t, qi, di, b),
+      days, rate, p0=None if p0 is None else p0[:2], bounds=(0, [np.inf, np.inf]),
+      jac=lambda t, qi, di: arps_jacobian(t, qi, di, b)[:,:2]
+    )
+    popt = np.append(popt, b)
+  return popt, pcov
+
+def _fit_decline_well(args):
+  """_fit_decline_well [Fit the decline of one well. Module level to be picklable by the process pool]"""
+  w, days, rate, b, p0 = args
+  try:
+    popt, _ = _fit_arps(days, rate, b=b, p0=p0)
+    return w, popt, True
+  except (RuntimeError, ValueError):
+    return w, np.full(3, np.nan), False
+
+def decline_fit_batch(df, well='well', time='time', rate='rate', b=None, ad=True, xstd=2, adjust_last_prod=False,
+  processes=None, chunksize=16):
+  """decline_fit_batch [Fit the Arps declines of many wells from a long production table.
+  Day offsets and anomalies are computed once for the whole table, the exponential fit of
+  the log rate seeds every well and the wells are fitted with analytic jacobians in a process pool]
+
+  Parameters
+  ----------
+  df : [pd.DataFrame]
+      [Long table with one row per well and date]
+  well : str, optional
+      [Column that identifies each well], by default 'well'
+  time : str, optional
+      [Column of the dates], by default 'time'
+  rate : str, optional
+      [Column of the rates], by default 'rate'
+  b : [float], optional
+      [Arp's parameter. If None it is also fitted], by default None
+  ad : bool, optional
+      [Remove anomalies before fitting], by default True
+  xstd : int, optional
+      [Standard deviations of the anomaly detection], by default 2
+  adjust_last_prod : bool, optional
+      [Set qi and ti to the last point of each well], by default False
+  processes : int, optional
+      [Worker processes. If 1 the wells are fitted serially], by default None
+  chunksize : int, optional
+      [Wells sent to each worker per task], by default 16
+
+  Returns
+  -------
+  [tuple]
+      [params: table indexed by well with qi, di, b, ti, start_date, end_date, rmse, points,
+      anomalies and success. anomaly: boolean Series aligned with df flagging the removed points]
+  """
+  assert isinstance(df,pd.DataFrame)
+  assert all(i in df.columns for i in [well,time,rate])
+  if b is not None:
+    assert b >= 0 and b <= 1
+
+  anomaly = pd.Series(False, index=df.index, name='anomaly')
+  data = df.loc[df[[well,time,rate]].notna().all(axis=1) & (df[rate] > 0), [well,time,rate]]
+
+  codes, wells = pd.factorize(data[well], sort=True)
+  n_wells = wells.shape[0]
+  days = day_offsets(data[time], pd.Timestamp(0))
+  q = data[rate].values.astype(float)
+
+  order = np.lexsort((days, codes))
+  codes, days, q = codes[order], days[order], q[order]
+  index = data.index.values[order]
+
+  if ad:
+    mask = anomaly_mask(days, q, codes=codes, xstd=xstd)
+    anomaly.loc[index[mask]] = True
+  else:
+    mask = np.zeros(q.shape[0], dtype=bool)
+  anomalies = np.bincount(codes[mask], minlength=n_wells)
+
+  keep = ~mask
+  codes, days, q = codes[keep], days[keep], q[keep]
+  bounds = np.searchsorted(codes, np.arange(n_wells+1))
+  points = np.diff(bounds)
+  has_points = points > 0
+  first_day = np.zeros(n_wells, dtype=np.int64)
+  first_day[has_points] = days[bounds[:-1][has_points]]
+  t = days - first_day[codes]
+
+  #Exponential fit of log rate as the initial guess
+  def group_sum(x):
+    return np.bincount(codes, weights=x, minlength=n_wells)
+  lnq = np.log(q)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    st, sy = group_sum(t), group_sum(lnq)
+    stt, sty = group_sum(t*t), group_sum(t*lnq)
+    slope = (points*sty - st*sy) / (points*stt - st*st)
+    intercept = (sy - slope*st) / points
+  di0 = np.where(np.isfinite(slope) & (slope < 0), -slope*365, 1e-3)
+  qi0 = np.where(np.isfinite(intercept), np.exp(intercept), 1)
+
+  n_params = 3 if b is None else 2
+  tasks = [
+    (w, t[bounds[w]:bounds[w+1]], q[bounds[w]:bounds[w+1]], b, [qi0[w], di0[w], 0.5])
+    for w in range(n_wells) if points[w] >= n_params
+  ]
+
+  if processes == 1:
+    results = [_fit_decline_well(i) for i in tasks]
+  else:
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+      results = list(executor.map(_fit_decline_well, tasks, chunksize=chunksize))
+
+  popt = np.full((n_wells,3), np.nan)
+  success = np.zeros(n_wells, dtype=bool)
+  for w, p, ok in results:
+    popt[w], success[w] = p, ok
+
+  #Diagnostics. One rate per point with the parameters of its well
+  q_hat = arps_rate(t[:,np.newaxis], popt[codes,0], popt[codes,1], popt[codes,2])[:,0]
+  with np.errstate(divide='ignore', invalid='ignore'):
+    rmse = np.sqrt(group_sum(np.power(q - q_hat,2)) / points)
+
+  last = np.where(has_points, bounds[1:] - 1, 0)
+  epoch = np.datetime64('1970-01-01','D')
+  first_date = pd.to_datetime(epoch + first_day)
+  last_date = pd.to_datetime(np.where(has_points, epoch + days[last] if days.shape[0] > 0 else epoch, epoch))
+
+  #Same dates as Declination.fit
+  if adjust_last_prod:
+    qi = np.where(has_points, q[last] if q.shape[0] > 0 else np.nan, np.nan)
+    ti = last_date
+    start_date = last_date if b is None else first_date
+    end_date = last_date + timedelta(days=365) if b is None else last_date
+  else:
+    qi = popt[:,0]
+    ti = start_date = first_date
+    end_date = last_date
+
+  params = pd.DataFrame({
+    'qi':qi,
+    'di':popt[:,1],
+    'b':popt[:,2],
+    'ti':ti,
+    'start_date':start_date,
+    'end_date':end_date,
+    'rmse':rmse,
+    'points':points,
+    'anomalies':anomalies,
+    'success':success & has_points
+  }, index=pd.Index(wells, name=well))
+
+  return params, anomaly
+
 ######################################################################
 #Create Declination Object 
 
@@ -322,6 +802,7 @@ class Declination(DCA):
     show_water:bool = False,
     gor = None,
     bsw=None,
+    time_range:pd.Series=None,
     **kwargs
     ):
     """
@@ -333,6 +814,7 @@ class Declination(DCA):
         fq -> (str) frequecy for the time table. 
               Use https://pandas.pydata.org/pandas-docs/stable/user_guide/timeseries.html#timeseries-offset-aliases
         econ_limit -> (int,float,np.dnarray) Economic limit Rate. If end_date 
+        time_range -> (pd.Series) Dates of the forecast. If given start_date, end_date and fq are not used
 
     Return: 
       f: DataFrame with t column and curve column
@@ -373,7 +855,14 @@ class Declination(DCA):
     if fluid_rate is None:
       fluid_rate = self.fluid_rate
 
-    if econ_limit is None:
+    if time_range is not None:
+      assert isinstance(time_range,pd.Series), 'time_range must be pd.Series with dates'
+      if econ_limit is not None:
+        #Dates after the economic limit are replaced by the date it is reached
+        date_until = pd.Timestamp(self.ti) + timedelta(days=float(arps_time_to_rate(econ_limit, self.qi, self.di, self.b)))
+        time_range = pd.Series(list(time_range[time_range < date_until]) + [date_until]) if time_range.iloc[-1] > date_until else time_range
+      f, Np = forecast_curve(time_range,self.qi,self.di,self.ti,self.b,npi=npi, gas=self.gas,fluid_rate=fluid_rate, gor=gor, bsw=bsw)
+    elif econ_limit is None:
       time_range = pd.Series(pd.date_range(start=start_date, end=end_date, freq=fq, **kwargs))
       f, Np = forecast_curve(time_range,self.qi,self.di,self.ti,self.b,npi=npi, gas=self.gas,fluid_rate=fluid_rate, gor=gor, bsw=bsw)
     else:
@@ -394,7 +883,7 @@ class Declination(DCA):
 
   ################################################################################
   #Decline Fit
-  def fit(self,df:pd.DataFrame,time:str='time',rate:str='rate',b=None, ad=True,xstd=2, adjust_last_prod=False):
+  def fit(self,df:pd.DataFrame,time:str='time',rate:str='rate',b=None, ad=True,xstd=2, adjust_last_prod=False, verbose=True):
     """
     Estimate the declination parameters of a time series of production daily rate
     as a Decline Curve defined by Arps
@@ -407,6 +896,7 @@ class Declination(DCA):
                                             -> if  (b>=0)&(b<=1) b is not fitted but fixed
                                             -> Default: None
       ad:        apply anomally detection    ->  Bool, Default: True
+      verbose:   print the points removed    ->  Bool, Default: True
                 
 
       Return -> q -> 1D Numpy array with the Flow rate
@@ -414,73 +904,34 @@ class Declination(DCA):
     r=None # Return
     df = df.dropna()
     df = df[df[rate]>0]
-    print("Shape of input dataframe ",df.shape[0])
+    if verbose:
+      print("Shape of input dataframe ",df.shape[0])
     range_time = df[time]
     flow_rate = df[rate]
-    if ad == True:
-      #Convert date to ordinal
-      tnum = range_time.apply(lambda x: x.toordinal()) 
-
-      #logaritmit to flow rate
-      lnq = np.log(flow_rate)
 
-      # Derivative of the ln(flow_rate) with respect to time
-      slp = -np.diff(lnq) / np.diff(tnum)
-      slp = np.append(slp[0],slp)
-
-      #Mean and std of derivative
-      mu = slp.mean()
-      sig=slp.std()
+    #Days are computed once and not on every evaluation of the optimizer
+    days = day_offsets(range_time, range_time.iloc[0])
+    if ad == True:
+      anomaly = anomaly_mask(days, flow_rate.values, xstd=xstd)
 
       #Extract the anomalies points
-      range_time_a = range_time[np.abs(slp)>mu+xstd*sig]
-      flow_rate_a = flow_rate[np.abs(slp)>mu+xstd*sig]
-      if not range_time_a.empty and not flow_rate_a.empty:  
-        r = pd.concat([range_time_a,flow_rate_a],axis=1)
+      if anomaly.any():
+        r = pd.concat([range_time[anomaly],flow_rate[anomaly]],axis=1)
         r.rename(columns={time: "date", rate: "rate"}, inplace=True)
-        print(f"Revome {r.shape[0]} rows by anomalies")
-      else:
+        if verbose:
+          print(f"Revome {r.shape[0]} rows by anomalies")
+      elif verbose:
         print("No row removed")
 
       #delete anomalies points to make the regression 
-      range_time = range_time[np.abs(slp)<mu+xstd*sig]
-      flow_rate = flow_rate[np.abs(slp)<mu+xstd*sig]
-  
-      #anomaly = pd.DataFrame({'time':range_time[np.abs(slp)>=mu+xstd*sig].values,'flow':flow_rate[np.abs(slp)>=mu+xstd*sig].values})
-      #r.append(anomaly)
-      print(f'new shape {range_time.shape[0]}')
+      range_time = range_time[~anomaly]
+      flow_rate = flow_rate[~anomaly]
+      days = day_offsets(range_time, range_time.iloc[0])
+      if verbose:
+        print(f'new shape {range_time.shape[0]}')
+
     if b is None:
-      
-      def decline_function(range_time,qi,di,b):
-        """
-        Estimate the flow rate given the decline curve parameters assuming the Ti 
-        to the first value on range_time. 
-        
-        This function is intended to be used with scipy.optimize.curve_fit function to
-        create the cost function to fit the decline curve parameters to a given 
-        production data. 
-
-        Attributes:
-          range_time: Range of dates to estimate the Forecast Curve-> Timestamp Series
-          qi:        Initial flow rate -> Number
-          di:        Decline rate in fraction and positive-> Number
-          b:         Arp's Coefficient. 0<=b<=1  -> Number 
-
-          Return -> q -> 1D Numpy array with the Flow rate: 
-        """
-        days_number = range_time.apply(lambda x: x.toordinal())
-        ti_day = range_time.iloc[0].toordinal() 
-        day_diff = days_number-ti_day 
-
-        if b == 0:
-          q = qi*np.exp(-(di/365)*day_diff) 
-        elif (b>0) & (b<=1):
-          q = qi/np.power(1+b*(di/365)*day_diff,1/b)
-        
-        return q
-      
-      popt, pcov = curve_fit(decline_function, range_time, flow_rate, bounds=(0, [np.inf, np.inf, 1]))
-      #dec = declination(qi=popt[0], di=popt[1], ti=range_time[0], b=popt[2])
+      popt, pcov = _fit_arps(days, flow_rate.values.astype(float))
       self.qi = flow_rate.iloc[-1] if adjust_last_prod else popt[0]
       self.di = popt[1]
       self.ti = range_time.iloc[-1] if adjust_last_prod else range_time.iloc[0]
@@ -490,37 +941,7 @@ class Declination(DCA):
       self.anomaly_points = r
 
     elif (b >= 0) & (b <= 1):
-      
-      def decline_function(range_time,qi,di):
-        """
-        Estimate the flow rate given the decline curve parameters assuming the Ti 
-        to the first value on range_time. 
-        
-        This function is intended to be used with scipy.optimize.curve_fit function to
-        create the cost function to fit the decline curve parameters to a given 
-        production data. 
-
-        Attributes:
-          range_time: Range of dates to estimate the Forecast Curve-> Timestamp Series
-          qi:        Initial flow rate -> Number
-          di:        Decline rate in fraction and positive-> Number
-          b:         Arp's Coefficient. 0<=b<=1  -> Number 
-
-          Return -> declination object
-        """
-        days_number = range_time.apply(lambda x: x.toordinal())
-        ti_day  = range_time.iloc[0].toordinal() 
-        day_diff = days_number-ti_day 
-        b
-        if b == 0:
-          q = qi*np.exp(-(di/365)*day_diff) 
-        elif (b>0)&(b<=1):
-          q = qi/np.power(1+b*(di/365)*day_diff,1/b)
-        
-        return q 
-      
-      popt, pcov = curve_fit(decline_function, range_time, flow_rate, bounds=(0, [np.inf, np.inf]))
-      #dec = declination(qi=popt[0], di=popt[1], ti=range_time.iloc[0], b=b)
+      popt, pcov = _fit_arps(days, flow_rate.values.astype(float), b=b)
       self.qi = flow_rate.iloc[-1] if adjust_last_prod else popt[0]
       self.di = popt[1]
       self.ti = range_time.iloc[-1] if adjust_last_prod else range_time.iloc[0]
@@ -529,6 +950,13 @@ class Declination(DCA):
       self.end_date = range_time.iloc[-1]
       self.anomaly_points = r
 
+  @staticmethod
+  def fit_batch(df, well='well', time='time', rate='rate', **kwargs):
+    """
+    Fit the declines of many wells from a long production table. See decline_fit_batch
+    """
+    return decline_fit_batch(df, well=well, time=time, rate=rate, **kwargs)
+
   def plot(self, start_date=None, end_date=None, fq='M',econ_limit=None,ax=None,
     rate_kw={},cum_kw={},ad_kw={},cum=False,npi=0,anomaly=False, **kwargs):
     if start_date is None: 
@@ -600,13 +1028,22 @@ def time_limit(qi,qlim,b,di):
     return tl
 
 class HybridDeclination(DCA):
+  """
+  Hyperbolic declination that switches to an exponential declination when its
+  decline rate reaches dlim (modified Arps)
+
+  Attributes:
+    dec_hyp: Hyperbolic declination: Declination
+    dlim: Anual declination rate of the exponential tail: Number
+  """
   def __init__(self,dec_hyp, dlim):
     self.dec_hyp = dec_hyp
     self.dlim = dlim 
-    self.qlim = flow_limit(dec_hyp.qi,dlim,dec_hyp.di,dec_hyp.b)
-    self.tlim = dec_hyp.ti + timedelta(days=time_limit(dec_hyp.qi,self.qlim,dec_hyp.b,dec_hyp.di))
-    self.dec_exp = declination(
-        qi = self.qlim,
+    tlim = arps_switch_time(dec_hyp.di, dec_hyp.b, dlim)
+    self.qlim = arps_rate(tlim, dec_hyp.qi, dec_hyp.di, dec_hyp.b)
+    self.tlim = dec_hyp.ti + timedelta(days=float(tlim))
+    self.dec_exp = Declination(
+        qi = float(self.qlim),
         di = dlim,
         b = 0,
         ti = self.tlim
@@ -618,7 +1055,7 @@ class HybridDeclination(DCA):
 
   @dec_hyp.setter 
   def dec_hyp(self,value):
-    assert isinstance(value,declination), "dec_hyp must be of type declination"
+    assert isinstance(value,Declination), "dec_hyp must be of type Declination"
     assert value.b > 0, "b value must be greater than 0"
     self._dec_hyp = value 
 
@@ -631,27 +1068,43 @@ class HybridDeclination(DCA):
     assert isinstance(value,(int,float))
     self._dlim = value 
 
-  def forecast(self, start_date=None, end_date=None, fq='M'):
+  def forecast(self, start_date=None, end_date=None, fq='M', npi=0, **kwargs):
     if start_date is None:
       start_date = self.dec_hyp.ti
     
     if end_date is None:
       end_date = self.tlim + timedelta(days=365)
 
-    if start_date < self.tlim and end_date > self.tlim:
-      _forecast_1,_np_1 = self.dec_hyp.forecast(start_date=start_date, end_date=self.tlim, fq=fq)
-      _forecast_2,_np_2 = self.dec_exp.forecast(start_date=self.tlim, end_date=end_date, fq=fq)
-      _forecast_2['cum'] = _forecast_2['cum'] + _forecast_1['cum'].iloc[-1]
-      _forecast = _forecast_1.append(_forecast_2)
-      _np = _np_1 + _np_2
-    
-    elif start_date < self.tlim and end_date < self.tlim:
-      _forecast,_np = self.dec_hyp.forecast(start_date=start_date, end_date=end_date, fq=fq)
-
-    elif start_date > self.tlim and end_date > self.tlim:
-      _forecast,_np = self.dec_exp.forecast(start_date=start_date, end_date=end_date, fq=fq)
-
-    return _forecast,_np
+    time_range = pd.Series(pd.date_range(start=start_date, end=end_date, freq=fq))
+    return forecast_curve(
+      time_range, self.dec_hyp.qi, self.dec_hyp.di, self.dec_hyp.ti, self.dec_hyp.b, 
+      npi=npi, gas=self.dec_hyp.gas, dlim=self.dlim, **kwargs
+    )
 
+def hybrid_forecast(range_time, qi, di, ti, b, dlim, npi=0):
+  """hybrid_forecast [Modified Arps forecast of many wells in one call. Every well has its own
+  parameters and initial date, and its switch to the exponential tail is applied as a mask.
+  The wells do not produce before their initial date]
 
+  Parameters
+  ----------
+  range_time : [pd.Series, pd.DatetimeIndex]
+      [Dates of the forecast]
+  qi, di, b, dlim, npi : [np.ndarray]
+      [Parameters per well]
+  ti : [pd.Series, pd.DatetimeIndex, date]
+      [Date of the initial flow of each well]
 
+  Returns
+  -------
+  [tuple]
+      [rate, volume and cumulative of shape (wells, periods)]
+  """
+  ti = pd.DatetimeIndex(np.atleast_1d(pd.to_datetime(ti)))
+  epoch = pd.Timestamp(0)
+  days = day_offsets(range_time, epoch)[np.newaxis,:] - day_offsets(ti, epoch)[:,np.newaxis]
+
+  #Days before ti are clipped so the volume only counts from ti and the rate is zero before it
+  q, volume, cum = arps_forecast(np.maximum(days, 0), qi, di, b, npi=npi, dlim=dlim)
+  q = np.where(days[...,:-1] < 0, 0, q)
+  return q, volume, cum
@@ -0,0 +1,323 @@
+import pandas as pd
+import numpy as np
+from datetime import date, timedelta
+from .declination import Declination, day_offsets, arps_rate, arps_forecast, anomaly_mask, _fit_arps
+
+############################################################################################
+# Quantile Sketch
+
+class QuantileSketch:
+  """
+  Running quantile sketch of many series at once. Each value goes to a logarithmic bin
+  so any quantile is estimated with a relative error lower than alpha, and the memory
+  only depends on the number of series and bins, not on the number of values added.
+
+  Attributes:
+    shape:      Shape of every update without the realizations axis. e.g (periods,)
+    alpha:      Relative accuracy of the quantiles
+    min_value:  Values lower than it are counted as zero
+    max_value:  Values greater than it are counted in the last bin
+  """
+  def __init__(self, shape, alpha=0.01, min_value=1e-3, max_value=1e10):
+    self.shape = tuple(np.atleast_1d(shape))
+    self.alpha = alpha
+    self.gamma = (1 + alpha)/(1 - alpha)
+    self.offset = int(np.floor(np.log(min_value)/np.log(self.gamma)))
+    self.n_bins = int(np.ceil(np.log(max_value)/np.log(self.gamma))) - self.offset + 1
+    self.min_value = min_value
+    self.counts = np.zeros((int(np.prod(self.shape)), self.n_bins), dtype=np.int64)
+    self.zeros = np.zeros(int(np.prod(self.shape)), dtype=np.int64)
+    self.count = 0
+
+  @property
+  def alpha(self):
+    return self._alpha
+
+  @alpha.setter
+  def alpha(self,value):
+    assert isinstance(value,float) and value > 0 and value < 1
+    self._alpha = value
+
+  def update(self, values):
+    """update [Add realizations of shape (n, *shape)]"""
+    values = np.asarray(values, dtype=float).reshape(-1, self.counts.shape[0])
+    series = np.broadcast_to(np.arange(self.counts.shape[0]), values.shape)
+
+    #Non finite values are not counted
+    finite = np.isfinite(values)
+    zero = finite & (values < self.min_value)
+    self.zeros += zero.sum(axis=0)
+
+    positive = finite & ~zero
+    with np.errstate(divide='ignore', invalid='ignore'):
+      bins = np.ceil(np.log(values[positive])/np.log(self.gamma)).astype(np.int64) - self.offset
+    bins = np.clip(bins, 0, self.n_bins - 1)
+    self.counts += np.bincount(
+      series[positive]*self.n_bins + bins, minlength=self.counts.size
+    ).reshape(self.counts.shape)
+    self.count += values.shape[0]
+    return self
+
+  def merge(self, other):
+    """merge [Add the counts of another sketch with the same shape and accuracy]"""
+    assert isinstance(other, QuantileSketch)
+    assert other.shape == self.shape and other.n_bins == self.n_bins and other.offset == self.offset
+    self.counts += other.counts
+    self.zeros += other.zeros
+    self.count += other.count
+    return self
+
+  def quantile(self, q):
+    """quantile [Quantiles q of every series. Returns shape (len(q), *shape)]"""
+    q = np.atleast_1d(q).astype(float)
+    assert np.all((q >= 0) & (q <= 1))
+    total = self.zeros + self.counts.sum(axis=1)
+    cum = np.cumsum(self.counts, axis=1) + self.zeros[:,np.newaxis]
+
+    result = np.full((q.shape[0], self.counts.shape[0]), np.nan)
+    for i, qi in enumerate(q):
+      rank = qi*(total - 1)
+      idx = (cum <= rank[:,np.newaxis]).sum(axis=1)
+      value = 2*np.power(self.gamma, np.minimum(idx, self.n_bins - 1) + self.offset)/(self.gamma + 1)
+      result[i] = np.where(rank < self.zeros, 0, value)
+      result[i, total == 0] = np.nan
+    return result.reshape((q.shape[0],) + self.shape)
+
+############################################################################################
+# Probabilistic Declination
+
+class ProbabilisticDeclination(Declination):
+  """
+  Decline curve with uncertainty in its parameters. The realizations of (qi, di, b) are
+  sampled from the covariance of the fit or from refits of the history with bootstrapped
+  residuals, forecasted in batches with the arrays Arps functions and aggregated in
+  quantile sketches, so the memory does not grow with the number of realizations.
+
+  Attributes:
+    cov:          Covariance of (qi, di, b), or (qi, di) if b is fixed: np.ndarray
+    method:       Sampling method. 'covariance' or 'bootstrap': str
+    n_bootstrap:  Number of refits of the bootstrap: int
+    seed:         Seed of the random generator: int
+  """
+  def __init__(self, **kwargs):
+    self.cov = kwargs.pop('cov',None)
+    self.method = kwargs.pop('method','covariance')
+    self.n_bootstrap = kwargs.pop('n_bootstrap',200)
+    self.seed = kwargs.pop('seed',None)
+    self.history = kwargs.pop('history',None)
+    self._bootstrap_params = None
+    super().__init__(**kwargs)
+
+#####################################################
+############## Properties ###########################
+
+  @property
+  def cov(self):
+    return self._cov
+
+  @cov.setter
+  def cov(self,value):
+    if value is not None:
+      assert isinstance(value,np.ndarray) and value.ndim == 2 and value.shape[0] == value.shape[1]
+      assert value.shape[0] in [2,3]
+    self._cov = value
+
+  @property
+  def method(self):
+    return self._method
+
+  @method.setter
+  def method(self,value):
+    assert value in ['covariance','bootstrap'], f'{value} not implemented'
+    self._method = value
+
+  @property
+  def n_bootstrap(self):
+    return self._n_bootstrap
+
+  @n_bootstrap.setter
+  def n_bootstrap(self,value):
+    assert isinstance(value,int) and value > 0
+    self._n_bootstrap = value
+
+  @property
+  def seed(self):
+    return self._seed
+
+  @seed.setter
+  def seed(self,value):
+    if value is not None:
+      assert isinstance(value,int)
+    self._seed = value
+
+  @property
+  def history(self):
+    return self._history
+
+  @history.setter
+  def history(self,value):
+    """history [Days from ti and rates used in the fit]"""
+    if value is not None:
+      assert isinstance(value,tuple) and len(value) == 2
+      value = tuple(np.asarray(i,dtype=float) for i in value)
+      assert value[0].shape == value[1].shape
+    self._history = value
+    self._bootstrap_params = None
+
+  def fit(self,df:pd.DataFrame,time:str='time',rate:str='rate',b=None, ad=True,xstd=2, verbose=False):
+    """
+    Estimate the declination parameters, their covariance and keep the history
+    for the bootstrap. See Declination.fit
+
+      Attributes:
+      df: (pd.DataFrame)  DataFrame with with time and rate columns
+      time: (str, default 'time') column name of the datetime
+      rate: (str, default 'rate') column name of the rate
+      b:         Arp's Coefficient. If None b parameter is also fitted
+      ad:        apply anomally detection    ->  Bool, Default: True
+    """
+    df = df.dropna()
+    df = df[df[rate]>0]
+    range_time = df[time]
+    flow_rate = df[rate]
+    days = day_offsets(range_time, range_time.iloc[0])
+
+    r = None
+    if ad:
+      anomaly = anomaly_mask(days, flow_rate.values, xstd=xstd)
+      if anomaly.any():
+        r = pd.concat([range_time[anomaly],flow_rate[anomaly]],axis=1)
+        r.rename(columns={time: "date", rate: "rate"}, inplace=True)
+        if verbose:
+          print(f"Revome {r.shape[0]} rows by anomalies")
+      range_time = range_time[~anomaly]
+      flow_rate = flow_rate[~anomaly]
+      days = day_offsets(range_time, range_time.iloc[0])
+
+    popt, pcov = _fit_arps(days, flow_rate.values.astype(float), b=b)
+
+    self.qi = popt[0]
+    self.di = popt[1]
+    self.b = popt[2] if b is None else b
+    self.ti = range_time.iloc[0]
+    self.start_date = range_time.iloc[0]
+    self.end_date = range_time.iloc[-1]
+    self.anomaly_points = r
+    self.cov = pcov
+    self.history = (days, flow_rate.values)
+
+  def bootstrap(self, n=None, seed=None):
+    """
+    Refit the history n times with its residuals resampled with replacement
+
+    Return -> (n, 3) array of qi, di, b
+    """
+    assert self.history is not None, 'The history is needed for the bootstrap. Use fit'
+    n = self.n_bootstrap if n is None else n
+    rng = np.random.default_rng(self.seed if seed is None else seed)
+    days, rate = self.history
+    fitted = arps_rate(days, self.qi, self.di, self.b)
+    residuals = rate - fitted
+    fixed_b = self.cov is not None and self.cov.shape[0] == 2
+
+    params = np.full((n,3), np.nan)
+    for i in range(n):
+      sample = fitted + rng.choice(residuals, size=residuals.shape[0], replace=True)
+      sample = np.maximum(sample, 1e-6)
+      try:
+        params[i], _ = _fit_arps(
+          days, sample, b=self.b if fixed_b else None, p0=[self.qi, self.di, min(max(self.b,1e-3),0.999)]
+        )
+      except (RuntimeError, ValueError):
+        pass
+    params = params[np.isfinite(params).all(axis=1)]
+    self._bootstrap_params = params
+    return params
+
+  def sample(self, n, method=None, rng=None):
+    """
+    Sample n realizations of the declination parameters
+
+    Return -> (n, 3) array of qi, di, b
+    """
+    method = self.method if method is None else method
+    rng = np.random.default_rng(self.seed) if rng is None else rng
+    mean = np.array([self.qi, self.di, self.b], dtype=float)
+
+    if method == 'covariance':
+      assert self.cov is not None, 'The covariance is needed. Use fit or set cov'
+      k = self.cov.shape[0]
+      params = np.tile(mean, (n,1))
+      params[:,:k] = rng.multivariate_normal(mean[:k], self.cov, size=n, check_valid='ignore')
+    else:
+      if self._bootstrap_params is None:
+        self.bootstrap()
+      params = self._bootstrap_params[rng.integers(0, self._bootstrap_params.shape[0], size=n)]
+
+    params[:,:2] = np.maximum(params[:,:2], 0)
+    params[:,2] = np.clip(params[:,2], 0, 1)
+    return params
+
+  def forecast_distribution(self,
+    start_date:date=None,
+    end_date:date=None,
+    fq:str=None,
+    n:int=1000,
+    batch_size:int=10000,
+    percentiles=[10,50,90],
+    npi:float=0,
+    method:str=None,
+    alpha:float=0.01,
+    **kwargs
+    ):
+    """
+    Percentiles of the rate and cumulative of n realizations in every period.
+    The realizations are forecasted in batches of batch_size and only the quantile
+    sketches are kept.
+
+    Percentiles follow the reserves convention, P90 is the value exceeded by 90% of the
+    realizations (the low estimate) and P10 the high estimate.
+
+    Input:
+        start_date ->  (datetime.date) Initial date Forecast
+        end_date ->  (datetime.date) end date Forecast
+        fq -> (str) frequecy for the time table.
+        n -> (int) number of realizations
+        percentiles -> (list) percentiles to report
+
+    Return:
+      f: DataFrame indexed by time with the rate and cumulative percentiles
+    """
+    fq = self.fq if fq is None else fq
+    if start_date is None:
+      start_date = self.ti if self.start_date is None else self.start_date
+    if end_date is None:
+      end_date = self.ti + timedelta(days=365) if self.end_date is None else self.end_date
+
+    time_range = pd.date_range(start=start_date, end=end_date, freq=fq, **kwargs)
+    days = day_offsets(time_range, self.ti)
+    periods = days.shape[0] - 1
+    assert periods > 0, 'At least two dates are needed'
+
+    rng = np.random.default_rng(self.seed)
+    rate_sketch = QuantileSketch((periods,), alpha=alpha)
+    cum_sketch = QuantileSketch((periods,), alpha=alpha)
+
+    for start in range(0, n, batch_size):
+      params = self.sample(min(batch_size, n - start), method=method, rng=rng)
+      q, _, cum = arps_forecast(days, params[:,0], params[:,1], params[:,2], npi=npi)
+      rate_sketch.update(q)
+      cum_sketch.update(cum)
+
+    percentiles = np.atleast_1d(percentiles)
+    quantiles = 1 - percentiles/100
+    rate_q = rate_sketch.quantile(quantiles)
+    cum_q = cum_sketch.quantile(quantiles)
+
+    rate_name, cum_name = ('qg','gp') if self.gas else ('qo','np')
+    f = pd.DataFrame(index=pd.Index(time_range[:-1], name='time'))
+    for i, p in enumerate(percentiles):
+      f[f'{rate_name}_p{p}'] = rate_q[i]
+    for i, p in enumerate(percentiles):
+      f[f'{cum_name}_p{p}'] = cum_q[i]
+    return f
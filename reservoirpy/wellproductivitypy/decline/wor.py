@@ -2,6 +2,7 @@ import numpy as np
 import pandas as pd 
 from datetime import date, timedelta
 from .dca import DCA
+from .declination import day_offsets
 
 def bsw_to_wor(bsw):
     assert isinstance(bsw,(int,float,np.ndarray,pd.Series))
@@ -18,6 +19,100 @@ def wor_to_bsw(wor):
     return bsw   
 
 
+def wor_forecast_arrays(
+    days,
+    fluid_rate,
+    slope,
+    wor_i,
+    npi=0,
+    econ_limit=None,
+    np_limit=None,
+    wor_limit=None
+    ):
+    """
+    Estimate the wor+1 forecast of one or many wells with arrays.
+
+    The wor+1 grows exponentially with the cumulative oil, so with a constant fluid rate
+    in each period the cumulative oil has the closed form
+
+        exp(slope*Np_k) = exp(slope*npi) + slope/(wor_i+1) * sum(fluid_rate*dt)
+
+    and the whole forecast is a cumulative sum. The limits mask the periods after the
+    first one that reaches them.
+
+    Attributes:
+        days:       Days of each date. n dates give n-1 periods -> (dates,)
+        fluid_rate: Fluid rate at each date. The last one is not used -> (dates,) or (wells, dates)
+        slope:      Slope of ln(wor+1) against the cumulative oil -> Number or (wells,)
+        wor_i:      Initial wor -> Number or (wells,)
+        npi:        Initial cumulative oil -> Number or (wells,)
+        econ_limit, np_limit, wor_limit: Limits -> Number or (wells,)
+
+    Return -> dict with qf, qo, vo, vw, qw, bsw, wor_1, wor, np, wp of shape (periods,) or
+              (wells, periods), nan after the limits, and the boolean mask active
+    """
+    days = np.asarray(days, dtype=float)
+    dt = np.diff(days)
+    fluid_rate = np.asarray(fluid_rate, dtype=float)
+    params = np.broadcast_arrays(*[np.asarray(i, dtype=float) for i in [slope, wor_i, npi]])
+    batch = params[0].ndim > 0 or fluid_rate.ndim > 1
+    slope, wor_i, npi = [np.atleast_1d(i)[:,np.newaxis] for i in params]
+
+    qf = np.broadcast_to(fluid_rate, fluid_rate.shape[:-1] + days.shape)[...,:-1]
+    qf = np.atleast_2d(qf)
+    wor_i1 = wor_i + 1
+
+    fdt = qf * dt
+    cum_fdt = np.concatenate([np.zeros(fdt.shape[:-1] + (1,)), np.cumsum(fdt, axis=-1)], axis=-1)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        s_safe = np.where(slope == 0, 1, slope)
+        #logaddexp avoids the overflow of exp(slope*npi) for increasing wor
+        log_x = np.where(
+            slope > 0,
+            np.logaddexp(s_safe*npi, np.log(np.abs(s_safe)*cum_fdt/wor_i1)),
+            np.log(np.exp(s_safe*npi) + s_safe*cum_fdt/wor_i1)
+        )
+        cum_np = np.where(slope == 0, npi + cum_fdt/wor_i1, log_x/s_safe)
+
+        wor_1 = np.exp(slope*cum_np[...,:-1])*wor_i1
+        qo = qf / wor_1
+
+    vo = np.diff(cum_np, axis=-1)
+    vw = fdt - vo
+    wor = wor_1 - 1
+
+    forecast = {
+        'qf':qf,
+        'qo':qo,
+        'vo':vo,
+        'vw':vw,
+        'qw':qf - qo,
+        'bsw':wor / wor_1,
+        'wor_1':wor_1,
+        'wor':wor,
+        'np':cum_np[...,1:],
+        'wp':np.cumsum(vw, axis=-1)
+    }
+
+    #The period that reaches a limit is the last one
+    hit = np.zeros(qo.shape, dtype=bool)
+    if econ_limit is not None:
+        hit |= qo <= np.atleast_1d(econ_limit)[:,np.newaxis]
+    if np_limit is not None:
+        hit |= forecast['np'] >= np.atleast_1d(np_limit)[:,np.newaxis]
+    if wor_limit is not None:
+        hit |= wor >= np.atleast_1d(wor_limit)[:,np.newaxis]
+    active = (np.cumsum(hit, axis=-1) - hit) == 0
+
+    for k in forecast:
+        forecast[k] = np.where(active, forecast[k], np.nan)
+    forecast['active'] = active
+
+    if not batch:
+        forecast = {k:v[0] for (k,v) in forecast.items()}
+    return forecast
+
 def wor_forecast(
     range_time,
     fluid_rate, 
@@ -30,7 +125,7 @@ def wor_forecast(
     gor=None
     ):
     """
-    Estimate a Forecast curve given wor+1 parameters
+    Estimate a Forecast curve given wor+1 parameters. See wor_forecast_arrays
 
     Attributes:
 
@@ -38,7 +133,7 @@ def wor_forecast(
     """
     # TODO Implement Gor forecast. 
     assert isinstance(range_time,pd.Series)
-    days_number = range_time.apply(lambda x: x.toordinal()).values
+    days_number = day_offsets(range_time, range_time.iloc[0])
     assert isinstance(fluid_rate,(pd.Series,np.ndarray))
     fluid_rate = np.atleast_1d(fluid_rate)
 
@@ -46,39 +141,20 @@ def wor_forecast(
     assert isinstance(slope,(int,float))
     assert isinstance(wor_i,(int,float)) and wor_i >= 0
 
-    wor_i1 = wor_i + 1
-
-    df = pd.DataFrame()
-    
-    cum_np = npi
-    cum_wp = 0
-    days_diff = np.diff(days_number,append=0)
-
-    for i in range(days_number.shape[0]-1):
-        wor_1 = np.exp(slope*cum_np)*wor_i1
-        wor = wor_1 - 1
-        bsw = wor_to_bsw(wor)
-        qo = fluid_rate[i]*(1-bsw)
-        qw = fluid_rate[i]*bsw
-        cum_np += qo*days_diff[i]
-        cum_wp += qw*days_diff[i]
-
-        _df = pd.DataFrame({'qf':fluid_rate[i],'qo':qo,'vo':qo*days_diff[i],'vw':qw*days_diff[i],'qw':qw,'bsw':bsw,'wor_1':wor_1,'wor':wor,'np':cum_np,'wp':cum_wp})
-        df = df.append(_df)
-
-        if econ_limit is not None:
-            if qo <= econ_limit:
-                break
-        
-        if np_limit is not None:
-            if cum_np >= np_limit:
-                break     
-
-        if wor_limit is not None:
-            if wor >= wor_limit:
-                break  
-
-    df.index = range_time[:df.shape[0]]
+    f = wor_forecast_arrays(
+        days_number,
+        fluid_rate,
+        slope,
+        wor_i,
+        npi=npi,
+        econ_limit=econ_limit,
+        np_limit=np_limit,
+        wor_limit=wor_limit
+    )
+    n = f.pop('active').sum()
+
+    df = pd.DataFrame({k:v[:n] for (k,v) in f.items()})
+    df.index = range_time[:n]
     df.index.name = 'time'
 
     return df
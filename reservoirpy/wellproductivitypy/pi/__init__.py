@@ -1,8 +1,11 @@
-from .inflow import OilInflow, oil_inflow_curve, oil_j, gas_inflow_curve, gas_j, GasInflow
-from .outflow import (gas_pressure_profile, gas_outflow_curve, gas_pressure_profile_correlation,
+from .inflow import (OilInflow, oil_inflow_curve, oil_j, gas_inflow_curve, gas_j, GasInflow, InflowSet,
+    oil_pwf_to_flow, oil_flow_to_pwf, oil_aof, inflow_fit_batch)
+from .outflow import (gas_pressure_profile, gas_pressure_profile_batch, gas_outflow_curve, gas_pressure_profile_correlation,
     potential_energy_change,kinetic_energy_change,frictional_pressure_drop,
-    one_phase_pressure_profile,flow_regime_plot,hb_correlation,two_phase_pressure_profile,
-    two_phase_outflow_curve, gray_correlation, two_phase_upward_pressure,gas_upward_pressure)
+    one_phase_pressure_profile,flow_regime_plot,hb_correlation,two_phase_pressure_profile,two_phase_pressure_profile_batch,
+    two_phase_outflow_curve, gray_correlation, bb_correlation, two_phase_correlations, two_phase_upward_pressure,gas_upward_pressure,
+    two_phase_operating_point, gas_operating_point)
 from .forecast import pressure_model, forecast_model
 from .als import Als
-from .jet_pump import JetPump, nozzle_flow, minimum_suction_area
\ No newline at end of file
+from .jet_pump import JetPump, nozzle_flow, minimum_suction_area
+from .vfp import VfpTable, build_vfp_tables, multilinear_interpolation
@@ -2,8 +2,9 @@ import numpy as np
 import pandas as pd 
 import matplotlib.pyplot as plt
 from scipy.interpolate import interp1d
-from ...pvtpy.black_oil import Pvt,Gas,Oil
+from ...pvtpy.black_oil import Pvt,Gas,Oil, interpolate_arrays, pseudo_pressure_table
 from scipy.optimize import curve_fit
+from concurrent.futures import ProcessPoolExecutor
 
 
 def oil_j(mu=None,bo=None,h=None,k=None,kh=None,re=1490,rw=0.58,s=0):
@@ -63,33 +64,29 @@ def gas_inflow_curve(pr,j,gas_pvt,n=10):
 
     Attributes:
         pr:     Reservoir Pressure [psi]
-        j:      Productivity index [bbl/d*psi]
-        pb:     PVT
+        j:      Productivity index [Kscf/d*psi^2*cP]
+        gas_pvt:    Gas or Pvt with z and mug. If Gas is given its cached pseudo-pressure table is used
         n:      Number of steps in the return DataFrame
     
     Return:
         pi:     DataFrame with two columns Pressure [p] and Flow [q]-> Pandas DataFrame
         aof:    Absolute open flow -> Number
     """
-    assert isinstance(gas_pvt, pvt), "The pvt must be of PVT class"
-    assert all(i in gas_pvt.columns for i in ['z','mug'])
+    assert isinstance(gas_pvt, (Pvt,Gas)), "The pvt must be of PVT or Gas class"
 
     #Create pressure Range
     p = np.linspace(0,pr,n)
 
-    #Estimate pvt interpolated
-    pvt_interpolated = gas_pvt.interpolate(p)
-
-    #Calculate 2p/(mug*z) Pseudopressure
-    pvt_interpolated['pspressure'] = (2*pvt_interpolated.index) / (pvt_interpolated['z']*pvt_interpolated['mug'])
+    #Cumulative pseudo-pressure m(p), integrated once over the pvt table
+    if isinstance(gas_pvt,Gas):
+        mp_table = gas_pvt.pseudo_pressure_table
+    else:
+        mp_table = pseudo_pressure_table(gas_pvt.to_arrays())
 
-    q=np.zeros(p.shape)
+    mp = interpolate_arrays(mp_table, np.append(p,pr), property='mp')['mp']
 
     #Calculate flow
-    mp_pr = np.trapz(pvt_interpolated['pspressure'],pvt_interpolated.index)
-    for i in range(1,pvt_interpolated.shape[0]):
-        mp_pwf = np.trapz(pvt_interpolated['pspressure'].iloc[:i],pvt_interpolated.index[:i])
-        q[i-1] = j * (mp_pr - mp_pwf)
+    q = j * (mp[-1] - mp[:-1])
 
     data = pd.DataFrame({'p':p,'q':q})
     aof = data['q'].max()
@@ -99,6 +96,211 @@ def gas_inflow_curve(pr,j,gas_pvt,n=10):
 
 
 
+def oil_pwf_to_flow(pwf,pr,j,pb=0):
+    """
+    Evaluate the composite (linear above the bubble point, Vogel below) inflow curve.
+    All the arguments are broadcasted so many wells are evaluated at once
+
+    Attributes:
+        pwf:    Flowing bottom hole pressure [psi]
+        pr:     Reservoir Pressure [psi]
+        j:      Productivity index [bbl/d*psi]
+        pb:     Bubble Pressure [psi]
+
+    Return:
+        q:      Flow [bbl/d] -> np.ndarray
+    """
+    pwf, pr, j, pb = np.broadcast_arrays(*[np.asarray(i,dtype=float) for i in [pwf,pr,j,pb]])
+
+    #If the reservoir pressure is below the bubble point the curve is fully Vogel
+    pb_eff = np.minimum(pb,pr)
+    qb = j * (pr - pb_eff)
+    qv = pb_eff * j / 1.8
+
+    x = np.divide(pwf, pb_eff, out=np.zeros(pwf.shape), where=pb_eff>0)
+    q = np.where(
+        pwf > pb_eff,
+        j * (pr - pwf),
+        qb + qv * (1 - 0.2 * x - 0.8 * np.power(x,2))
+    )
+    return q
+
+def oil_flow_to_pwf(q,pr,j,pb=0):
+    """
+    Invert the composite inflow curve. Below the bubble point the Vogel quadratic
+    is solved in closed form. Rates above the AOF return NaN
+
+    Attributes:
+        q:      Flow [bbl/d]
+        pr:     Reservoir Pressure [psi]
+        j:      Productivity index [bbl/d*psi]
+        pb:     Bubble Pressure [psi]
+
+    Return:
+        pwf:    Flowing bottom hole pressure [psi] -> np.ndarray
+    """
+    q, pr, j, pb = np.broadcast_arrays(*[np.asarray(i,dtype=float) for i in [q,pr,j,pb]])
+
+    pb_eff = np.minimum(pb,pr)
+    qb = j * (pr - pb_eff)
+    qv = pb_eff * j / 1.8
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # 0.8x^2 + 0.2x - (1 - (q - qb)/qv) = 0
+        c = 1 - (q - qb) / qv
+        x = (-0.2 + np.sqrt(0.04 + 3.2 * c)) / 1.6
+        pwf = np.where(q <= qb, pr - q / j, x * pb_eff)
+    pwf[(q < 0) | (q > qb + qv)] = np.nan
+    return pwf
+
+def oil_aof(pr,j,pb=0):
+    """
+    Absolute open flow of the composite inflow curve [bbl/d]
+    """
+    pr, j, pb = np.broadcast_arrays(*[np.asarray(i,dtype=float) for i in [pr,j,pb]])
+    pb_eff = np.minimum(pb,pr)
+    return j * (pr - pb_eff) + pb_eff * j / 1.8
+
+def _fit_oil_test(args):
+    """
+    Fit pr and j of one well test with a composite inflow curve. Module level
+    to be picklable by the process pool
+    """
+    well, pwf, q, pb, p0 = args
+    try:
+        popt, _ = curve_fit(
+            lambda p, pr, j: oil_pwf_to_flow(p, pr, j, pb),
+            pwf, q, p0=p0, bounds=(0, np.inf)
+        )
+        return well, popt[0], popt[1], True
+    except (RuntimeError, ValueError):
+        return well, np.nan, np.nan, False
+
+def inflow_fit_batch(df,well='well',pressure='pwf',rate='q',pr=None,pb=0,gas=None,processes=None,chunksize=16):
+    """
+    Fit the inflow curves of many well tests at once.
+
+    The inflow curve is linear in j when pr is known, so j is solved in closed form for
+    all the tests with grouped sums. When pr is unknown the linear (pb=0) oil curve and the
+    pseudo-pressure gas curve are still linear in (j*pr, j) and are solved the same way.
+    Only oil tests with pb > 0 and unknown pr are fitted with curve_fit in a process pool.
+
+    Attributes:
+        df:         Long table with one row per test point
+        well:       Column that identifies each test
+        pressure:   Column of flowing bottom hole pressure [psi]
+        rate:       Column of rate [bbl/d for oil, Kscf/d for gas]
+        pr:         Reservoir pressure. Column name, number, or None to fit it [psi]
+        pb:         Bubble point. Column name or number. Only for oil [psi]
+        gas:        Gas. If given the tests are fitted as gas inflows
+        processes:  Worker processes for the nonlinear fits. If 1 they run serially
+        chunksize:  Tests sent to each worker per task
+
+    Return:
+        params:     Tidy table indexed by test with pr, j, pb, aof, rmse, r2, points,
+                    method and success -> Pandas DataFrame
+    """
+    assert isinstance(df,pd.DataFrame)
+    assert all(i in df.columns for i in [well,pressure,rate])
+    assert isinstance(gas,(Gas,type(None)))
+
+    codes, wells = pd.factorize(df[well], sort=True)
+    n_wells = wells.shape[0]
+    pwf = df[pressure].values.astype(float)
+    q = df[rate].values.astype(float)
+
+    def group_sum(x):
+        return np.bincount(codes, weights=x, minlength=n_wells)
+
+    def per_test(value):
+        #Column values are taken from the first row of every test
+        if isinstance(value,str):
+            return df[value].groupby(codes).first().values.astype(float)
+        return np.full(n_wells, float(value))
+
+    pb_w = np.zeros(n_wells) if gas is not None else per_test(pb)
+    points = np.bincount(codes, minlength=n_wells)
+    method = np.full(n_wells, 'linear', dtype=object)
+    success = np.ones(n_wells, dtype=bool)
+
+    #Gas is linear in m(pwf) and the linear oil curve in pwf
+    x = -gas.pseudo_pressure(pwf) if gas is not None else -pwf
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if pr is not None:
+            pr_w = per_test(pr)
+            if gas is not None:
+                basis = gas.pseudo_pressure(pr_w)[codes] + x
+            else:
+                basis = oil_pwf_to_flow(pwf, pr_w[codes], 1, pb_w[codes])
+            j_w = group_sum(basis*q) / group_sum(basis*basis)
+        else:
+            # q = a + j*x with a = j*pr or j*m(pr)
+            sx, sy = group_sum(x), group_sum(q)
+            sxx, sxy = group_sum(x*x), group_sum(x*q)
+            j_w = (points*sxy - sx*sy) / (points*sxx - sx*sx)
+            a_w = (sy - j_w*sx) / points
+            if gas is not None:
+                pr_w = gas.pseudo_pressure_to_pressure(a_w / j_w)
+            else:
+                pr_w = a_w / j_w
+
+            nonlinear = np.where(pb_w > 0)[0] if gas is None else np.array([],dtype=int)
+            if nonlinear.shape[0] > 0:
+                order = np.argsort(codes, kind='stable')
+                bounds = np.searchsorted(codes[order], np.arange(n_wells+1))
+                pwf_max = np.zeros(n_wells)
+                np.maximum.at(pwf_max, codes, pwf)
+                tasks = []
+                for w in nonlinear:
+                    rows = order[bounds[w]:bounds[w+1]]
+                    #Start from the linear estimate
+                    pr0 = pr_w[w] if np.isfinite(pr_w[w]) and pr_w[w] > pwf_max[w] else pwf_max[w] + 100
+                    j0 = j_w[w] if np.isfinite(j_w[w]) and j_w[w] > 0 else 1.0
+                    tasks.append((w, pwf[rows], q[rows], pb_w[w], [pr0, j0]))
+
+                if processes == 1:
+                    results = [_fit_oil_test(t) for t in tasks]
+                else:
+                    with ProcessPoolExecutor(max_workers=processes) as executor:
+                        results = list(executor.map(_fit_oil_test, tasks, chunksize=chunksize))
+
+                for w, pr_fit, j_fit, ok in results:
+                    pr_w[w], j_w[w], success[w] = pr_fit, j_fit, ok
+                method[nonlinear] = 'curve_fit'
+
+        #Diagnostics
+        if gas is not None:
+            q_hat = j_w[codes] * (gas.pseudo_pressure(pr_w)[codes] + x)
+            aof = j_w * gas.pseudo_pressure(pr_w)
+        else:
+            q_hat = oil_pwf_to_flow(pwf, pr_w[codes], j_w[codes], pb_w[codes])
+            aof = oil_aof(pr_w, j_w, pb_w)
+        residuals = q - q_hat
+        q_mean = group_sum(q) / points
+        sse = group_sum(residuals*residuals)
+        sst = group_sum(np.power(q - q_mean[codes],2))
+        rmse = np.sqrt(sse/points)
+        r2 = 1 - sse/sst
+
+    success &= np.isfinite(j_w) & np.isfinite(pr_w)
+
+    params = pd.DataFrame({
+        'pr':pr_w,
+        'j':j_w,
+        'pb':pb_w,
+        'aof':aof,
+        'rmse':rmse,
+        'r2':r2,
+        'points':points,
+        'method':method,
+        'success':success
+    }, index=pd.Index(wells, name=well))
+
+    if gas is not None:
+        params = params.drop(columns='pb')
+    return params
+
 class OilInflow:
 
     def __init__(self,**kwargs):
@@ -320,6 +522,13 @@ class OilInflow:
                 self.pr = pr
                 self.j = popt[0]
 
+    @staticmethod
+    def fit_batch(df, well='well', pressure='pwf', rate='q', pr=None, pb=0, **kwargs):
+        """
+        Fit the oil inflow curves of many well tests. See inflow_fit_batch
+        """
+        return inflow_fit_batch(df, well=well, pressure=pressure, rate=rate, pr=pr, pb=pb, **kwargs)
+
 class GasInflow:
 
     def __init__(self,**kwargs):
@@ -356,7 +565,7 @@ class GasInflow:
 
     @gas.setter
     def gas(self,value):
-        assert isinstance(value,gas), f'{type(value)} not accepted. Name must be gas type'
+        assert isinstance(value,(Gas,type(None))), f'{type(value)} not accepted. Name must be gas type'
         self._gas = value
 
     @property
@@ -370,12 +579,11 @@ class GasInflow:
 
     @property
     def aof(self):
-        _,_aof = gas_inflow_curve(self.pr,self.j,self.gas.pvt,n=self._n)
-        return _aof
+        return self.j * self.gas.pseudo_pressure(self.pr).item()
 
     @property
     def df(self):
-        _df,_ = gas_inflow_curve(self.pr,self.j,self.gas.pvt,n=self._n)
+        _df,_ = gas_inflow_curve(self.pr,self.j,self.gas,n=self._n)
         return _df
 
 
@@ -401,34 +609,31 @@ class GasInflow:
 #####################################################
 ############## methods ###########################
             
+    # q = j * (m(pr) - m(pwf)). The pseudo-pressure table of the gas is cached,
+    # so any array of pwf or q is evaluated with a single interpolation
     def pwf_to_flow(self, pwf):
-        _df = self.df
-        _pwf_to_flow = interp1d(_df['p'],_df['q'])
         pwf = np.atleast_1d(pwf)
-        q = _pwf_to_flow(pwf)
+        mp = self.gas.pseudo_pressure(np.append(pwf,self._pr))
+        q = self._j * (mp[-1] - mp[:-1])
         return q
     
     def flow_to_pwf(self, q):
-        _df = self.df
-        _flow_to_pwf = interp1d(_df['q'],_df['p'])
         q = np.atleast_1d(q)
-        pwf = _flow_to_pwf(q)
+        mp_pwf = self.gas.pseudo_pressure(self._pr) - q / self._j
+        if np.any(mp_pwf < 0):
+            raise ValueError(f'Rates above the AOF ({self.aof:.2f} Kscf/d) have no pwf')
+        pwf = self.gas.pseudo_pressure_to_pressure(mp_pwf)
         return pwf
     
     def flow_to_dd(self, q):
-        _df = self.df
-        _flow_to_pwf = interp1d(_df['q'],_df['p'])        
-        q = np.atleast_1d(q)
-        pwf = _flow_to_pwf(q)
+        pwf = self.flow_to_pwf(q)
         dd = self._pr - pwf
         return dd
     
     def dd_to_flow(self, dd):
-        _df = self.df
-        _pwf_to_flow = interp1d(_df['p'],_df['q'])
         dd = np.atleast_1d(dd)
         pwf = self._pr - dd
-        q = _pwf_to_flow(pwf)
+        q = self.pwf_to_flow(pwf)
         return q
 
     
@@ -450,8 +655,8 @@ class GasInflow:
                 
         oax = ax or plt.gca()
         _df = self.df
-        _flow_to_pwf = interp1d(_df['q'],_df['p']) 
-        _pwf_to_flow = interp1d(_df['p'],_df['q'])
+        _flow_to_pwf = self.flow_to_pwf
+        _pwf_to_flow = self.pwf_to_flow
         oax.plot(_df['q'],_df['p'],**kwargs)
         oax.set_xlabel("Flow Rate [kscf/d]")
         oax.set_ylabel("Pwf [psi]")
@@ -477,30 +682,28 @@ class GasInflow:
             oax.legend()
 
     def fit(self,df, pressure=None,rate=None,xdata='pressure',n=10, pr=None):
+        #The pseudo-pressure of the data points does not change during the fit
+        mp_table = self.gas.pseudo_pressure_table
+        inverse_table = {'pressure':mp_table['mp'],'p':mp_table['pressure']}
+
+        def mp(p):
+            return interpolate_arrays(mp_table, p, property='mp')['mp']
+
+        def mp_to_p(m):
+            return interpolate_arrays(inverse_table, m, property='p')['p']
 
         if xdata == 'pressure':
+            mp_pwf = mp(df[pressure].values)
             if pr is None:
                 def cost_function(pwf,res_pres,j):
-
-                    data, _ = gas_inflow_curve(res_pres,j,self.gas.pvt,n=n)
-
-                    _pwf_to_flow = interp1d(data['p'],data['q'],fill_value='extrapolate')
-                    pwf = np.atleast_1d(pwf)
-                    q = _pwf_to_flow(pwf)
-                    return q
+                    return j * (mp(res_pres) - mp_pwf)
 
                 popt, _ = curve_fit(cost_function, df[pressure].values, df[rate].values, bounds=(0, [30000, np.inf]))
                 self.pr = popt[0]
                 self.j = popt[1]
             else:
                 def cost_function(pwf,j):
-
-                    data, _ = gas_inflow_curve(pr,j,self.gas.pvt,n=n)
-
-                    _pwf_to_flow = interp1d(data['p'],data['q'],fill_value='extrapolate')
-                    pwf = np.atleast_1d(pwf)
-                    q = _pwf_to_flow(pwf)
-                    return q
+                    return j * (mp(pr) - mp_pwf)
 
                 popt, _ = curve_fit(cost_function, df[pressure].values, df[rate].values, bounds=(0, np.inf))
                 self.pr = pr
@@ -510,32 +713,192 @@ class GasInflow:
 
             if pr is None:
                 def cost_function(rate,res_pres,j):
-
-                    data, _ = gas_inflow_curve(res_pres,j,self.gas.pvt,n=n)
-
-                    _flow_to_pwf = interp1d(data['q'],data['p'],fill_value='extrapolate')
                     rate = np.atleast_1d(rate)
-                    pwf = _flow_to_pwf(rate)
-                    return pwf
+                    return mp_to_p(mp(res_pres) - rate/j)
 
                 popt, _ = curve_fit(cost_function, df[rate].values, df[pressure].values, bounds=(0, [np.inf, 30000]))
                 self.pr = popt[0]
                 self.j = popt[1]
             else:
                 def cost_function(rate,j):
-
-                    data, _ = gas_inflow_curve(pr,j,self.gas.pvt,n=n)
-
-                    _flow_to_pwf = interp1d(data['q'],data['p'],fill_value='extrapolate')
                     rate = np.atleast_1d(rate)
-                    pwf = _flow_to_pwf(rate)
-                    return pwf
+                    return mp_to_p(mp(pr) - rate/j)
 
                 popt, _ = curve_fit(cost_function, df[rate].values, df[pressure].values, bounds=(0, np.inf))
                 self.pr = pr
                 self.j = popt[0]
 
+    def fit_batch(self, df, well='well', pressure='pwf', rate='q', pr=None, **kwargs):
+        """
+        Fit the gas inflow curves of many well tests with the pseudo-pressure of this
+        inflow's gas. See inflow_fit_batch
+        """
+        return inflow_fit_batch(df, well=well, pressure=pressure, rate=rate, pr=pr, gas=self.gas, **kwargs)
+
+class InflowSet:
+    """InflowSet [Inflow curves of many wells or time steps held as arrays. Every method
+    evaluates all of them in a single broadcast]
+
+    Parameters
+    ----------
+    pr : np.ndarray
+        [Reservoir pressure of every inflow in psi]
+    j : np.ndarray
+        [Productivity index of every inflow. bbl/d/psi for oil and Kscf/d/(psi^2/cP) for gas]
+    pb : np.ndarray, optional
+        [Bubble point pressure in psi. Only for oil], by default 0
+    gas : Gas, optional
+        [If given the inflows are gas inflows evaluated with its pseudo-pressure], by default None
+    index : list, optional
+        [Names of the inflows], by default None
+    n : int, optional
+        [Number of points of every curve in df], by default 20
+    """
+    def __init__(self,**kwargs):
+        self.pr = kwargs.pop('pr',None)
+        self.j = kwargs.pop('j',None)
+        self.pb = kwargs.pop('pb',0)
+        self.gas = kwargs.pop('gas',None)
+        self.index = kwargs.pop('index',None)
+        self.n = kwargs.pop('n',20)
 
+#####################################################
+############## Properties ###########################
 
+    @property
+    def pr(self):
+        return self._pr
 
+    @pr.setter
+    def pr(self,value):
+        assert isinstance(value,(int,float,list,np.ndarray,pd.Series)), f'{type(value)} not accepted. Name must be array'
+        self._pr = np.atleast_1d(np.asarray(value,dtype=float))
+
+    @property
+    def j(self):
+        return self._j
+
+    @j.setter
+    def j(self,value):
+        assert isinstance(value,(int,float,list,np.ndarray,pd.Series)), f'{type(value)} not accepted. Name must be array'
+        self._j = np.broadcast_to(np.asarray(value,dtype=float),self._pr.shape)
+
+    @property
+    def pb(self):
+        return self._pb
+
+    @pb.setter
+    def pb(self,value):
+        if value is None:
+            value = 0
+        assert isinstance(value,(int,float,list,np.ndarray,pd.Series)), f'{type(value)} not accepted. Name must be array'
+        self._pb = np.broadcast_to(np.asarray(value,dtype=float),self._pr.shape)
+
+    @property
+    def gas(self):
+        return self._gas
 
+    @gas.setter
+    def gas(self,value):
+        assert isinstance(value,(Gas,type(None))), f'{type(value)} not accepted. Name must be gas type'
+        self._gas = value
+
+    @property
+    def index(self):
+        return self._index
+
+    @index.setter
+    def index(self,value):
+        if value is None:
+            value = np.arange(self._pr.shape[0])
+        assert len(value) == self._pr.shape[0], 'index must have one name per inflow'
+        self._index = pd.Index(value)
+
+    @property
+    def n(self):
+        return self._n
+
+    @n.setter
+    def n(self,value):
+        assert isinstance(value,int), f'{type(value)} not accepted. Name must be int'
+        self._n = value
+
+    @property
+    def aof(self):
+        if self.gas is not None:
+            return self._j * self.gas.pseudo_pressure(self._pr)
+        return oil_aof(self._pr,self._j,self._pb)
+
+    @property
+    def df(self):
+        #Pressure grid of shape (inflows, n)
+        p = np.linspace(0,1,self._n)[np.newaxis,:] * self._pr[:,np.newaxis]
+        q = self.pwf_to_flow(p)
+        return pd.DataFrame({
+            'inflow':np.repeat(self._index.values,self._n),
+            'p':p.ravel(),
+            'q':q.ravel()
+        })
+
+    def __len__(self):
+        return self._pr.shape[0]
+
+    def __repr__(self):
+        return f"InflowSet: {len(self)} {'gas' if self.gas is not None else 'oil'} inflows"
+
+#####################################################
+############## methods ###########################
+
+    @classmethod
+    def from_inflows(cls, inflows, **kwargs):
+        """from_inflows [Build the set from a list or dict of OilInflow or GasInflow objects]"""
+        assert isinstance(inflows,(list,dict))
+        index = list(inflows.keys()) if isinstance(inflows,dict) else None
+        inflows = list(inflows.values()) if isinstance(inflows,dict) else inflows
+        gas = None
+        pb = 0
+        if all(isinstance(i,GasInflow) for i in inflows):
+            gas = inflows[0].gas
+            assert all(i.gas is gas for i in inflows), 'All the gas inflows must share the same Gas'
+        else:
+            assert all(isinstance(i,OilInflow) for i in inflows)
+            pb = [i.pb for i in inflows]
+        return cls(
+            pr=[i.pr for i in inflows],
+            j=[i.j for i in inflows],
+            pb=pb,
+            gas=gas,
+            index=index,
+            **kwargs
+        )
+
+    # The pwf, q or dd arguments are broadcasted against the inflows. A 1D array with one
+    # value per inflow gives one result per inflow, an array of shape (inflows, m) gives
+    # m results per inflow
+    def _broadcast(self, value):
+        value = np.asarray(value,dtype=float)
+        if value.ndim == 2:
+            return value, self._pr[:,np.newaxis], self._j[:,np.newaxis], self._pb[:,np.newaxis]
+        return value, self._pr, self._j, self._pb
+
+    def pwf_to_flow(self, pwf):
+        pwf, pr, j, pb = self._broadcast(pwf)
+        if self.gas is not None:
+            return j * (self.gas.pseudo_pressure(pr) - self.gas.pseudo_pressure(pwf))
+        return oil_pwf_to_flow(pwf,pr,j,pb)
+
+    def flow_to_pwf(self, q):
+        q, pr, j, pb = self._broadcast(q)
+        if self.gas is not None:
+            mp_pwf = self.gas.pseudo_pressure(pr) - q / j
+            #Rates above the AOF return NaN as the oil inflows
+            return np.where(mp_pwf < 0, np.nan, self.gas.pseudo_pressure_to_pressure(np.maximum(mp_pwf,0)))
+        return oil_flow_to_pwf(q,pr,j,pb)
+
+    def flow_to_dd(self, q):
+        q, pr, _, _ = self._broadcast(q)
+        return pr - self.flow_to_pwf(q)
+
+    def dd_to_flow(self, dd):
+        dd, pr, _, _ = self._broadcast(dd)
+        return self.pwf_to_flow(pr - dd)
@@ -1,6 +1,8 @@
 import numpy as np 
 import pandas as pd 
-from .outflow import one_phase_pressure_profile, two_phase_pressure_profile, two_phase_outflow_curve, two_phase_upward_pressure
+from copy import copy
+from concurrent.futures import ProcessPoolExecutor
+from .outflow import one_phase_pressure_profile, two_phase_pressure_profile, two_phase_outflow_curve, two_phase_upward_pressure, two_phase_pressure_profile_batch
 from .als import Als
 from .inflow import OilInflow
 from ...pvtpy.black_oil import Pvt,Oil,Gas,Water
@@ -42,6 +44,41 @@ def minimum_suction_area(
 
     return acm
 
+def _jet_pump_chunk(args):
+    """_jet_pump_chunk [Flow match a chunk of pump configurations. Module level to be picklable by the process pool]"""
+    pump, tasks, match_kw = args
+    pump = copy(pump)
+    match_keys = ['qs','qo','qg','qn','pwf','pps','ppd','pn','fpd','fmfd1','acm','hp']
+    rows = []
+    for brand, nozzle, throat, injection_pressure in tasks:
+        pump.nozzle = nozzle
+        pump.throat = throat
+        row = {
+            'brand':brand,
+            'nozzle':nozzle,
+            'throat':throat,
+            'fad':pump.fad(),
+            'injection_pressure':injection_pressure,
+            'annulus_area':pump.annulus_area()
+        }
+        try:
+            df, qs = pump.flow_match(injection_pressure=injection_pressure, **match_kw)
+            #The last row only holds the new rates. The other variables come from the previous one
+            last = df.iloc[-2]
+            row.update({k:last[k] for k in match_keys})
+            row.update({k:df[k].iloc[-1] for k in ['qs','qo','qg']})
+            row['iterations'] = df.shape[0] - 1
+            row['converged'] = last['error'] <= match_kw.get('tol',0.05)
+            row['error'] = None
+        except (ValueError, RuntimeError) as e:
+            #Rates beyond the inflow AOF or profiles that do not converge
+            row.update({k:np.nan for k in match_keys})
+            row['iterations'] = 0
+            row['converged'] = False
+            row['error'] = str(e)
+        rows.append(row)
+    return rows
+
 class JetPump(Als):
     def __init__(self,**kwargs):
         self.n = kwargs.pop('n',15)
@@ -57,7 +94,7 @@ class JetPump(Als):
         self.return_di = kwargs.pop('return_di',5)
         self.prod_di = kwargs.pop('prod_di',5)
         self.kn = kwargs.pop('kn',0.03)
-        self.ktd = kwargs.pop('kn',0.2)
+        self.ktd = kwargs.pop('ktd',0.2)
 
         super().__init__(**kwargs)
 
@@ -355,8 +392,9 @@ class JetPump(Als):
         tol = 0.05,
         tol_profile = 0.05,
         tol_qn = 0.05,
-        method_profile = 'hagedorn_brown'
-
+        method_profile = 'hagedorn_brown',
+        suction_table = None,
+        verbose = True
     ):
         """flow_match [
             Estimate the production rate in a Jet pump Configuracion and 
@@ -381,18 +419,24 @@ class JetPump(Als):
         :type gas_obj: [type], optional
         :param water_obj: [description], defaults to None
         :type water_obj: [type], optional
+        :param suction_table: [Pump intake pressure against liquid rate (rates, pps) as returned
+            by suction_table. If given the intake pressure is interpolated instead of solving the
+            profile from the perforations to the pump. Rates above the table raise a ValueError], defaults to None
+        :type suction_table: [tuple], optional
+        :param verbose: [Print the iterations], defaults to True
+        :type verbose: [bool], optional
         """
         #Assert Thp value
         assert isinstance(injection_pressure,(int,float,np.int64,np.float64))
         assert isinstance(return_pressure,(int,float,np.int64,np.float64))
 
         #Assert Inflow Curve is of type inflow
-        assert isinstance(inflow,oil_inflow)
+        assert isinstance(inflow,OilInflow)
 
         #Assert Oil, water, Gas are pvtpy.black_oil type and have pvt attribute
-        assert isinstance(oil_obj,oil) and oil_obj.pvt is not None
-        assert isinstance(gas_obj,gas) and gas_obj.pvt is not None
-        assert isinstance(water_obj,water) and water_obj.pvt is not None
+        assert isinstance(oil_obj,Oil) and oil_obj.pvt is not None
+        assert isinstance(gas_obj,Gas) and gas_obj.pvt is not None
+        assert isinstance(water_obj,Water) and water_obj.pvt is not None
 
         #Assert initial flow guess
         assert isinstance(liquid_rate_guess,(int,float,np.int64,np.float64))
@@ -489,27 +533,32 @@ class JetPump(Als):
             pwf[i] = inflow.flow_to_pwf(qs[i])
 
             #Estimate pps - Pump intake pressure
-            pps[i] = two_phase_upward_pressure(
-                depth = self.pump_to_perf_depth_tvd,
-                pwf = pwf[i],
-                liquid_rate = qs[i],
-                oil_rate = None,
-                gas_rate = gas_rate,
-                glr = glr,
-                gor = gor,
-                bsw = bsw,
-                oil_obj = oil_obj,
-                gas_obj = gas_obj,
-                water_obj = water_obj, 
-                epsilon=epsilon, 
-                surface_temperature=surface_temperature, 
-                temperature_gradient=temperature_gradient,  
-                di=self.prod_di, 
-                tol=tol_profile,
-                max_iter = max_iter_profile,
-                method = method_profile,
-                guess=[pwf[i], pwf[i]*0.9]
-            )
+            if suction_table is not None:
+                pps[i] = np.interp(qs[i], suction_table[0], suction_table[1], right=np.nan)
+                if not np.isfinite(pps[i]):
+                    raise ValueError(f'Liquid rate {qs[i]:.2f} bbl/d is beyond the rates the well can lift to the pump')
+            else:
+                pps[i] = two_phase_upward_pressure(
+                    depth = self.pump_to_perf_depth_tvd,
+                    pwf = pwf[i],
+                    liquid_rate = qs[i],
+                    oil_rate = None,
+                    gas_rate = gas_rate,
+                    glr = glr,
+                    gor = gor,
+                    bsw = bsw,
+                    oil_obj = oil_obj,
+                    gas_obj = gas_obj,
+                    water_obj = water_obj, 
+                    epsilon=epsilon, 
+                    surface_temperature=surface_temperature, 
+                    temperature_gradient=temperature_gradient,  
+                    di=self.prod_di, 
+                    tol=tol_profile,
+                    max_iter = max_iter_profile,
+                    method = method_profile,
+                    guess=[pwf[i], pwf[i]*0.9]
+                )
             # Suction Gradient
             gs[i] = (pwf[i] - pps[i]) / np.abs(self.pump_to_perf_depth_tvd[0] - self.pump_to_perf_depth_tvd[-1])
             #gor
@@ -612,9 +661,9 @@ class JetPump(Als):
                     epsilon=epsilon,
                     md=self.surf_to_pump_depth_tvd *-1,
                     tvd=self.surf_to_pump_depth_tvd *-1,
-                    d = self.injection_di,
-                    rate = qn[i],
-                    mu = mur,
+                    d = self.return_di,
+                    rate = qd[i],
+                    mu = mur[i],
                     backwards=-1
                     )
 
@@ -666,7 +715,8 @@ class JetPump(Als):
             _gor[i+1] = qg[i+1]*1e3 / qo[i+1]
             _glr[i+1] = qg[i+1]*1e3 / qs[i+1] 
 
-            print(f'\r Iteration {i}: -> Liquid Rate: {qs[i]:.0f} bbl -> pip: {pps[i]:.0f} psi -> error {er_it[i]*100:.0f}%', sep='',end='', flush=True)
+            if verbose:
+                print(f'\r Iteration {i}: -> Liquid Rate: {qs[i]:.0f} bbl -> pip: {pps[i]:.0f} psi -> error {er_it[i]*100:.0f}%', sep='',end='', flush=True)
             i += 1
 
         df_dict = {
@@ -702,3 +752,168 @@ class JetPump(Als):
 
         return df, qs_final
 
+    def suction_table(
+        self,
+        inflow = None,
+        bsw = None,
+        gas_rate = None,
+        gor = None,
+        glr = None,
+        oil_obj=None,
+        gas_obj=None,
+        water_obj=None, 
+        epsilon = 0.0006,
+        surface_temperature=80, 
+        temperature_gradient=1, 
+        tol = 0.05,
+        max_iter = 20,
+        method = 'hagedorn_brown',
+        n_rates = 30,
+        n_pressures = 30
+    ):
+        """suction_table [
+            Pump intake pressure against liquid rate. The section from the perforations to the pump
+            does not depend on the pump configuration, so the profiles of a grid of intake pressures
+            and rates are marched at once and the intake pressure that matches the inflow pwf is
+            interpolated for every rate. Rates the well can not lift to the pump are left out.
+            ]
+
+        :param inflow: [Inflow of the well], defaults to None
+        :type inflow: [OilInflow], optional
+        :param n_rates: [Number of liquid rates between zero and the aof], defaults to 30
+        :type n_rates: int, optional
+        :param n_pressures: [Number of intake pressures between 14.7 psi and pr], defaults to 30
+        :type n_pressures: int, optional
+        :return: [Liquid rates [bbl/d] the well can lift and their intake pressures [psi]]
+        :rtype: [tuple]
+        """
+        assert isinstance(inflow,OilInflow)
+        assert self.pump_to_perf_depth_tvd is not None
+        assert isinstance(bsw,(int,float)) and bsw >= 0 and bsw <= 1
+
+        rates = np.linspace(0,inflow.aof,n_rates+1)[1:]
+        pressures = np.linspace(14.7,inflow.pr,n_pressures)
+        pwf = np.atleast_1d(inflow.flow_to_pwf(rates))
+
+        pps_grid, rate_grid = np.meshgrid(pressures, rates)
+
+        if gas_rate is not None:
+            gas_grid = np.full(rate_grid.shape, gas_rate, dtype=float)
+        elif gor is not None:
+            gas_grid = gor * rate_grid * (1 - bsw) * 1e-3
+        else:
+            gas_grid = glr * rate_grid * 1e-3
+
+        profiles = two_phase_pressure_profile_batch(
+            depth = self.pump_to_perf_depth_tvd,
+            thp = pps_grid.flatten(),
+            liquid_rate = rate_grid.flatten(),
+            gas_rate = gas_grid.flatten(),
+            bsw = bsw,
+            oil_obj = oil_obj,
+            gas_obj = gas_obj,
+            water_obj = water_obj, 
+            epsilon=epsilon, 
+            surface_temperature=surface_temperature, 
+            temperature_gradient=temperature_gradient,  
+            di=self.prod_di[np.newaxis,:], 
+            tol=tol,
+            max_iter = max_iter,
+            method = method,
+        )
+        bottom = profiles['pressure'][:,-1].reshape(rate_grid.shape)
+
+        #Bottom pressure increases with the intake pressure for each rate
+        pps = np.array([
+            np.interp(pwf[i], bottom[i], pressures, left=np.nan, right=np.nan) for i in range(rates.shape[0])
+        ])
+
+        liftable = np.isfinite(pps)
+        return rates[liftable], pps[liftable]
+
+    def design_sweep(
+        self,
+        catalog = None,
+        injection_pressure = None,
+        processes = None,
+        chunksize = 4,
+        n_rates = 30,
+        n_pressures = 30,
+        **kwargs
+    ):
+        """design_sweep [
+            Flow match every nozzle and throat of a catalog at every injection pressure and rank
+            the configurations. The intake pressure section is solved once with suction_table and
+            shared by all the configurations, which are distributed in a process pool.
+            ]
+
+        :param catalog: [Nozzle and throat sizes in mm. DataFrame with nozzle, throat and optionally
+            brand columns or list of (nozzle, throat) pairs], defaults to None
+        :type catalog: [pd.DataFrame, list], optional
+        :param injection_pressure: [Surface injection pressures psi], defaults to None
+        :type injection_pressure: [float, list, np.ndarray], optional
+        :param processes: [Number of worker processes. If 1 the configurations are evaluated serially], defaults to None
+        :type processes: int, optional
+        :param chunksize: [Configurations per task], defaults to 4
+        :type chunksize: int, optional
+        :param kwargs: [Arguments of flow_match]
+        :return: [Configurations ranked by production, non cavitating first. The efficiency is the
+            mass flow ratio times the pressure ratio and the cavitation margin is the fraction of the
+            throat annulus left over the minimum suction area. The error column holds the message
+            of the configurations that could not be matched]
+        :rtype: [pd.DataFrame]
+        """
+        if isinstance(catalog,pd.DataFrame):
+            assert all(i in catalog.columns for i in ['nozzle','throat'])
+            catalog = catalog.copy()
+        else:
+            catalog = pd.DataFrame(np.atleast_2d(catalog), columns=['nozzle','throat'])
+        if 'brand' not in catalog.columns:
+            catalog['brand'] = self.brand
+
+        assert isinstance(injection_pressure,(int,float,list,np.ndarray))
+        injection_pressure = np.atleast_1d(injection_pressure).astype(float)
+
+        kwargs['verbose'] = False
+        if kwargs.get('suction_table') is None:
+            kwargs['suction_table'] = self.suction_table(
+                inflow = kwargs.get('inflow'),
+                bsw = kwargs.get('bsw'),
+                gas_rate = kwargs.get('gas_rate'),
+                gor = kwargs.get('gor'),
+                glr = kwargs.get('glr'),
+                oil_obj = kwargs.get('oil_obj'),
+                gas_obj = kwargs.get('gas_obj'),
+                water_obj = kwargs.get('water_obj'),
+                epsilon = kwargs.get('epsilon',0.0006),
+                surface_temperature = kwargs.get('surface_temperature',80),
+                temperature_gradient = kwargs.get('temperature_gradient',1),
+                tol = kwargs.get('tol_profile',0.05),
+                max_iter = kwargs.get('max_iter_profile',20),
+                method = kwargs.get('method_profile','hagedorn_brown'),
+                n_rates = n_rates,
+                n_pressures = n_pressures
+            )
+
+        configurations = [
+            (r['brand'], float(r['nozzle']), float(r['throat']), p) 
+            for _, r in catalog.iterrows() for p in injection_pressure
+        ]
+        tasks = [(self, configurations[i:i+chunksize], kwargs) for i in range(0,len(configurations),chunksize)]
+
+        if processes == 1:
+            results = [_jet_pump_chunk(t) for t in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                results = list(executor.map(_jet_pump_chunk, tasks))
+
+        df = pd.DataFrame([row for rows in results for row in rows])
+        df['efficiency'] = df['fmfd1'] * df['fpd']
+        df['cavitation_margin'] = (df['annulus_area'] - df['acm']) / df['annulus_area']
+        df['cavitation'] = df['cavitation_margin'] < 0
+
+        df = df.sort_values(
+            ['converged','cavitation','qo','efficiency'], ascending=[False,True,False,False], na_position='last'
+        ).reset_index(drop=True)
+        df.index.name = 'rank'
+        return df
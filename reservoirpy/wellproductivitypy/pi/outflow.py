@@ -1,10 +1,11 @@
 import numpy as np
 import pandas as pd 
+import warnings
 import matplotlib.pyplot as plt
 from ...pvtpy.black_oil import Pvt,Oil,Water,Gas
 from scipy.optimize import root_scalar
-from .inflow import OilInflow, GasInflow
-from ...utils import intercept_curves
+from .inflow import OilInflow, GasInflow, InflowSet, oil_flow_to_pwf
+from ...utils import intercept_curves_batch, bracketed_root
 from typing import Union
 
 ## Incompressible pressure drop
@@ -310,7 +311,7 @@ def gas_pressure_profile_correlation(thp,sg,depth):
 
 
 
-def gas_pressure_profile(
+def gas_pressure_profile_batch(
     md = None, 
     inc = None, 
     thp = None, 
@@ -323,11 +324,16 @@ def gas_pressure_profile(
     tol = 0.05, 
     max_iter=20):
     """
-    To calculate the pressure drop in a gas well, the compressibility of the fluid must be considered. When
-    the fluid is compressible, the fluid density and fluid velocity vary along the pipe, and these variations
-    must be included when integrating the mechanical energy balance equation.
+    Gas pressure profiles of many cases marched together. thp, rate and di are broadcasted
+    to one value per case and every depth step advances all the cases at once. Each case
+    keeps iterating its gradient until it converges, exactly like gas_pressure_profile.
+    PVT properties come from the cached numpy tables of the gas.
 
     Petroleum Production Systems, Economides. Chapter 7 7.3. Single-Phase Flow of a Compressible, Newtonian Fluid. Page 175
+
+    Return:
+        profiles:   dict with pressure, pressure_gradient and iterations of shape (cases, depth)
+                    and temperature of shape (depth,)
     """
     # Assert the right types and shapes for input
     assert isinstance(md, (np.ndarray,pd.Series))
@@ -335,98 +341,155 @@ def gas_pressure_profile(
     assert  md.ndim ==1
 
     assert isinstance(inc, (int,float,np.ndarray,pd.Series))
-    if isinstance(inc,np.ndarray):
+    if isinstance(inc,(np.ndarray,pd.Series)):
+        inc = np.asarray(inc)
         assert inc.shape == md.shape
     else:
         inc = np.full(md.shape,inc)
 
     angle = np.radians(90 - inc) 
 
-    assert isinstance(thp, (int,np.int64,np.float64,float,np.ndarray)), f'{type(thp)} not accepted'
-    thp = np.atleast_1d(thp)
-    assert thp.shape == (1,)
-
-    assert isinstance(gas_obj,gas) and gas_obj.pvt is not None
+    assert isinstance(gas_obj,Gas) and gas_obj.pvt is not None
+    assert gas_obj.sg is not None
 
-    assert isinstance(di, (int,float,np.ndarray))
-    if isinstance(di,np.ndarray):
-        assert di.shape == md.shape
+    assert isinstance(thp, (int,np.int64,np.float64,float,list,np.ndarray)), f'{type(thp)} not accepted'
+    assert isinstance(rate, (int,np.int64,np.float64,float,list,np.ndarray))
+    assert isinstance(di, (int,float,list,np.ndarray))
+    thp = np.atleast_1d(np.asarray(thp,dtype=float))
+    rate = np.atleast_1d(np.asarray(rate,dtype=float))
+    di = np.asarray(di,dtype=float)
+
+    #di may be given per case (cases,) or per case and depth (cases, depth)
+    if di.ndim == 2:
+        assert di.shape[1] == md.shape[0]
+        thp, rate, _ = np.broadcast_arrays(thp, rate, di[:,0])
+        di = np.broadcast_to(di,(thp.shape[0],md.shape[0]))
     else:
-        di = np.full(md.shape,di)
-
-    assert isinstance(rate, (int,float,np.ndarray))
-    rate = np.atleast_1d(rate)
-    assert rate.shape == (1,)
-
-    assert gas_obj.sg is not None
+        thp, rate, di = np.broadcast_arrays(thp, rate, np.atleast_1d(di))
+        di = np.repeat(di[:,np.newaxis],md.shape[0],axis=1)
+    assert thp.ndim == 1
+    n_cases = thp.shape[0]
 
     #Create the variables
+    pressure_profile = np.zeros((n_cases,md.shape[0]))
+    pressure_gradient = np.zeros((n_cases,md.shape[0]))
+    iterations = np.zeros((n_cases,md.shape[0]))
+    pressure_profile[:,0] = thp
 
-    pressure_profile = np.zeros(md.shape)
-    temperature_profile = np.zeros(md.shape)
-    pressure_gradient = np.zeros(md.shape)
-    pressure_profile[0] = thp
-    temperature_profile[0] = surf_temp
-
-    interations = np.zeros(md.shape)
+    #Temperature does not depend on the case
+    dz_all = np.sin(angle[1:])*np.diff(md)
+    temperature_profile = surf_temp + np.append(0,np.cumsum(dz_all*(temp_grad/100)))
 
     if gas_obj.chromatography is not None:
-        df_rho = gas_obj.chromatography.get_rhog(p=thp,t=surf_temp, rhog_method='real_gas')
+        grad_guess = gas_obj.chromatography.get_rhog(p=thp,t=surf_temp, rhog_method='real_gas')['rhog'].values*(0.433/62.4)
     else:
-        df_rho = gas_obj.pvt.interpolate(thp,property='rhog')
+        grad_guess = gas_obj.interpolate_arrays(thp,property='rhog')['rhog']*(0.433/62.4)
+    grad_guess = np.broadcast_to(grad_guess,(n_cases,)).copy()
 
-    grad_guess = df_rho['rhog'].values*(0.433/62.4)
+    gas_sg = gas_obj.sg
+    p_new = np.zeros(n_cases)
+    grad_new = np.zeros(n_cases)
 
     #Loop over depth
     for i in range(1,md.shape[0]):
-        err = tol + 0.01
-        dz = np.sin(angle[i])*(md[i]-md[i-1])
-        gas_sg = gas_obj.sg
-        it = 0
-        while err>= tol and it <= max_iter:
-            p_guess = grad_guess*(md[i]-md[i-1])*np.sin(angle[i]) + pressure_profile[i-1]
+        dz = dz_all[i-1]
+        p_prev = pressure_profile[:,i-1]
+        t_abs = temperature_profile[i]+460
+        err = np.full(n_cases,tol + 0.01)
+        it = np.zeros(n_cases)
+        active = np.ones(n_cases,dtype=bool)
+
+        while active.any():
+            p_guess = grad_guess[active]*(md[i]-md[i-1])*np.sin(angle[i]) + p_prev[active]
 
             #Interpolate pvt
-            df_pvt = gas_obj.pvt.interpolate(p_guess)
+            pvt_int = gas_obj.interpolate_arrays(p_guess,property=['mug','z'])
 
             #Reynolds Number
-            #nre = (4*28.97*gas_obj.sg*rate*14.7)/(np.pi*di[i]*df_pvt['mug'].values*10.73*520)
-            nre = 20.09*(gas_sg*rate)/(di[i]*df_pvt['mug'].values)
+            nre = 20.09*(gas_sg*rate[active])/(di[active,i]*pvt_int['mug'])
 
             #Friction Factor
             friction = np.power((1/(-4*np.log10((epsilon/3.7065)-(5.0452/nre)*np.log10((np.power(epsilon,1.1098)/2.8257)+np.power(7.149/nre,0.8981))))),2)
 
-            #Temperature
-            temperature_profile[i] = dz * (temp_grad/100) + temperature_profile[i-1]
-
             #S
-            s = (-0.0375*gas_obj.sg*dz)/(df_pvt['z'].values*(temperature_profile[i]+460))
+            s = (-0.0375*gas_obj.sg*dz)/(pvt_int['z']*t_abs)
 
             #Calculate next pressure by parts for easily read
-            a = np.exp(-s) * np.power(pressure_profile[i-1],2)
-            b = (friction*np.power(df_pvt['z'].values*(temperature_profile[i]+460)*rate,2))/(np.sin(angle[i])*np.power(di[i],5))
+            a = np.exp(-s) * np.power(p_prev[active],2)
+            b = (friction*np.power(pvt_int['z']*t_abs*rate[active],2))/(np.sin(angle[i])*np.power(di[active,i],5))
             c = 1 - np.exp(-s)
 
-            p_new = np.sqrt(a - (2.685e-3*b*c))
-            grad_new = (p_new - pressure_profile[i-1])/dz
+            p_new[active] = np.sqrt(a - (2.685e-3*b*c))
+            grad_new[active] = (p_new[active] - p_prev[active])/dz
 
-            err = np.abs(grad_guess-grad_new)/grad_new
-            grad_guess = grad_new
-            it +=1
-        
-        pressure_gradient[i] = grad_new
-        pressure_profile[i] = p_new
-        interations[i] = it
+            err[active] = np.abs(grad_guess[active]-grad_new[active])/grad_new[active]
+            grad_guess[active] = grad_new[active]
+            it[active] += 1
 
-    df_dict = {
+            #Cases stop iterating independently
+            active &= (err >= tol) & (it <= max_iter)
+
+        pressure_gradient[:,i] = grad_new
+        pressure_profile[:,i] = p_new
+        iterations[:,i] = it
+
+    return {
         'pressure':pressure_profile,
-        'pressure_gradient': pressure_gradient,
-        'temperature': temperature_profile,
-        'iterations': interations
+        'pressure_gradient':pressure_gradient,
+        'temperature':temperature_profile,
+        'iterations':iterations
+    }
+
+def gas_pressure_profile(
+    md = None, 
+    inc = None, 
+    thp = None, 
+    rate = None, 
+    gas_obj = None,
+    di=2.99,
+    surf_temp=80,
+    temp_grad=1,
+    epsilon = 0.0006, 
+    tol = 0.05, 
+    max_iter=20):
+    """
+    To calculate the pressure drop in a gas well, the compressibility of the fluid must be considered. When
+    the fluid is compressible, the fluid density and fluid velocity vary along the pipe, and these variations
+    must be included when integrating the mechanical energy balance equation.
+
+    Petroleum Production Systems, Economides. Chapter 7 7.3. Single-Phase Flow of a Compressible, Newtonian Fluid. Page 175
+    """
+    assert isinstance(md, (np.ndarray,pd.Series))
+    md = np.atleast_1d(md)
+
+    assert isinstance(thp, (int,np.int64,np.float64,float,np.ndarray)), f'{type(thp)} not accepted'
+    thp = np.atleast_1d(thp)
+    assert thp.shape == (1,)
+
+    assert isinstance(rate, (int,float,np.ndarray))
+    rate = np.atleast_1d(rate)
+    assert rate.shape == (1,)
+
+    #Diameter along the depth is a single case with a diameter per segment
+    assert isinstance(di, (int,float,np.ndarray))
+    if isinstance(di,np.ndarray):
+        assert di.shape == md.shape
+        di = di[np.newaxis,:]
+
+    profiles = gas_pressure_profile_batch(
+        md=md, inc=inc, thp=thp, rate=rate, gas_obj=gas_obj, di=di,
+        surf_temp=surf_temp, temp_grad=temp_grad, epsilon=epsilon, tol=tol, max_iter=max_iter
+    )
+
+    df_dict = {
+        'pressure':profiles['pressure'][0],
+        'pressure_gradient': profiles['pressure_gradient'][0],
+        'temperature': profiles['temperature'],
+        'iterations': profiles['iterations'][0]
     }
 
     df = pd.DataFrame(df_dict, index = md)
-    pwf = pressure_profile[-1]
+    pwf = profiles['pressure'][0,-1]
 
     return df, pwf
 
@@ -475,6 +538,27 @@ def gas_upward_pressure(
 
     return sol.root
 
+def _operating_points(df, inflow):
+    """
+    Intersection of an inflow curve with the outflow curve of every case in df. All the cases
+    are solved at once. Cases without intersection get q and p equal to 0 and idx 0
+    """
+    codes, cases = pd.factorize(df['case'])
+    order = np.argsort(codes, kind='stable')
+    n_cases = cases.shape[0]
+    x2 = df.index.values[order].astype(float).reshape(n_cases,-1)
+    y2 = df['pwf'].values[order].astype(float).reshape(n_cases,-1)
+
+    q, p, found = intercept_curves_batch(inflow['q'].values, inflow['p'].values, x2, y2)
+
+    op = pd.DataFrame({
+        'q':np.where(found,q,0),
+        'p':np.where(found,p,0),
+        'case':cases,
+        'idx':found.astype(int)
+    })
+    return op.merge(df.groupby('case').mean(), left_on='case', right_on='case')
+
 def gas_outflow_curve(
     md = None, 
     inc = None, 
@@ -491,9 +575,12 @@ def gas_outflow_curve(
     tol = 0.05, 
     max_iter=20,
     operating_point = None,
-    op_n = 30
+    op_n = None
     ):
 
+    if op_n is not None:
+        warnings.warn('op_n is deprecated and ignored. The operating points are exact intersections', DeprecationWarning, stacklevel=2)
+
     # Assert the right types and shapes for input
     assert isinstance(md, (np.ndarray,pd.Series)) and md.ndim ==1
     md = np.atleast_1d(md)
@@ -510,7 +597,7 @@ def gas_outflow_curve(
     thp = np.atleast_1d(thp)
     assert thp.ndim == 1
 
-    assert isinstance(gas_obj,gas) and gas_obj.pvt is not None
+    assert isinstance(gas_obj,Gas) and gas_obj.pvt is not None
 
     assert isinstance(di, list)
 
@@ -523,31 +610,24 @@ def gas_outflow_curve(
 
     assert gas_obj.sg is not None
 
-    pwf = np.zeros(rate.shape[0]*thp.shape[0]*len(di))
-    thp_arr = np.zeros(pwf.shape)
-    di_arr = np.zeros(pwf.shape)
-    gas_arr = np.zeros(pwf.shape)
-    name_list = []
-    i = 0
-    for p in thp:
-        for d in di:
-            for q in rate:
-                _,pwf[i] = gas_pressure_profile(
-                    md = md,
-                    inc = inc,
-                    thp = p,
-                    rate = q,
-                    gas_obj = gas_obj,
-                    surf_temp=surf_temp,
-                    temp_grad=temp_grad,
-                    di=d
-                )
-                gas_arr[i] = q
-                thp_arr[i] = p
-                di_arr[i] = d
-                case_name = f'thp-{p}_di-{d}'
-                name_list.append(case_name)
-                i += 1
+    #All the (thp, di, rate) cases are marched together
+    thp_arr, di_arr, gas_arr = [i.ravel() for i in np.meshgrid(thp, np.array(di,dtype=float), rate, indexing='ij')]
+
+    profiles = gas_pressure_profile_batch(
+        md = md,
+        inc = inc,
+        thp = thp_arr,
+        rate = gas_arr,
+        gas_obj = gas_obj,
+        surf_temp=surf_temp,
+        temp_grad=temp_grad,
+        di=di_arr,
+        epsilon=epsilon,
+        tol=tol,
+        max_iter=max_iter
+    )
+    pwf = profiles['pressure'][:,-1]
+    name_list = [f'thp-{p}_di-{d}' for p in thp for d in di for _ in rate]
 
     #df = pd.DataFrame(pwf,columns=name_list,index=rate)
     arr=np.column_stack((pwf,thp_arr,di_arr))
@@ -557,20 +637,7 @@ def gas_outflow_curve(
 
     op = pd.DataFrame()
     if operating_point is not None:
-        inflow = operating_point.df
-
-        for case in df['case'].unique():
-            df_case = df[df['case']==case]
-
-            points, idx = intercept_curves(inflow['q'],inflow['p'],df_case.index,df_case['pwf'], n=op_n)
-
-            points_df = pd.DataFrame(points[[-1],:], columns=['q','p'])
-            points_df['case'] = case
-            points_df['idx'] = idx
-
-            op = op.append(points_df)
-        
-        op = op.merge(df.groupby('case').mean(), left_on='case', right_on='case')
+        op = _operating_points(df, operating_point.df)
 
     return df, op
 
@@ -781,70 +848,11 @@ def flow_regime_plot(
     fax.set_yscale('log')
     fax.set_xscale('log')
 
-def hb_correlation(
-    pressure=None,  #Pressure [psi]
-    temperature=None, #Temperature [F]
-    liquid_rate=None, # Liquid Flow [bbl/d]
-    gas_rate=None, # gas flow [kscfd]
-    ten_liquid=None, #Surface tension dyne/cm2
-    rho_liquid=None, # density lb/ft3
-    rho_gas=None, # density lb/ft3
-    mu_liquid=None, # Viscosity [cp]
-    mu_gas=None, # Viscosity [cp]
-    z=1, # Gas compressibility Factor
-    di=None, # Diameter,
-    epsilon = 0.0006,
-):
-
+def _hb_gradient(pressure, temperature, liquid_rate, gas_rate, ten_liquid, rho_liquid, rho_gas, mu_liquid, mu_gas, z, di, epsilon):
     """
-    The modified Hagedorn and Brown method (mH-B) is an empirical two-phase flow correlation based
-    on the original work of Hagedorn and Brown (1965). The heart of the Hagedorn-Brown method is a
-    correlation for liquid holdup; the modifications of the original method include using the no-slip holdup
-    when the original empirical correlation predicts a liquid holdup value less than the no-slip holdup and
-    the use of the Griffith correlation (Griffith and Wallis, 1961) for the bubble flow regime.
-
-    Petroleum Production Systems, Economides. Chapter 7 7.4.3.1. The Modified Hagedorn and Brown Method  Page 187
-
+    Modified Hagedorn and Brown pressure gradient [psi/ft] on arrays. See hb_correlation.
+    Arguments are broadcasted and not validated
     """
-    #Check types and converto to np.ndarray
-    assert isinstance(pressure,(int,float,np.ndarray,np.float64,np.int64))
-    pressure = np.atleast_1d(pressure)
-
-    assert isinstance(temperature,(int,float,np.ndarray,np.float64,np.int64))
-    temperature = np.atleast_1d(temperature)
-
-    assert isinstance(liquid_rate,(int,float,np.ndarray,np.float64,np.int64))
-    liquid_rate = np.atleast_1d(liquid_rate)
-
-    assert isinstance(gas_rate,(int,float,np.ndarray,np.float64,np.int64))
-    gas_rate = np.atleast_1d(gas_rate)
-
-    assert isinstance(ten_liquid,(int,float,np.ndarray,np.float64,np.int64))
-    ten_liquid = np.atleast_1d(ten_liquid)
-
-    assert isinstance(rho_liquid,(int,float,np.ndarray,np.float64,np.int64))
-    rho_liquid = np.atleast_1d(rho_liquid)
-
-    assert isinstance(rho_gas,(int,float,np.ndarray,np.float64,np.int64))
-    rho_gas = np.atleast_1d(rho_gas)
-
-    assert isinstance(mu_liquid,(int,float,np.ndarray,np.float64,np.int64))
-    mu_liquid = np.atleast_1d(mu_liquid)
-
-    assert isinstance(mu_gas,(int,float,np.ndarray,np.float64,np.int64))
-    mu_gas = np.atleast_1d(mu_gas)
-
-    assert isinstance(z,(int,float,np.ndarray,np.float64,np.int64))
-    z = np.atleast_1d(z)
-
-    assert isinstance(di,(int,float,np.ndarray,np.float64,np.int64))
-    di = np.atleast_1d(di)
-
-    assert isinstance(epsilon,(int,float,np.ndarray,np.float64,np.int64))
-    epsilon = np.atleast_1d(epsilon)
-
-    griffith = False
-
     area = np.power((di*0.5)/12,2)*np.pi
     usl = (liquid_rate * 5.615)/(area * 86400)
     usg = (4*gas_rate*1000*z*(460+temperature)*14.7)/(86400*pressure*520*np.pi*np.power(di/12,2)) 
@@ -856,14 +864,13 @@ def hb_correlation(
     lambda_l = 1 - lambda_g
     #Check if Buble flow exist
     lb = 1.071 - 0.2218 * (np.power(um,2)/(di/12))
-    
-    if lb < 0.13:
-        lb = 0.13
+    lb = np.where(lb < 0.13, 0.13, lb)
 
-    if lb > lambda_g:
-        yl=1-0.5*(1+(um/0.8)-np.sqrt(np.power(1+(um/0.8),2)-4*(usg/0.8)))
-        griffith=True
-    else:
+    #Every point takes its own branch. Both are evaluated and the right one is selected
+    griffith = lb > lambda_g
+    yl_griffith = 1-0.5*(1+(um/0.8)-np.sqrt(np.power(1+(um/0.8),2)-4*(usg/0.8)))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
         #Calculate Dimensionless numbers
         nvl= 1.938*usl*np.power(rho_liquid/ten_liquid,0.25)              #Liquid Velocity Number
         nvg=1.938*usg*np.power(rho_liquid/ten_liquid,0.25)             #Gas Velocity Number
@@ -884,21 +891,22 @@ def hb_correlation(
 
         #Psi calculated by equation from pengtools
         # https://wiki.pengtools.com/index.php?title=Hagedorn_and_Brown_correlation
-        if b > 0.055:
-            psi = 2.5714*b + 1.5962
-        elif b > 0.025:
-            psi = -533.33*np.power(b,2) + 58.524*b + 0.1171
-        else:
-            psi = 27170*np.power(b,3) - 317.52 * np.power(b,2) + 0.5472*b + 0.9999
+        psi = np.where(
+            b > 0.055,
+            2.5714*b + 1.5962,
+            np.where(
+                b > 0.025,
+                -533.33*np.power(b,2) + 58.524*b + 0.1171,
+                27170*np.power(b,3) - 317.52 * np.power(b,2) + 0.5472*b + 0.9999
+            )
+        )
 
         # Psi calculated from Economides
         #psi=(1.0886+69.9473*b-2334.3497*np.power(b,2)+12896.683*np.power(b,3))/(1+53.4401*b-1517.9369*np.power(b,2)+8419.8115*np.power(b,3))
 
-        #yl
-        yl = yl_ratio * psi
-
-    if yl < lambda_l:
-        yl = lambda_l
+    #yl
+    yl = np.where(griffith, yl_griffith, yl_ratio * psi)
+    yl = np.where(yl < lambda_l, lambda_l, yl)
 
     # Mass flow in lb/d
     mass_flow = area * (usl * rho_liquid + usg * rho_gas) * 86400 
@@ -912,14 +920,15 @@ def hb_correlation(
     #Average density
     rho_avg = yl*rho_liquid + (1-yl)*rho_gas
 
-    if griffith:
-        pressure_gradient = (1/144)*(rho_avg+((ff*np.power(mass_flow,2))/(7.413e10*np.power(di/12,5)*rho_avg*np.power(yl,2))))
-    else:
-        pressure_gradient = (1/144)*(rho_avg+((ff*np.power(mass_flow,2))/(7.413e10*np.power(di/12,5)*rho_avg)))
+    pressure_gradient = np.where(
+        griffith,
+        (1/144)*(rho_avg+((ff*np.power(mass_flow,2))/(7.413e10*np.power(di/12,5)*rho_avg*np.power(yl,2)))),
+        (1/144)*(rho_avg+((ff*np.power(mass_flow,2))/(7.413e10*np.power(di/12,5)*rho_avg)))
+    )
 
     return pressure_gradient
 
-def gray_correlation(
+def hb_correlation(
     pressure=None,  #Pressure [psi]
     temperature=None, #Temperature [F]
     liquid_rate=None, # Liquid Flow [bbl/d]
@@ -933,6 +942,17 @@ def gray_correlation(
     di=None, # Diameter,
     epsilon = 0.0006,
 ):
+
+    """
+    The modified Hagedorn and Brown method (mH-B) is an empirical two-phase flow correlation based
+    on the original work of Hagedorn and Brown (1965). The heart of the Hagedorn-Brown method is a
+    correlation for liquid holdup; the modifications of the original method include using the no-slip holdup
+    when the original empirical correlation predicts a liquid holdup value less than the no-slip holdup and
+    the use of the Griffith correlation (Griffith and Wallis, 1961) for the bubble flow regime.
+
+    Petroleum Production Systems, Economides. Chapter 7 7.4.3.1. The Modified Hagedorn and Brown Method  Page 187
+
+    """
     #Check types and converto to np.ndarray
     assert isinstance(pressure,(int,float,np.ndarray,np.float64,np.int64))
     pressure = np.atleast_1d(pressure)
@@ -970,6 +990,14 @@ def gray_correlation(
     assert isinstance(epsilon,(int,float,np.ndarray,np.float64,np.int64))
     epsilon = np.atleast_1d(epsilon)
 
+    return _hb_gradient(pressure, temperature, liquid_rate, gas_rate, ten_liquid, rho_liquid, rho_gas, mu_liquid, mu_gas, z, di, epsilon)
+
+
+def _gray_gradient(pressure, temperature, liquid_rate, gas_rate, ten_liquid, rho_liquid, rho_gas, mu_liquid, mu_gas, z, di, epsilon):
+    """
+    Gray pressure gradient [psi/ft] on arrays. See gray_correlation.
+    Arguments are broadcasted and not validated
+    """
     area = np.power((di*0.5)/12,2)*np.pi
     usl = (liquid_rate * 5.615)/(area * 86400)
     usg = (4*gas_rate*1000*z*(460+temperature)*14.7)/(86400*pressure*520*np.pi*np.power(di/12,2)) 
@@ -1006,10 +1034,7 @@ def gray_correlation(
 
     ko = (0.285*ten_liquid)/(rho_m * np.power(um,2))
 
-    if rv >= 0.007:
-        ke = ko
-    else:
-        ke = k + rv*((ko - k)/0.007) 
+    ke = np.where(rv >= 0.007, ko, k + rv*((ko - k)/0.007))
 
     epsilon_relative = ke / (di/12)
 
@@ -1025,7 +1050,374 @@ def gray_correlation(
 
     return pressure_gradient
 
+def gray_correlation(
+    pressure=None,  #Pressure [psi]
+    temperature=None, #Temperature [F]
+    liquid_rate=None, # Liquid Flow [bbl/d]
+    gas_rate=None, # gas flow [kscfd]
+    ten_liquid=None, #Surface tension dyne/cm2
+    rho_liquid=None, # density lb/ft3
+    rho_gas=None, # density lb/ft3
+    mu_liquid=None, # Viscosity [cp]
+    mu_gas=None, # Viscosity [cp]
+    z=1, # Gas compressibility Factor
+    di=None, # Diameter,
+    epsilon = 0.0006,
+):
+    #Check types and converto to np.ndarray
+    assert isinstance(pressure,(int,float,np.ndarray,np.float64,np.int64))
+    pressure = np.atleast_1d(pressure)
+
+    assert isinstance(temperature,(int,float,np.ndarray,np.float64,np.int64))
+    temperature = np.atleast_1d(temperature)
+
+    assert isinstance(liquid_rate,(int,float,np.ndarray,np.float64,np.int64))
+    liquid_rate = np.atleast_1d(liquid_rate)
+
+    assert isinstance(gas_rate,(int,float,np.ndarray,np.float64,np.int64))
+    gas_rate = np.atleast_1d(gas_rate)
 
+    assert isinstance(ten_liquid,(int,float,np.ndarray,np.float64,np.int64))
+    ten_liquid = np.atleast_1d(ten_liquid)
+
+    assert isinstance(rho_liquid,(int,float,np.ndarray,np.float64,np.int64))
+    rho_liquid = np.atleast_1d(rho_liquid)
+
+    assert isinstance(rho_gas,(int,float,np.ndarray,np.float64,np.int64))
+    rho_gas = np.atleast_1d(rho_gas)
+
+    assert isinstance(mu_liquid,(int,float,np.ndarray,np.float64,np.int64))
+    mu_liquid = np.atleast_1d(mu_liquid)
+
+    assert isinstance(mu_gas,(int,float,np.ndarray,np.float64,np.int64))
+    mu_gas = np.atleast_1d(mu_gas)
+
+    assert isinstance(z,(int,float,np.ndarray,np.float64,np.int64))
+    z = np.atleast_1d(z)
+
+    assert isinstance(di,(int,float,np.ndarray,np.float64,np.int64))
+    di = np.atleast_1d(di)
+
+    assert isinstance(epsilon,(int,float,np.ndarray,np.float64,np.int64))
+    epsilon = np.atleast_1d(epsilon)
+
+    return _gray_gradient(pressure, temperature, liquid_rate, gas_rate, ten_liquid, rho_liquid, rho_gas, mu_liquid, mu_gas, z, di, epsilon)
+
+
+def _bb_gradient(pressure, temperature, liquid_rate, gas_rate, ten_liquid, rho_liquid, rho_gas, mu_liquid, mu_gas, z, di, epsilon, angle=90):
+    """
+    Beggs and Brill pressure gradient [psi/ft] on arrays. See bb_correlation.
+    Arguments are broadcasted and not validated
+    """
+    area = np.power((di*0.5)/12,2)*np.pi
+    usl = (liquid_rate * 5.615)/(area * 86400)
+    usg = (4*gas_rate*1000*z*(460+temperature)*14.7)/(86400*pressure*520*np.pi*np.power(di/12,2)) 
+    um = usl + usg
+
+    #No slip liquid holdup and Froude number
+    lambda_l = usl / um
+    nfr = np.power(um,2) / (32.174 * (di/12))
+    nlv = 1.938 * usl * np.power(rho_liquid/ten_liquid,0.25)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        #Flow pattern limits
+        l1 = 316 * np.power(lambda_l,0.302)
+        l2 = 0.0009252 * np.power(lambda_l,-2.4684)
+        l3 = 0.1 * np.power(lambda_l,-1.4516)
+        l4 = 0.5 * np.power(lambda_l,-6.738)
+
+        segregated = ((lambda_l < 0.01) & (nfr < l1)) | ((lambda_l >= 0.01) & (nfr < l2))
+        transition = (lambda_l >= 0.01) & (nfr >= l2) & (nfr <= l3)
+        distributed = ((lambda_l < 0.4) & (nfr >= l1)) | ((lambda_l >= 0.4) & (nfr > l4))
+
+        sin_term = np.sin(np.radians(1.8*angle)) - 0.333*np.power(np.sin(np.radians(1.8*angle)),3)
+
+        def inclination_c(d, e, f, g):
+            return np.maximum((1 - lambda_l) * np.log(d * np.power(lambda_l,e) * np.power(nlv,f) * np.power(nfr,g)), 0)
+
+        #Downhill flow uses the same coefficients in every flow pattern
+        c_downhill = inclination_c(4.70, -0.3692, 0.1244, -0.5056)
+
+        def holdup(a, b, c, d, e, f, g):
+            #Horizontal holdup corrected by inclination
+            hl0 = np.maximum(a * np.power(lambda_l,b) / np.power(nfr,c), lambda_l)
+            cc = 0 if d is None else inclination_c(d, e, f, g)
+            cc = np.where(angle < 0, c_downhill, cc)
+            return hl0 * (1 + cc * sin_term)
+
+        hl_seg = holdup(0.98, 0.4846, 0.0868, 0.011, -3.768, 3.539, -1.614)
+        hl_int = holdup(0.845, 0.5351, 0.0173, 2.96, 0.305, -0.4473, 0.0978)
+        hl_dis = holdup(1.065, 0.5824, 0.0609, None, None, None, None)
+
+        a_tr = (l3 - nfr) / (l3 - l2)
+        yl = np.where(
+            segregated, hl_seg,
+            np.where(
+                transition, a_tr*hl_seg + (1-a_tr)*hl_int,
+                np.where(distributed, hl_dis, hl_int)
+            )
+        )
+        yl = np.clip(yl, 0, 1)
+
+        #Two phase friction factor
+        rho_ns = lambda_l*rho_liquid + (1-lambda_l)*rho_gas
+        mu_ns = lambda_l*mu_liquid + (1-lambda_l)*mu_gas
+        nre = 1488 * rho_ns * um * (di/12) / mu_ns
+        fn = 4 * np.power((1/(-4*np.log10((epsilon/3.7065)-(5.0452/nre)*np.log10((np.power(epsilon,1.1098)/2.8257)+np.power(7.149/nre,0.8981))))),2)
+
+        y = lambda_l / np.power(yl,2)
+        ln_y = np.log(y)
+        s_factor = np.where(
+            (y > 1) & (y < 1.2),
+            np.log(2.2*y - 1.2),
+            ln_y / (-0.0523 + 3.182*ln_y - 0.8725*np.power(ln_y,2) + 0.01853*np.power(ln_y,4))
+        )
+        s_factor = np.where(y == 1, 0, s_factor)
+        ftp = fn * np.exp(s_factor)
+
+    #Gradients in psf/ft
+    rho_s = yl*rho_liquid + (1-yl)*rho_gas
+    elevation = rho_s * np.sin(np.radians(angle))
+    friction = ftp * rho_ns * np.power(um,2) / (2 * 32.174 * (di/12))
+    ek = rho_s * um * usg / (32.174 * pressure * 144)
+
+    pressure_gradient = (elevation + friction) / (144 * (1 - ek))
+    return pressure_gradient
+
+def bb_correlation(
+    pressure=None,  #Pressure [psi]
+    temperature=None, #Temperature [F]
+    liquid_rate=None, # Liquid Flow [bbl/d]
+    gas_rate=None, # gas flow [kscfd]
+    ten_liquid=None, #Surface tension dyne/cm2
+    rho_liquid=None, # density lb/ft3
+    rho_gas=None, # density lb/ft3
+    mu_liquid=None, # Viscosity [cp]
+    mu_gas=None, # Viscosity [cp]
+    z=1, # Gas compressibility Factor
+    di=None, # Diameter,
+    epsilon = 0.0006,
+    angle = 90, # Angle from horizontal [deg]
+):
+    """
+    The Beggs and Brill method (1973) predicts the liquid holdup from the flow pattern it would
+    have in horizontal flow (segregated, intermittent, distributed or transition) and corrects it
+    for the pipe inclination, with the uphill coefficients for positive angles and the downhill ones
+    for negative angles. The friction factor is the no-slip one corrected by the ratio of no-slip
+    to actual holdup. The acceleration term is included.
+
+    Petroleum Production Systems, Economides. Chapter 7 7.4.3.3. The Beggs and Brill Method
+
+    """
+    arrays = [pressure, temperature, liquid_rate, gas_rate, ten_liquid, rho_liquid, rho_gas, mu_liquid, mu_gas, z, di, epsilon, angle]
+    for i in arrays:
+        assert isinstance(i,(int,float,np.ndarray,np.float64,np.int64))
+    arrays = [np.atleast_1d(i) for i in arrays]
+    assert np.all((arrays[-1] >= -90) & (arrays[-1] <= 90)), 'angle must be between -90 and 90'
+
+    return _bb_gradient(*arrays)
+
+#Array kernels of the two phase correlations. They take the arguments of hb_correlation in order
+two_phase_correlations = {
+    'hagedorn_brown':_hb_gradient,
+    'gray':_gray_gradient,
+    'beggs_brill':_bb_gradient
+}
+
+def _one_phase_gradient(pressure, ge, epsilon, z1, z2, d, rate, mu):
+    """
+    Gradient of a single segment as given by one_phase_pressure_profile(md=[z1,z2]) evaluated
+    on arrays. Used for the points of a two phase profile without enough free gas
+    """
+    #Potential Energy Change
+    ppe = 0.433 * ge * (z1 - z2)
+
+    #Frictional Pressure drop
+    rho = 62.4 * ge
+    nre = reynolds_number(rate,rho,d,mu)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ff = np.where(
+            nre == 0,
+            0,
+            np.power((1/(-4*np.log10((epsilon/3.7065)-(5.0452/nre)*np.log10((np.power(epsilon,1.1098)/2.8257)+np.power(7.149/nre,0.8981))))),2)
+        )
+    u = (4*rate*5.615)/(np.pi*np.power(d/12,2)*86400)
+    pf = -1 * (2 * ff * rho * np.power(u,2) * np.abs(z2-z1))/(32.17 * (d/12) * 144)
+
+    delta_p = ppe + 0 + pf
+    return ((pressure + delta_p) - pressure)/np.abs(z2 - z1)
+
+def two_phase_pressure_profile_batch(
+    depth = None,
+    thp = None,
+    liquid_rate = None,
+    oil_rate = None,
+    gas_rate = None,
+    bsw = None,
+    oil_obj = None,
+    gas_obj = None,
+    water_obj = None, 
+    epsilon=0.0006, 
+    surface_temperature=80, 
+    temperature_gradient=1,  
+    di=2.99, 
+    tol=0.02,
+    max_iter = 20,
+    method = 'hagedorn_brown',
+    min_glr = 10
+):
+    """
+    Two phase pressure profiles of many cases marched together. thp, rates, bsw and di are
+    broadcasted to one value per case and every depth step advances all the cases at once.
+    Each case iterates its gradient until it converges with the same scheme as
+    two_phase_pressure_profile. PVT properties come from the cached numpy tables of the fluids.
+
+    Attributes:
+        thp:        Tubing head pressure [psi]
+        liquid_rate:    Liquid rate [bbl/d]
+        oil_rate:   Oil rate [bbl/d]. If None it is liquid_rate*(1-bsw)
+        gas_rate:   Total gas rate [kscfd]
+        bsw:        Water cut [fraction]
+        di:         Diameter per case (cases,) or per case and depth (cases, depth) [in]
+
+    Return:
+        profiles:   dict with pressure, pressure_gradient, free_gas_rate, glr and iterations
+                    of shape (cases, depth) and temperature of shape (depth,)
+    """
+    assert isinstance(depth, (np.ndarray,pd.Series,list))
+    depth = np.atleast_1d(depth).astype(float)
+    assert depth.ndim == 1
+
+    assert isinstance(gas_obj,Gas) and gas_obj.pvt is not None
+    assert isinstance(oil_obj,Oil) and oil_obj.pvt is not None
+    assert isinstance(water_obj,Water) and water_obj.pvt is not None
+    assert method in two_phase_correlations, f'{method} not implemented'
+
+    thp = np.atleast_1d(np.asarray(thp,dtype=float))
+    liquid_rate = np.atleast_1d(np.asarray(liquid_rate,dtype=float))
+    gas_rate = np.atleast_1d(np.asarray(gas_rate,dtype=float))
+    bsw = np.atleast_1d(np.asarray(bsw,dtype=float))
+    if oil_rate is None:
+        oil_rate = liquid_rate*(1-bsw)
+    oil_rate = np.atleast_1d(np.asarray(oil_rate,dtype=float))
+    di = np.asarray(di,dtype=float)
+
+    #di may be given per case (cases,) or per case and depth (cases, depth)
+    if di.ndim == 2:
+        assert di.shape[1] == depth.shape[0]
+        thp, liquid_rate, oil_rate, gas_rate, bsw, _ = np.broadcast_arrays(thp, liquid_rate, oil_rate, gas_rate, bsw, di[:,0])
+        di = np.broadcast_to(di,(thp.shape[0],depth.shape[0]))
+    else:
+        thp, liquid_rate, oil_rate, gas_rate, bsw, di = np.broadcast_arrays(thp, liquid_rate, oil_rate, gas_rate, bsw, np.atleast_1d(di))
+        di = np.repeat(di[:,np.newaxis],depth.shape[0],axis=1)
+    n_cases = thp.shape[0]
+
+    epsilon = np.atleast_1d(epsilon)
+    surface_temperature = np.atleast_1d(surface_temperature)
+    temperature_gradient = np.atleast_1d(temperature_gradient)
+
+    pressure_profile = np.zeros((n_cases,depth.shape[0]))
+    pressure_profile[:,0] = thp
+    pressure_gradient = np.zeros((n_cases,depth.shape[0]))
+    iterations = np.zeros((n_cases,depth.shape[0]))
+    free_gas_rate = np.zeros((n_cases,depth.shape[0]))
+    glr = np.zeros((n_cases,depth.shape[0]))
+    temperature_profile = np.abs(depth[0] - depth) * (temperature_gradient/100) + surface_temperature
+
+    #Initials Densities
+    rho_oil_i = oil_obj.interpolate_arrays(thp,property = 'rhoo')['rhoo']
+    rho_water_i = water_obj.interpolate_arrays(thp,property = 'rhow')['rhow']
+    rho_l = rho_oil_i * (1-bsw) + rho_water_i * bsw 
+
+    pressure_gradient[:,0] = rho_l * (0.433/62.4)
+
+    p_guess = np.zeros(n_cases)
+    grad_new = np.zeros(n_cases)
+    free_gas = np.zeros(n_cases)
+    glr_ratio = np.zeros(n_cases)
+
+    for i in range(1,depth.shape[0]):
+        err = np.full(n_cases, tol + 0.01)
+        it = np.zeros(n_cases)
+        grad_guess = pressure_gradient[:,i-1].copy()
+        active = np.ones(n_cases,dtype=bool)
+
+        while active.any():
+            a = active
+            p_guess[a] = grad_guess[a] * np.abs(depth[i] - depth[i-1]) + pressure_profile[a,i-1]
+            
+            #Interpolate pvt
+            gas_pvt_guess = gas_obj.interpolate_arrays(p_guess[a],property=['z','mug'])
+            oil_pvt_guess = oil_obj.interpolate_arrays(p_guess[a],property=['tension','rhoo','muo','rs'])
+            water_pvt_guess = water_obj.interpolate_arrays(p_guess[a],property=['tension','rhow','muw'])
+
+            ten_liquid = oil_pvt_guess['tension'] * (1-bsw[a]) + water_pvt_guess['tension'] * bsw[a]
+            rho_liquid = oil_pvt_guess['rhoo'] * (1-bsw[a]) + water_pvt_guess['rhow'] * bsw[a]
+            mu_liquid = oil_pvt_guess['muo'] * (1-bsw[a]) + water_pvt_guess['muw'] * bsw[a]
+            rho_gas = (28.97 * gas_obj.sg * p_guess[a])/(gas_pvt_guess['z']*10.73*(temperature_profile[i]+460))
+            mu_gas = gas_pvt_guess['mug']
+            z = gas_pvt_guess['z']
+            free_gas_a = gas_rate[a] - (oil_pvt_guess['rs']*oil_rate[a]*1e-3)
+            free_gas_a = np.where(free_gas_a < 0, 0, free_gas_a)
+            free_gas[a] = free_gas_a
+            
+            glr_ratio[a] = free_gas_a*1e3 / liquid_rate[a]
+            two_phase = glr_ratio[a] > min_glr
+            grad_a = np.zeros(two_phase.shape)
+
+            if two_phase.any():
+                tp = two_phase
+                #The kernels skip the validation of the public correlations
+                grad_a[tp] = two_phase_correlations[method](
+                    p_guess[a][tp],
+                    temperature_profile[i],
+                    liquid_rate[a][tp],
+                    free_gas_a[tp],
+                    ten_liquid[tp],
+                    rho_liquid[tp],
+                    rho_gas[tp],
+                    mu_liquid[tp],
+                    mu_gas[tp],
+                    z[tp],
+                    di[a,i][tp],
+                    epsilon,
+                )
+
+            if not two_phase.all():
+                op = ~two_phase
+                grad_a[op] = _one_phase_gradient(
+                    p_guess[a][op],
+                    rho_liquid[op] /62.4,
+                    epsilon,
+                    depth[i],
+                    depth[i-1],
+                    di[a,i][op],
+                    liquid_rate[a][op],
+                    mu_liquid[op]
+                )
+
+            grad_new[a] = grad_a
+            err[a] = np.abs(grad_guess[a]-grad_new[a])/grad_new[a]
+            grad_guess[a] = grad_new[a]
+            it[a] += 1
+
+            #Cases stop iterating independently
+            active = active & (err >= tol) & (it <= max_iter)
+
+        pressure_gradient[:,i] = grad_new 
+        pressure_profile[:,i] = p_guess
+        free_gas_rate[:,i] = free_gas
+        glr[:,i] = glr_ratio
+        iterations[:,i] = it
+
+    return {
+        'pressure':pressure_profile,
+        'pressure_gradient':pressure_gradient,
+        'free_gas_rate':free_gas_rate,
+        'temperature':temperature_profile,
+        'iterations':iterations,
+        'glr':glr
+    }
 
 def two_phase_pressure_profile(
     depth = None,
@@ -1091,9 +1483,9 @@ def two_phase_pressure_profile(
     bsw = np.atleast_1d(bsw)
     assert bsw.shape == (1,)
 
-    assert isinstance(gas_obj,gas) and gas_obj.pvt is not None
-    assert isinstance(oil_obj,oil) and oil_obj.pvt is not None
-    assert isinstance(water_obj,water) and water_obj.pvt is not None
+    assert isinstance(gas_obj,Gas) and gas_obj.pvt is not None
+    assert isinstance(oil_obj,Oil) and oil_obj.pvt is not None
+    assert isinstance(water_obj,Water) and water_obj.pvt is not None
 
     if isinstance(di,(np.ndarray,pd.Series,list)):
         di = np.atleast_1d(di)
@@ -1126,111 +1518,37 @@ def two_phase_pressure_profile(
             gas_rate = gor * oil_rate * 1e-3
 
 
-    pressure_profile = np.zeros(depth.shape)
-    pressure_profile[0] = thp
-    pressure_gradient = np.zeros(depth.shape)
-    iterations = np.zeros(depth.shape)
-    free_gas_rate = np.zeros(depth.shape)
-    glr = np.zeros(depth.shape)
-    temperature_profile = np.abs(depth[0] - depth) * (temperature_gradient/100) + surface_temperature
-
-    #Initials Densities
-    rho_oil_i = oil_obj.pvt.interpolate(thp,property = 'rhoo').iloc[0,0]
-    rho_water_i = water_obj.pvt.interpolate(thp,property = 'rhow').iloc[0,0]
-    rho_l = rho_oil_i * (1-bsw) + rho_water_i * bsw 
-
-    pressure_gradient[0] = rho_l * (0.433/62.4)
-    for i in range(1,depth.shape[0]):
-        err = tol + 0.01
-        it = 0
-        grad_guess = pressure_gradient[i-1]
-
-        while err>= tol and it <= max_iter:
-            p_guess = grad_guess * np.abs(depth[i] - depth[i-1]) + pressure_profile[i-1]
-            
-            #Interpolate pvt
-            gas_pvt_guess = gas_obj.pvt.interpolate(p_guess)
-            oil_pvt_guess = oil_obj.pvt.interpolate(p_guess)
-            water_pvt_guess = water_obj.pvt.interpolate(p_guess)
-
-            ten_liquid = oil_pvt_guess['tension'].iloc[0] * (1-bsw) + water_pvt_guess['tension'].iloc[0] * bsw
-            rho_liquid = oil_pvt_guess['rhoo'].iloc[0] * (1-bsw) + water_pvt_guess['rhow'].iloc[0] * bsw
-            mu_liquid = oil_pvt_guess['muo'].iloc[0] * (1-bsw) + water_pvt_guess['muw'].iloc[0] * bsw
-            rho_gas = (28.97 * gas_obj.sg * p_guess)/(gas_pvt_guess['z'].iloc[0]*10.73*(temperature_profile[i]+460))
-            mu_gas = gas_pvt_guess['mug'].iloc[0]
-            z = gas_pvt_guess['z'].iloc[0]
-            free_gas = gas_rate - (oil_pvt_guess['rs'].iloc[0]*oil_rate*1e-3)
-            free_gas = 0 if free_gas < 0 else free_gas
-            
-            glr_ratio = free_gas*1e3 / liquid_rate
-            if glr_ratio > 10:
-                if method == 'hagedorn_brown':
-                    grad_new = hb_correlation(
-                        pressure=p_guess,
-                        temperature=temperature_profile[i],
-                        liquid_rate = liquid_rate,
-                        gas_rate = free_gas,
-                        ten_liquid = ten_liquid,
-                        rho_liquid = rho_liquid,
-                        rho_gas = rho_gas,
-                        mu_liquid = mu_liquid,
-                        mu_gas = mu_gas,
-                        z = z,
-                        di = di[i],
-                        epsilon = epsilon,
-                    )
-                #elif method == 'beggs_brill':
-                #    grad_new = bb_correlation()
-                elif method == 'gray':
-                    grad_new = gray_correlation(
-                        pressure=p_guess,  #Pressure [psi]
-                        temperature=temperature_profile[i], #Temperature [F]
-                        liquid_rate=liquid_rate, # Liquid Flow [bbl/d]
-                        gas_rate=free_gas, # gas flow [kscfd]
-                        ten_liquid=ten_liquid, #Surface tension dyne/cm2
-                        rho_liquid=rho_liquid, # density lb/ft3
-                        rho_gas=rho_gas, # density lb/ft3
-                        mu_liquid=mu_liquid, # Viscosity [cp]
-                        mu_gas=mu_gas, # Viscosity [cp]
-                        z=z, # Gas compressibility Factor
-                        di=di[i], # Diameter,
-                        epsilon =  epsilon
-                    )
-            else:
-                df, _ = one_phase_pressure_profile(
-                    p1=p_guess,
-                    ge=rho_liquid /62.4,
-                    epsilon=epsilon,
-                    md=[depth[i], depth[i-1]],
-                    tvd=[depth[i], depth[i-1]],
-                    d = [di[i], di[i]],
-                    rate = liquid_rate,
-                    mu=mu_liquid
-                    )
-
-                grad_new = df['gradient'].iloc[-1]
-                
-            err =  abs(grad_guess-grad_new)/grad_new
-            grad_guess = grad_new
-            it += 1
-
-        pressure_gradient[i] = grad_new 
-        pressure_profile[i] = p_guess
-        free_gas_rate[i] = free_gas
-        glr[i] = glr_ratio
-        iterations[i] = it
+    profiles = two_phase_pressure_profile_batch(
+        depth = depth,
+        thp = thp,
+        liquid_rate = liquid_rate,
+        oil_rate = oil_rate,
+        gas_rate = gas_rate,
+        bsw = bsw,
+        oil_obj = oil_obj,
+        gas_obj = gas_obj,
+        water_obj = water_obj, 
+        epsilon=epsilon, 
+        surface_temperature=surface_temperature, 
+        temperature_gradient=temperature_gradient,  
+        di=di[np.newaxis,:], 
+        tol=tol,
+        max_iter = max_iter,
+        method = method,
+        min_glr = min_glr
+    )
 
     df_dict = {
-        'pressure':pressure_profile,
-        'pressure_gradient': pressure_gradient,
-        'free_gas_rate': free_gas_rate,
-        'temperature': temperature_profile,
-        'iterations': iterations,
-        'grl': glr
+        'pressure':profiles['pressure'][0],
+        'pressure_gradient': profiles['pressure_gradient'][0],
+        'free_gas_rate': profiles['free_gas_rate'][0],
+        'temperature': profiles['temperature'],
+        'iterations': profiles['iterations'][0],
+        'grl': profiles['glr'][0]
     }
 
     df = pd.DataFrame(df_dict, index = depth)
-    pwf = pressure_profile[-1]
+    pwf = profiles['pressure'][0,-1]
 
     return df, pwf
 
@@ -1315,9 +1633,12 @@ def two_phase_outflow_curve(
     method = 'hagedorn_brown',
     use_gas = False,
     operating_point = None,
-    op_n = 30
+    op_n = None
 ):
 
+    if op_n is not None:
+        warnings.warn('op_n is deprecated and ignored. The operating points are exact intersections', DeprecationWarning, stacklevel=2)
+
     # Assert the right types and shapes for input
     assert isinstance(depth, (np.ndarray,pd.Series,list))
     depth = np.atleast_1d(depth)
@@ -1360,9 +1681,9 @@ def two_phase_outflow_curve(
     bsw = np.atleast_1d(bsw)
     assert bsw.ndim == 1
 
-    assert isinstance(gas_obj,gas) and gas_obj.pvt is not None
-    assert isinstance(oil_obj,oil) and oil_obj.pvt is not None
-    assert isinstance(water_obj,water) and water_obj.pvt is not None
+    assert isinstance(gas_obj,Gas) and gas_obj.pvt is not None
+    assert isinstance(oil_obj,Oil) and oil_obj.pvt is not None
+    assert isinstance(water_obj,Water) and water_obj.pvt is not None
 
     if isinstance(di,(np.ndarray,list)):
         di = np.atleast_2d(di)
@@ -1382,9 +1703,9 @@ def two_phase_outflow_curve(
 
     if operating_point is not None:
         if use_gas:
-            assert isinstance(operating_point,gas_inflow)
+            assert isinstance(operating_point,GasInflow)
         else:
-            assert isinstance(operating_point,oil_inflow)
+            assert isinstance(operating_point,OilInflow)
 
     #Start
     if liquid_rate is None:
@@ -1403,7 +1724,7 @@ def two_phase_outflow_curve(
                c += 1
 
     if gas_rate is None:
-        assert use_gas == 'False'
+        assert not use_gas
         if gor is None:
             gas_arr = glr
             gas_name = 'glr'
@@ -1414,56 +1735,46 @@ def two_phase_outflow_curve(
         gas_arr = gas_rate  
         gas_name = 'gas_rate'
 
-    #Estimate number of columns for 2d matrix
-    number_columns = len(bsw)*len(liquid_rate)*len(thp)*di.shape[1] if use_gas else len(bsw)*len(gas_arr)*len(thp)*di.shape[1]
-
-    #Create matrix for results
-    #pwf = np.zeros((len(gas_arr),number_columns)) if use_gas else np.zeros((len(liquid_rate),number_columns))
-    pwf = np.zeros(len(gas_arr)*number_columns) if use_gas else np.zeros(len(liquid_rate)*number_columns)
-    bsw_arr = np.zeros(pwf.shape)
-    liquid_arr = np.zeros(pwf.shape)
-    gas_ = np.zeros(pwf.shape)
-    thp_arr = np.zeros(pwf.shape)
-    di_arr = np.zeros(pwf.shape)
+    #All the cases are marched together. The grid keeps the order bsw, liquid, thp, di, gas
+    bsw_arr, liquid_arr, thp_arr, di_idx, gas_ = [
+        i.ravel() for i in np.meshgrid(bsw, liquid_rate, thp, np.arange(di.shape[1]), np.asarray(gas_arr,dtype=float), indexing='ij')
+    ]
 
-    name_list = []
-    i= 0
-
-    c = 0
-    for b in bsw:
-        for l in liquid_rate:
-            for pi in thp:
-                for d in range(di.shape[1]):
-                    for g in gas_arr:
-                        _,pwf[i] = two_phase_pressure_profile(
-                            depth = depth,
-                            thp = pi,
-                            liquid_rate = l,
-                            oil_rate = None,
-                            gas_rate = g if gas_rate is not None else None,
-                            glr = g if glr is not None else None,
-                            gor = g if gor is not None else None,
-                            bsw = b,
-                            oil_obj = oil_obj,
-                            gas_obj = gas_obj,
-                            water_obj = water_obj, 
-                            epsilon=epsilon, 
-                            surface_temperature=surface_temperature,
-                            temperature_gradient=temperature_gradient,  
-                            di=di[:,d], 
-                            tol=tol,
-                            max_iter = max_iter,
-                            method = method
-                        )
-                        bsw_arr[i] = b
-                        gas_[i] = g
-                        liquid_arr[i] = l
-                        thp_arr[i] = pi
-                        di_arr[i] = di[:,d].mean()
-                        i += 1
-                        c += 1 
-                        case_name = f"bsw_{b} liquid_{l} thp_{pi} di_{np.round(di[:,d].mean(),decimals=2)}"
-                        name_list.append(case_name)
+    if gas_rate is not None:
+        gas_total = gas_
+    elif gor is not None:
+        gas_total = gas_ * (liquid_arr*(1-bsw_arr)) * 1e-3
+    else:
+        gas_total = gas_ * liquid_arr * 1e-3
+
+    profiles = two_phase_pressure_profile_batch(
+        depth = depth,
+        thp = thp_arr,
+        liquid_rate = liquid_arr,
+        gas_rate = gas_total,
+        bsw = bsw_arr,
+        oil_obj = oil_obj,
+        gas_obj = gas_obj,
+        water_obj = water_obj, 
+        epsilon=epsilon, 
+        surface_temperature=surface_temperature,
+        temperature_gradient=temperature_gradient,  
+        di=di[:,di_idx].T, 
+        tol=tol,
+        max_iter = max_iter,
+        method = method
+    )
+    pwf = profiles['pressure'][:,-1]
+    di_arr = di.mean(axis=0)[di_idx]
+    #A case is a curve along the x axis of the table, gas if use_gas else liquid
+    if use_gas:
+        name_list = [
+            f"bsw_{b} liquid_{l} thp_{pi} di_{np.round(di[:,d].mean(),decimals=2)}" for b, l, pi, d in zip(bsw_arr, liquid_arr, thp_arr, di_idx)
+        ]
+    else:
+        name_list = [
+            f"bsw_{b} {gas_name}_{g} thp_{pi} di_{np.round(di[:,d].mean(),decimals=2)}" for b, g, pi, d in zip(bsw_arr, gas_, thp_arr, di_idx)
+        ]
 
     if use_gas:
         arr=np.column_stack((pwf,bsw_arr,liquid_arr,thp_arr,di_arr))
@@ -1477,22 +1788,195 @@ def two_phase_outflow_curve(
 
     op = pd.DataFrame()
     if operating_point is not None:
-        inflow = operating_point.df
+        op = _operating_points(df, operating_point.df)
 
-        for case in df['case'].unique():
-            df_case = df[df['case']==case]
+    return df, op
+  
 
-            points, idx = intercept_curves(inflow['q'],inflow['p'],df_case.index,df_case['pwf'], n=op_n)
 
-            points_df = pd.DataFrame(points[[-1],:], columns=['q','p'])
-            points_df['case'] = case
-            points_df['idx'] = idx
 
-            op = op.append(points_df)
-        
-        op = op.merge(df.groupby('case').mean(), left_on='case', right_on='case')
 
-    return df, op
-  
+def _inflow_set(inflow):
+    if isinstance(inflow, InflowSet):
+        return inflow
+    if isinstance(inflow, (OilInflow, GasInflow)):
+        return InflowSet.from_inflows([inflow])
+    return InflowSet.from_inflows(inflow)
+
+def _ipr_pwf(inflow_set, q, idx):
+    """
+    Flowing pressure of the inflows idx at the rates q
+    """
+    pr, j = inflow_set.pr[idx], inflow_set.j[idx]
+    if inflow_set.gas is not None:
+        return inflow_set.gas.pseudo_pressure_to_pressure(inflow_set.gas.pseudo_pressure(pr) - q/j)
+    return oil_flow_to_pwf(q, pr, j, inflow_set.pb[idx])
 
+def _solve_operating_points(inflow_set, vlp_pwf, q_min, xtol, root_max_iter, n_scan):
+    """
+    Operating point of every inflow. The rates between q_min and the AOF are scanned with
+    n_scan points to bracket the stable (highest rate) intersection, which is then solved
+    with bracketed_root
+    """
+    n = len(inflow_set)
+    all_idx = np.arange(n)
+
+    def f(q, idx):
+        return vlp_pwf(q, idx) - _ipr_pwf(inflow_set, q, idx)
+
+    #Coarse scan of all the inflows in one call. At the AOF the inflow pressure is zero
+    q_max = inflow_set.aof * (1 - 1e-9)
+    q_scan = q_min + (q_max - q_min)[:,np.newaxis] * np.linspace(0,1,n_scan)[np.newaxis,:]
+    f_scan = f(q_scan.ravel(), np.repeat(all_idx,n_scan)).reshape(n,n_scan)
+
+    #Last sign change from the inflow above the outflow to below it
+    change = (f_scan[:,:-1] <= 0) & (f_scan[:,1:] > 0)
+    has_bracket = change.any(axis=1)
+    k = n_scan - 2 - np.argmax(change[:,::-1], axis=1)
+
+    a = np.where(has_bracket, q_scan[all_idx,k], np.nan)
+    b = np.where(has_bracket, q_scan[all_idx,k+1], np.nan)
+    fa = np.where(has_bracket, f_scan[all_idx,k], 1)
+    fb = np.where(has_bracket, f_scan[all_idx,k+1], 1)
+
+    q, converged = bracketed_root(f, a, b, fa=fa, fb=fb, xtol=xtol, max_iter=root_max_iter)
+    pwf = np.full(n, np.nan)
+    ok = np.isfinite(q)
+    pwf[ok] = _ipr_pwf(inflow_set, q[ok], all_idx[ok])
+
+    return pd.DataFrame({
+        'q':q,
+        'pwf':pwf,
+        'converged':converged
+    }, index=inflow_set.index)
+
+def two_phase_operating_point(
+    inflow = None,
+    depth = None,
+    thp = None,
+    bsw = 0,
+    glr = None,
+    gor = None,
+    oil_obj = None,
+    gas_obj = None,
+    water_obj = None, 
+    epsilon=0.0006, 
+    surface_temperature=80, 
+    temperature_gradient=1,  
+    di=2.99, 
+    tol=0.02,
+    max_iter = 20,
+    method = 'hagedorn_brown',
+    q_min = 1,
+    xtol = 1e-6,
+    root_max_iter = 50,
+    n_scan = 6
+):
+    """
+    Operating point of many oil wells solving the inflow and the two phase outflow directly,
+    without tabulating lift curves. Every root iteration marches the outflow of all the wells
+    that have not converged in a single call to two_phase_pressure_profile_batch.
+
+    Attributes:
+        inflow:     InflowSet, OilInflow or list of OilInflow. Rates are liquid rates [bbl/d]
+        thp, bsw, glr, gor, di:     Scalars or one value per inflow
+        n_scan:     Rates scanned to bracket the stable operating point
+
+    Return:
+        op:     DataFrame indexed by inflow with liquid rate q, pwf and converged.
+                Wells that can not flow have NaN
+    """
+    inflow_set = _inflow_set(inflow)
+    assert inflow_set.gas is None, 'Use gas_operating_point for gas inflows'
+    assert any([glr is not None, gor is not None])
+    n = len(inflow_set)
+
+    thp = np.broadcast_to(np.asarray(thp,dtype=float), (n,))
+    bsw = np.broadcast_to(np.asarray(bsw,dtype=float), (n,))
+    gfr = np.broadcast_to(np.asarray(gor if gor is not None else glr,dtype=float), (n,))
+    di = np.asarray(di,dtype=float)
+    di = np.broadcast_to(di, (n,) + di.shape[1:]) if di.ndim == 2 else np.broadcast_to(di, (n,))
+
+    def vlp_pwf(q, idx):
+        oil_rate = q*(1-bsw[idx])
+        gas_rate = gfr[idx]*oil_rate*1e-3 if gor is not None else gfr[idx]*q*1e-3
+        profiles = two_phase_pressure_profile_batch(
+            depth = depth,
+            thp = thp[idx],
+            liquid_rate = q,
+            oil_rate = oil_rate,
+            gas_rate = gas_rate,
+            bsw = bsw[idx],
+            oil_obj = oil_obj,
+            gas_obj = gas_obj,
+            water_obj = water_obj, 
+            epsilon=epsilon, 
+            surface_temperature=surface_temperature, 
+            temperature_gradient=temperature_gradient,  
+            di=di[idx], 
+            tol=tol,
+            max_iter = max_iter,
+            method = method
+        )
+        return profiles['pressure'][:,-1]
+
+    return _solve_operating_points(inflow_set, vlp_pwf, q_min, xtol, root_max_iter, n_scan)
+
+def gas_operating_point(
+    inflow = None,
+    md = None, 
+    inc = None, 
+    thp = None, 
+    gas_obj = None,
+    di=2.99,
+    surf_temp=80,
+    temp_grad=1,
+    epsilon = 0.0006, 
+    tol = 0.05, 
+    max_iter=20,
+    q_min = 1,
+    xtol = 1e-6,
+    root_max_iter = 50,
+    n_scan = 6
+):
+    """
+    Operating point of many gas wells solving the inflow and the outflow directly, without
+    tabulating lift curves. Every root iteration marches all the wells that have not converged
+    in a single call to gas_pressure_profile_batch.
+
+    Attributes:
+        inflow:     InflowSet with gas, GasInflow or list of GasInflow. Rates in kscfd
+        thp, di:    Scalars or one value per inflow
+        gas_obj:    Gas of the outflow. If None the gas of the inflow is used
+        n_scan:     Rates scanned to bracket the stable operating point
+
+    Return:
+        op:     DataFrame indexed by inflow with rate q, pwf and converged.
+                Wells that can not flow have NaN
+    """
+    inflow_set = _inflow_set(inflow)
+    assert inflow_set.gas is not None, 'Use two_phase_operating_point for oil inflows'
+    gas_obj = inflow_set.gas if gas_obj is None else gas_obj
+    n = len(inflow_set)
+
+    thp = np.broadcast_to(np.asarray(thp,dtype=float), (n,))
+    di = np.asarray(di,dtype=float)
+    di = np.broadcast_to(di, (n,) + di.shape[1:]) if di.ndim == 2 else np.broadcast_to(di, (n,))
+
+    def vlp_pwf(q, idx):
+        profiles = gas_pressure_profile_batch(
+            md = md,
+            inc = inc,
+            thp = thp[idx],
+            rate = q,
+            gas_obj = gas_obj,
+            di = di[idx],
+            surf_temp = surf_temp,
+            temp_grad = temp_grad,
+            epsilon = epsilon,
+            tol = tol,
+            max_iter = max_iter
+        )
+        return profiles['pressure'][:,-1]
 
+    return _solve_operating_points(inflow_set, vlp_pwf, q_min, xtol, root_max_iter, n_scan)
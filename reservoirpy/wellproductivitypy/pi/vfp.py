@@ -0,0 +1,454 @@
+import numpy as np
+import pandas as pd
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from .outflow import two_phase_pressure_profile_batch
+from ...pvtpy.black_oil import Oil, Gas, Water
+
+
+def multilinear_interpolation(axes, values, points):
+    """multilinear_interpolation [Multilinear interpolation on a regular grid. Axes with a single
+    value are ignored and the end cells are used to extrapolate linearly]
+
+    Parameters
+    ----------
+    axes : list
+        [One increasing array per dimension of values]
+    values : np.ndarray
+        [Values on the grid]
+    points : list
+        [One array per dimension with the coordinates of the queries. They are broadcasted]
+
+    Returns
+    -------
+    np.ndarray
+        [Interpolated values with the broadcasted shape of points]
+    """
+    assert len(axes) == values.ndim == len(points)
+    points = np.broadcast_arrays(*[np.asarray(p, dtype=float) for p in points])
+
+    idx, weights, single = [], [], []
+    for ax, p in zip(axes, points):
+        ax = np.asarray(ax, dtype=float)
+        single.append(ax.shape[0] == 1)
+        if ax.shape[0] == 1:
+            idx.append(np.zeros(p.shape, dtype=int))
+            weights.append(np.zeros(p.shape))
+        else:
+            i = np.clip(np.searchsorted(ax, p) - 1, 0, ax.shape[0] - 2)
+            idx.append(i)
+            weights.append((p - ax[i]) / (ax[i+1] - ax[i]))
+
+    #Sum over the 2^d corners of every cell
+    result = np.zeros(points[0].shape)
+    for corner in range(2**len(axes)):
+        upper = [(corner >> d) & 1 for d in range(len(axes))]
+        if any(u and s for u, s in zip(upper, single)):
+            continue
+        w = np.ones(points[0].shape)
+        for d, u in enumerate(upper):
+            if not single[d]:
+                w = w * (weights[d] if u else 1 - weights[d])
+        result += w * values[tuple(i + u for i, u in zip(idx, upper))]
+    return result
+
+def _vfp_chunk(args):
+    """_vfp_chunk [Bottom hole pressure of a chunk of VFP cases. Module level to be picklable by the process pool]"""
+    key, start, profile_kw = args
+    profiles = two_phase_pressure_profile_batch(**profile_kw)
+    return key, start, profiles['pressure'][:,-1]
+
+
+class VfpTable:
+    """VfpTable [Production lift curves (VFP) over a grid of rate, tubing head pressure, water cut,
+    gas fraction and artificial lift quantity. The bottom hole pressures are computed with
+    two_phase_pressure_profile_batch in a process pool and cached on disk keyed by a hash of the inputs]
+
+    Parameters
+    ----------
+    depth : np.ndarray
+        [Measured depths from surface to the datum in ft]
+    oil_obj, gas_obj, water_obj :
+        [Fluids with PVT tables]
+    rate : np.ndarray
+        [Flow axis in bbl/d]
+    thp : np.ndarray
+        [Tubing head pressure axis in psi]
+    wct : np.ndarray, optional
+        [Water cut axis in fraction], by default [0]
+    gfr : np.ndarray, optional
+        [Gas fraction axis (glr or gor) in scf/bbl], by default [0]
+    alq : np.ndarray, optional
+        [Lift gas injection axis in kscfd], by default [0]
+    flo : str, optional
+        [Flow type. 'liq' or 'oil'], by default 'liq'
+    gfr_type : str, optional
+        [Gas fraction type. 'glr' or 'gor'], by default 'glr'
+    di : float or np.ndarray, optional
+        [Tubing inner diameter in in. Scalar or one value per depth], by default 2.99
+    method : str, optional
+        [Two phase correlation], by default 'hagedorn_brown'
+    """
+    def __init__(self,**kwargs):
+        self.depth = kwargs.pop('depth',None)
+        self.oil_obj = kwargs.pop('oil_obj',None)
+        self.gas_obj = kwargs.pop('gas_obj',None)
+        self.water_obj = kwargs.pop('water_obj',None)
+        self.rate = kwargs.pop('rate',None)
+        self.thp = kwargs.pop('thp',None)
+        self.wct = kwargs.pop('wct',[0])
+        self.gfr = kwargs.pop('gfr',[0])
+        self.alq = kwargs.pop('alq',[0])
+        self.flo = kwargs.pop('flo','liq')
+        self.gfr_type = kwargs.pop('gfr_type','glr')
+        self.di = kwargs.pop('di',2.99)
+        self.method = kwargs.pop('method','hagedorn_brown')
+        self.epsilon = kwargs.pop('epsilon',0.0006)
+        self.surface_temperature = kwargs.pop('surface_temperature',80)
+        self.temperature_gradient = kwargs.pop('temperature_gradient',1)
+        self.tol = kwargs.pop('tol',0.02)
+        self.max_iter = kwargs.pop('max_iter',20)
+        self.table_number = kwargs.pop('table_number',1)
+        self.bhp = None
+
+    #####################################################
+    ############## Properties ###########################
+
+    @property
+    def depth(self):
+        return self._depth
+
+    @depth.setter
+    def depth(self,value):
+        assert isinstance(value,(list,np.ndarray,pd.Series)), f'{type(value)} not accepted. Name must be array'
+        value = np.atleast_1d(value).astype(float)
+        assert value.ndim == 1 and value.shape[0] > 1
+        self._depth = value
+
+    @property
+    def oil_obj(self):
+        return self._oil_obj
+
+    @oil_obj.setter
+    def oil_obj(self,value):
+        assert isinstance(value,Oil) and value.pvt is not None
+        self._oil_obj = value
+
+    @property
+    def gas_obj(self):
+        return self._gas_obj
+
+    @gas_obj.setter
+    def gas_obj(self,value):
+        assert isinstance(value,Gas) and value.pvt is not None
+        self._gas_obj = value
+
+    @property
+    def water_obj(self):
+        return self._water_obj
+
+    @water_obj.setter
+    def water_obj(self,value):
+        assert isinstance(value,Water) and value.pvt is not None
+        self._water_obj = value
+
+    def _axis(self,value):
+        assert isinstance(value,(int,float,list,np.ndarray)), f'{type(value)} not accepted. Name must be array'
+        value = np.atleast_1d(value).astype(float)
+        assert value.ndim == 1 and np.all(np.diff(value) > 0), 'axis values must be increasing'
+        return value
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @rate.setter
+    def rate(self,value):
+        self._rate = self._axis(value)
+
+    @property
+    def thp(self):
+        return self._thp
+
+    @thp.setter
+    def thp(self,value):
+        self._thp = self._axis(value)
+
+    @property
+    def wct(self):
+        return self._wct
+
+    @wct.setter
+    def wct(self,value):
+        value = self._axis(value)
+        assert np.all((value >= 0) & (value < 1))
+        self._wct = value
+
+    @property
+    def gfr(self):
+        return self._gfr
+
+    @gfr.setter
+    def gfr(self,value):
+        self._gfr = self._axis(value)
+
+    @property
+    def alq(self):
+        return self._alq
+
+    @alq.setter
+    def alq(self,value):
+        self._alq = self._axis(value)
+
+    @property
+    def flo(self):
+        return self._flo
+
+    @flo.setter
+    def flo(self,value):
+        assert value in ['liq','oil']
+        self._flo = value
+
+    @property
+    def gfr_type(self):
+        return self._gfr_type
+
+    @gfr_type.setter
+    def gfr_type(self,value):
+        assert value in ['glr','gor']
+        self._gfr_type = value
+
+    @property
+    def di(self):
+        return self._di
+
+    @di.setter
+    def di(self,value):
+        assert isinstance(value,(int,float,list,np.ndarray))
+        if isinstance(value,(list,np.ndarray)):
+            value = np.atleast_1d(value).astype(float)
+            assert value.shape == self._depth.shape
+        else:
+            value = np.full(self._depth.shape,float(value))
+        self._di = value
+
+    @property
+    def shape(self):
+        return (self._rate.shape[0],self._thp.shape[0],self._wct.shape[0],self._gfr.shape[0],self._alq.shape[0])
+
+    @property
+    def axes(self):
+        return [self._rate,self._thp,self._wct,self._gfr,self._alq]
+
+    @property
+    def key(self):
+        """key [Hash of every input that changes the bottom hole pressures]"""
+        h = hashlib.sha256()
+        for fluid in [self.oil_obj, self.gas_obj, self.water_obj]:
+            pvt = fluid.pvt
+            h.update(','.join(map(str,pvt.columns)).encode())
+            h.update(np.ascontiguousarray(pvt.index.values,dtype=float).tobytes())
+            h.update(np.ascontiguousarray(pvt.values,dtype=float).tobytes())
+        h.update(repr(self.gas_obj.sg).encode())
+        for arr in [self._depth, self._di] + self.axes:
+            h.update(arr.tobytes())
+        h.update(repr((
+            self.flo, self.gfr_type, self.method, self.epsilon, self.surface_temperature,
+            self.temperature_gradient, self.tol, self.max_iter
+        )).encode())
+        return h.hexdigest()
+
+    def __repr__(self):
+        return f"VfpTable {self.table_number}: shape {self.shape} {'built' if self.bhp is not None else 'not built'}"
+
+    #####################################################
+    ############## methods ###########################
+
+    def cases(self):
+        """cases [Flattened grid. Every case gives the liquid rate, total gas rate and water cut of the profile]"""
+        rate, thp, wct, gfr, alq = [i.ravel() for i in np.meshgrid(*self.axes, indexing='ij')]
+        liquid = rate if self.flo == 'liq' else rate/(1-wct)
+        oil = liquid*(1-wct)
+        gas = gfr*liquid*1e-3 if self.gfr_type == 'glr' else gfr*oil*1e-3
+        return {
+            'thp':thp,
+            'liquid_rate':liquid,
+            'gas_rate':gas + alq,
+            'bsw':wct
+        }
+
+    def tasks(self, chunksize=256):
+        """tasks [Arguments of _vfp_chunk for chunks of cases]"""
+        cases = self.cases()
+        n = cases['thp'].shape[0]
+        key = self.key
+        tasks = []
+        for start in range(0,n,chunksize):
+            sl = slice(start,start+chunksize)
+            tasks.append((key, start, {
+                'depth':self._depth,
+                'thp':cases['thp'][sl],
+                'liquid_rate':cases['liquid_rate'][sl],
+                'gas_rate':cases['gas_rate'][sl],
+                'bsw':cases['bsw'][sl],
+                'oil_obj':self.oil_obj,
+                'gas_obj':self.gas_obj,
+                'water_obj':self.water_obj,
+                'epsilon':self.epsilon,
+                'surface_temperature':self.surface_temperature,
+                'temperature_gradient':self.temperature_gradient,
+                'di':self._di[np.newaxis,:],
+                'tol':self.tol,
+                'max_iter':self.max_iter,
+                'method':self.method
+            }))
+        return tasks
+
+    def cache_file(self, cache_dir):
+        return os.path.join(cache_dir, f'vfp_{self.key}.npz')
+
+    def load(self, cache_dir):
+        """load [Load the bottom hole pressures from the cache. Returns True if they were found]"""
+        file = self.cache_file(cache_dir)
+        if not os.path.exists(file):
+            return False
+        self.bhp = np.load(file)['bhp']
+        return True
+
+    def save(self, cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(self.cache_file(cache_dir), bhp=self.bhp)
+
+    def build(self, processes=None, chunksize=256, cache_dir=None):
+        """build [Compute the bottom hole pressures of the whole grid. See build_vfp_tables]"""
+        build_vfp_tables([self], processes=processes, chunksize=chunksize, cache_dir=cache_dir)
+        return self.bhp
+
+    def interpolate(self, rate, thp, wct=0, gfr=0, alq=0):
+        """interpolate [Multilinear interpolation of the bottom hole pressure. Arguments are broadcasted]"""
+        assert self.bhp is not None, 'The table has not been built'
+        return multilinear_interpolation(self.axes, self.bhp, [rate, thp, wct, gfr, alq])
+
+    def to_df(self):
+        """to_df [Long table with one row per grid point]"""
+        assert self.bhp is not None, 'The table has not been built'
+        rate, thp, wct, gfr, alq = [i.ravel() for i in np.meshgrid(*self.axes, indexing='ij')]
+        return pd.DataFrame({
+            'rate':rate,
+            'thp':thp,
+            'wct':wct,
+            self.gfr_type:gfr,
+            'alq':alq,
+            'bhp':self.bhp.ravel()
+        })
+
+    def to_ecl(self, datum=None, float_format='{:.2f}'.format, values_per_line=6):
+        """to_ecl [VFPPROD keyword in FIELD units]
+
+        Parameters
+        ----------
+        datum : float, optional
+            [Bottom hole datum depth in ft. If None the last depth is used], by default None
+
+        Returns
+        -------
+        str
+            [VFPPROD keyword]
+        """
+        assert self.bhp is not None, 'The table has not been built'
+        datum = self._depth[-1] if datum is None else datum
+
+        def write_values(values):
+            lines = []
+            for i in range(0, len(values), values_per_line):
+                lines.append(' '.join(float_format(v) for v in values[i:i+values_per_line]))
+            return '\n'.join(lines) + ' /\n'
+
+        string = ""
+        string += "VFPPROD\n"
+        string += "-- table  datum     flo    wfr    gfr    thp    alq    units    tab\n"
+        string += f"   {self.table_number}  {float_format(datum)}  '{self.flo.upper()}'  'WCT'  '{self.gfr_type.upper()}'  'THP'  'GRAT'  'FIELD'  'BHP' /\n"
+        string += "-- FLO values bbl/d\n"
+        string += write_values(self._rate)
+        string += "-- THP values psi\n"
+        string += write_values(self._thp)
+        string += "-- WFR values fraction\n"
+        string += write_values(self._wct)
+        string += "-- GFR values Mscf/bbl\n"
+        string += write_values(self._gfr*1e-3)
+        string += "-- ALQ values Mscf/d\n"
+        string += write_values(self._alq)
+        string += "-- NT NW NG NA  BHP values\n"
+
+        for it in range(self._thp.shape[0]):
+            for iw in range(self._wct.shape[0]):
+                for ig in range(self._gfr.shape[0]):
+                    for ia in range(self._alq.shape[0]):
+                        string += f"{it+1} {iw+1} {ig+1} {ia+1}\n"
+                        string += write_values(self.bhp[:,it,iw,ig,ia])
+        return string
+
+
+def build_vfp_tables(tables, processes=None, chunksize=256, cache_dir=None):
+    """build_vfp_tables [Build many VFP tables sharing one process pool. Tables found in
+    the cache are loaded, so rebuilding the lift curves of many wells only computes the
+    tables whose inputs changed]
+
+    Parameters
+    ----------
+    tables : list or dict
+        [VfpTable objects]
+    processes : int, optional
+        [Number of worker processes. If 1 the cases are computed serially], by default None
+    chunksize : int, optional
+        [Cases per task], by default 256
+    cache_dir : str, optional
+        [Directory of the on-disk cache. If None nothing is cached], by default None
+
+    Returns
+    -------
+    pd.DataFrame
+        [Table per VfpTable with its key, number of cases and whether it was loaded from cache]
+    """
+    assert isinstance(tables,(list,dict))
+    names = list(tables.keys()) if isinstance(tables,dict) else list(range(len(tables)))
+    tables = list(tables.values()) if isinstance(tables,dict) else tables
+
+    pending = {}
+    cached = []
+    for t in tables:
+        assert isinstance(t,VfpTable)
+        if cache_dir is not None and t.load(cache_dir):
+            cached.append(True)
+            continue
+        cached.append(False)
+        #Tables with the same inputs are computed once
+        pending.setdefault(t.key, []).append(t)
+
+    tasks = []
+    for group in pending.values():
+        tasks.extend(group[0].tasks(chunksize=chunksize))
+
+    if processes == 1:
+        results = [_vfp_chunk(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_vfp_chunk, tasks))
+
+    bhp = {k:np.zeros(int(np.prod(g[0].shape))) for (k,g) in pending.items()}
+    for key, start, pwf in results:
+        bhp[key][start:start+pwf.shape[0]] = pwf
+
+    for (k,group) in pending.items():
+        for t in group:
+            t.bhp = bhp[k].reshape(t.shape)
+        if cache_dir is not None:
+            group[0].save(cache_dir)
+
+    return pd.DataFrame({
+        'table':names,
+        'key':[t.key for t in tables],
+        'cases':[int(np.prod(t.shape)) for t in tables],
+        'cached':cached
+    }).set_index('table')
@@ -9,8 +9,7 @@ from ...wellproductivitypy.decline import Declination, WorDeclination, bsw_to_wo
 from ...volumetricspy import SurfaceGroup
 from ...cashflows.timeseries import CashFlow
 from ...cashflows.taxing import after_tax_cashflow
-from ...cashflows.analysis import timevalue
-from ...cashflows.rate import perrate
+from ...cashflows.rate import perrate, discount_factor_matrix
 from ...wellschematicspy import WellSchema
 #External Imports
 import pandas as pd 
@@ -27,6 +26,9 @@ import seaborn as sns
 import pyvista as pv 
 from sqlalchemy import create_engine
 import pickle
+import hashlib
+from copy import copy
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, timedelta
 import pyDOE2 as ed
 from lasio import LASFile
@@ -69,6 +71,103 @@ def input_to_list(input:Union[list,str])->list:
 
     """Given an array of points, make a line set"""
 
+def output_time_range(start, end, fq):
+    """output_time_range [Dates that split the range from start to end in the periods of
+    frequency fq. The first and last dates are start and end]
+
+    Parameters
+    ----------
+    start : date
+        [Start date]
+    end : date
+        [End date]
+    fq : str
+        [Period frequency]
+
+    Returns
+    -------
+    pd.Series
+        [Dates]
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    period_starts = pd.period_range(start, end, freq=fq).to_timestamp(how='start')
+    dates = [start] + [i for i in period_starts if start < i < end] + [end]
+    return pd.Series(dates)
+
+def schedule_key(declination, *args):
+    """schedule_key [Hash of the inputs of a schedule period forecast. The declination
+    enters by its attributes so two equal declinations give the same key]
+
+    Returns
+    -------
+    str
+        [sha256 hex digest]
+    """
+    state = (type(declination).__name__, sorted(vars(declination).items()))
+    return hashlib.sha256(pickle.dumps((state,) + args)).hexdigest()
+
+def well_case_key(well, case, *args):
+    """well_case_key [Hash of the inputs of the forecast of one schedule case of a well.
+    Changing any period of the case gives a different key]
+
+    Returns
+    -------
+    str
+        [sha256 hex digest]
+    """
+    periods = []
+    for v, period in well.schedule[case].items():
+        period = dict(period)
+        declination = period.pop('declination', None)
+        periods.append((v, schedule_key(declination) if declination is not None else None, sorted(period.items())))
+    return hashlib.sha256(pickle.dumps((well.name, well.fq, case, periods) + args)).hexdigest()
+
+def npv_matrix(cashflows:list, prate=0, pyr=12):
+    """npv_matrix [Net present values of many cashflows at many discount rates in one
+    product of the (cashflows, periods) matrix and the (rates, periods) discount factors.
+    Each cashflow is discounted from its own first period]
+
+    Parameters
+    ----------
+    cashflows : list
+        [Cashflows. pd.Series or arrays]
+    prate : [float, list], optional
+        [Nominal yearly discount rates in percentage], by default 0
+    pyr : int, optional
+        [Periods per year], by default 12
+
+    Returns
+    -------
+    np.ndarray
+        [(cashflows, rates) net present values]
+    """
+    prate = np.atleast_1d(prate)
+    values = [np.asarray(i, dtype=float) for i in cashflows]
+    nper = max([i.shape[0] for i in values], default=0)
+    matrix = np.zeros((len(values), nper))
+    for i, v in enumerate(values):
+        matrix[i, :v.shape[0]] = v
+    factor = discount_factor_matrix([perrate(pr,pyr=pyr) for pr in prate], nper)
+    return matrix @ factor.T
+
+def _well_cases_forecast(args):
+    """_well_cases_forecast [Forecast each schedule case of one well separately.
+    Module level to be picklable by the process pool]
+
+    Returns
+    -------
+    tuple
+        [Well name, forecast by case and cashflows by case]
+    """
+    well, cases, kwargs = args
+    forecasts = {}
+    cashflows = {}
+    for case in cases:
+        forecasts[case] = well.schedule_forecast(cases=case, **kwargs)
+        if well.cashflow is not None and case in well.cashflow:
+            cashflows[case] = well.cashflow[case]
+    return well.name, forecasts, cashflows
+
    
 freq_format={
     'M':'%Y-%m',
@@ -216,6 +315,7 @@ class Well:
         self.schedule = kwargs.pop('schedule',None)
         self.fq  = kwargs.pop('fq','M')
         self.cashflow = kwargs.pop('cashflow',None)
+        self._schedule_cache = {}
 
 
 #####################################################
@@ -1014,6 +1114,106 @@ class Well:
             self.to_coord(which=['perforations'])
 
 
+    def schedule_graph(self, case):
+        """schedule_graph [Dependencies between the periods of a schedule case. A period
+        depends on the period named by its depend_start key]
+
+        Parameters
+        ----------
+        case : str
+            [Schedule case]
+
+        Returns
+        -------
+        tuple
+            [List of periods where each one comes after its dependency and dictionary
+            with the dependency of each period]
+        """
+        assert self.schedule is not None and case in self.schedule.keys()
+        sched = self.schedule[case]
+
+        depends = {}
+        for v in sched:
+            depend_start = sched[v].get('depend_start', None)
+            depends[v] = depend_start if depend_start in sched.keys() and depend_start != v else None
+
+        order = []
+        visiting = []
+        def visit(v):
+            if v in order:
+                return
+            if v in visiting:
+                raise ValueError(f'Periods {visiting} have a cyclic depend_start')
+            visiting.append(v)
+            if depends[v] is not None:
+                visit(depends[v])
+            visiting.remove(v)
+            order.append(v)
+
+        for v in sched:
+            visit(v)
+
+        return order, depends
+
+    def clear_schedule_cache(self):
+        """clear_schedule_cache [Remove the memoized forecasts of the schedule periods]"""
+        self._schedule_cache = {}
+
+    def _schedule_period(self, declination, forecast_kw, start_date, end_date, fq_estimate, fq_output):
+        """_schedule_period [Forecast of one schedule period and its volumes by output period.
+        If fq_estimate is None and the dates are known the forecast is estimated directly at the
+        output periods, otherwise it is estimated at fq_estimate and grouped]
+        """
+        kw = dict(forecast_kw)
+        direct = False
+        if fq_estimate is None:
+            start = kw['start_date'] or declination.start_date or getattr(declination,'ti',None)
+            end = kw['end_date'] or declination.end_date
+            direct = start is not None and end is not None
+
+        if direct:
+            time_range = output_time_range(start, end, fq_output)
+            _f,_ = declination.forecast(time_range=time_range, **kw)
+        else:
+            _f,_ = declination.forecast(fq='D' if fq_estimate is None else fq_estimate, **kw)
+
+        if start_date is not None:
+            _f = _f[_f.index>=pd.Timestamp(start_date)]
+
+        if end_date is not None:
+            _f = _f[_f.index<=pd.Timestamp(end_date)]
+
+        last_date = _f.index[-1]
+        last = _f.iloc[-1]
+        volume_cols = [c for c in ['vo','vg'] if c in _f.columns]
+        if direct:
+            #The last row covers until the next output period. The values taken by the
+            #dependent periods are evaluated at the end of it, from the cumulative at the row
+            next_dates = time_range[time_range > last_date]
+            if next_dates.shape[0] > 0:
+                end_last = next_dates.iloc[0] - timedelta(days=1)
+                if end_last > last_date:
+                    end_kw = dict(kw)
+                    for cum_col, vol_col in [('np','vo'),('gp','vg')]:
+                        if cum_col in _f.columns and vol_col in _f.columns:
+                            end_kw['npi'] = last[cum_col] - last[vol_col]
+                            break
+                    _l,_ = declination.forecast(
+                        time_range=pd.Series([last_date, end_last, end_last + timedelta(days=1)]), **end_kw
+                    )
+                    _l = _l[_l.index<=end_last]
+                    last = _l.iloc[-1]
+                last_date = end_last
+
+        volumes = _f[volume_cols].to_period(fq_output).reset_index().groupby('time').sum()
+
+        return {
+            'forecast':_f,
+            'volumes':volumes,
+            'last_date':last_date,
+            'last':last
+        }
+
     def schedule_forecast(self,
         cases = None,
         start_date:date=None,
@@ -1021,10 +1221,38 @@ class Well:
         show=['oil','water','wc','total'],
         cash_name = {'capex':'capex','income':'income','var_opex':'var_opex','fix_opex':'fix_opex'},
         fq_estimate = 'D',
-        fq_output = None
+        fq_output = None,
+        memoize = True
     ):
+        """schedule_forecast [Forecast the periods of the schedule cases and add their cashflows.
+
+        The periods form a graph by their depend_start keys and are forecasted after their
+        dependency. The forecast of each period is memoized by its inputs, including the values
+        taken from its dependency, so after changing a period only that period and the ones
+        depending on it are estimated again. The schedule declinations are not modified.]
+
+        Parameters
+        ----------
+        cases : [str, list], optional
+            [Schedule cases. If None all the cases], by default None
+        fq_estimate : str, optional
+            [Frequency of the forecast before grouping by fq_output. If None the forecast is
+            estimated directly at the output periods with the exact volumes of each one and the
+            rates at the start of each period], by default 'D'
+        fq_output : str, optional
+            [Output frequency. If None the well fq], by default None
+        memoize : bool, optional
+            [Reuse the forecasts of the periods whose inputs did not change], by default True
+        """
         if fq_output is None:
             fq_output = self.fq
+
+        if memoize:
+            if getattr(self,'_schedule_cache',None) is None:
+                self.clear_schedule_cache()
+            cache = self._schedule_cache
+        else:
+            cache = {}
         
         _case_list = []
         if cases is None:
@@ -1051,29 +1279,23 @@ class Well:
             if cash_name is not None:
                 assert isinstance(cash_name,dict)
 
-            _forecast_list = []
             capex_sched ={}
             var_opex_list = []
             fix_opex_list = []
             income_list = []
             
-            #dictionary to store the numerated keys. It is used to get get dependent start forecast
-            num_dict = {} 
+            #Periods after their dependencies
+            order, depends = self.schedule_graph(case)
+            results = {}
 
             #Iterate over the periods
-            for i,v in enumerate(sched):
-                
-                #Update dictionary to enumerate the key to find the forecast dependant start
-                num_dict[v]=i
-
+            for v in order:
                 
                 start_date_case = sched[v].get('start_date', None)
                 end_date_case = sched[v].get('end_date', None)  
                 
                 #show water default True if WorDeclination; if declination default is false
                 show_water = sched[v].get('show_water', False if isinstance(sched[v]['declination'],Declination) else True)
-                # Start of declination is the end of prevous
-                depend_start = sched[v].get('depend_start', None) 
 
                 #days delay
                 time_delay = sched[v].get('time_delay', timedelta(days=30)) 
@@ -1087,8 +1309,6 @@ class Well:
                 depend_bsw = sched[v].get('depend_bsw', False)
                 discount_bsw = sched[v].get('discount_bsw', 0.95)
 
-                fix_end = sched[v].get('fix_end', False)
-
                 #Capex 
                 capex = sched[v].get('capex', None)
                 abandonment = sched[v].get('abandonment', None)
@@ -1121,64 +1341,66 @@ class Well:
                 bsw = sched[v].get('bsw',None)
                 #gor
                 gor = sched[v].get('gor',None) 
+
+                #The declination of the schedule is kept unchanged
+                declination = copy(sched[v]['declination'])
                     
-                if depend_start in list(num_dict.keys()) and i>0:
+                if depends[v] is not None:
                     
-                    depend_number = num_dict[depend_start]
-                    start_date_case = _forecast_list[depend_number].index[-1] + time_delay
+                    depend_result = results[depends[v]]
+                    start_date_case = depend_result['last_date'] + time_delay
 
-                    if change_ti and isinstance(sched[v]['declination'],Declination):
-                        sched[v]['declination'].ti = _forecast_list[depend_number].index[-1].date()
+                    if change_ti and isinstance(declination,Declination):
+                        declination.ti = depend_result['last_date'].date()
 
-                    if change_flow and isinstance(sched[v]['declination'],Declination):
-                        if sched[v]['declination'].gas:
-                            sched[v]['declination'].qi = _forecast_list[depend_number]['qg'].iloc[-1]
+                    if change_flow and isinstance(declination,Declination):
+                        if declination.gas:
+                            declination.qi = depend_result['last']['qg']
                         else:
-                            sched[v]['declination'].qi = _forecast_list[depend_number]['qo'].iloc[-1]                        
+                            declination.qi = depend_result['last']['qo']
                     
-                    if depend_bsw and isinstance(sched[v]['declination'],WorDeclination):
-                        sched[v]['declination'].bsw_i = _forecast_list[depend_number]['bsw'].iloc[-1] * discount_bsw
+                    if depend_bsw and isinstance(declination,WorDeclination):
+                        declination.bsw_i = depend_result['last']['bsw'] * discount_bsw
 
                 if move_ti is not None:
                     assert isinstance(move_ti,date), f'move_ti must be date'
-                    sched[v]['declination'].ti = move_ti
-                
-                _f,_ = sched[v]['declination'].forecast(
-                    show_water=show_water, 
-                    fq=fq_estimate, 
-                    start_date=start_date_case,
-                    end_date=end_date_case,
-                    econ_limit = econ_limit,
-                    np_limit = np_limit,
-                    npi = npi,
-                    fluid_rate = fluid_rate,
-                    gor=gor,
-                    bsw=bsw
-                )
-
-                if start_date is not None:
-                    _f = _f[_f.index>=pd.Timestamp(start_date)]
-
-                if end_date is not None:
-                    _f = _f[_f.index<=pd.Timestamp(end_date)]
+                    declination.ti = move_ti
+
+                forecast_kw = {
+                    'show_water':show_water, 
+                    'start_date':start_date_case,
+                    'end_date':end_date_case,
+                    'econ_limit':econ_limit,
+                    'np_limit':np_limit,
+                    'npi':npi,
+                    'fluid_rate':fluid_rate,
+                    'gor':gor,
+                    'bsw':bsw
+                }
+
+                key = schedule_key(declination, forecast_kw, start_date, end_date, fq_estimate, fq_output)
+                if key not in cache:
+                    cache[key] = self._schedule_period(declination, forecast_kw, start_date, end_date, fq_estimate, fq_output)
+                results[v] = cache[key]
+                volumes = results[v]['volumes']
 
                 if var_oil_opex is not None:
                     if isinstance(var_oil_opex, (int,float,list,np.ndarray)):
                         var_oil_opex = np.atleast_1d(var_oil_opex)
                         assert var_oil_opex.ndim==1
-                    var_opex_o = _f[['vo']].to_period(fq_output).reset_index().groupby('time').sum().multiply(var_oil_opex)
+                    var_opex_o = volumes[['vo']].multiply(var_oil_opex)
                     var_opex_list.append(var_opex_o.fillna(0))
 
                 if var_gas_opex is not None:
                     if isinstance(var_gas_opex, (int,float,list,np.ndarray)):
                         var_gas_opex = np.atleast_1d(var_gas_opex)
                         assert var_gas_opex.ndim==1
-                    var_opex_g = _f[['vg']].to_period(fq_output).reset_index().groupby('time').sum().multiply(var_gas_opex)
+                    var_opex_g = volumes[['vg']].multiply(var_gas_opex)
                     var_opex_list.append(var_opex_g.fillna(0))
 
                 if fix_opex is not None:
                     if isinstance(fix_opex,(int,float,list)):
-                        fr_output = _f.to_period(fq_output).reset_index()['time'].unique()
+                        fr_output = volumes.index.values
                         fix_opex_s = pd.Series(np.full(fr_output.shape, fix_opex), index=fr_output)
                         fix_opex_list.append(fix_opex_s)
                     elif isinstance(fix_opex,pd.Series):
@@ -1186,12 +1408,12 @@ class Well:
 
                 if oil_price is not None:
                     # Oil price must be a scalar or a pd Series indexed by Period
-                    income_o = _f['vo'].to_period(fq_output).reset_index().groupby('time').sum().multiply(oil_price,axis='index').multiply((1-oil_royalty),axis='index').dropna()
+                    income_o = volumes[['vo']].multiply(oil_price,axis='index').multiply((1-oil_royalty),axis='index').dropna()
                     income_list.append(income_o)
 
                 if gas_price is not None:
                     # Oil price must be a scalar or a pd Series indexed by Period
-                    income_g = _f['vg'].to_period(fq_output).reset_index().groupby('time').sum().multiply(gas_price,axis='index').multiply((1-gas_royalty),axis='index').dropna()
+                    income_g = volumes[['vg']].multiply(gas_price,axis='index').multiply((1-gas_royalty),axis='index').dropna()
                     income_list.append(income_g)                    
                     
 
@@ -1200,7 +1422,7 @@ class Well:
                         capex_sched.update(abandonment)
                     else:
                         fmt = freq_format[fq_output]
-                        abandonment_date = _f.index[-1].strftime(fmt)
+                        abandonment_date = results[v]['last_date'].strftime(fmt)
                         capex_sched.update({abandonment_date:abandonment})
 
                 if all([cash_name is not None,capex is not None]):
@@ -1211,10 +1433,12 @@ class Well:
                         capex_date = start_date_case.strftime(fmt)
                         capex_sched.update({capex_date:capex})
 
+            # Add to case forecast list in the schedule order
+            _forecast_list = []
+            for v in sched:
+                _f = results[v]['forecast'].copy()
                 _f['period'] = v
                 _forecast_list.append(_f)
-
-            # Add to case forecast list
             _forecast = pd.concat(_forecast_list,axis=0)
             _forecast['case'] = case
             
@@ -1387,25 +1611,39 @@ class Well:
                 spreadsheet['cum_free_cash_flow'] = spreadsheet['free_cash_flow'].cumsum()
                 spreadsheet['case'] = case
                 spreadsheet['well'] = self.name
-                #NPV         
-                prate = np.atleast_1d(prate)
-                
-                npv = {}
-                for pr in prate:
-                    prn = perrate(pr,pyr=pyr)
-                    
-                    prate_series = pd.Series(np.full(spreadsheet.shape[0],prn), index=spreadsheet.index)
-                    _npv = timevalue(spreadsheet['free_cash_flow'], prate_series)
-                    npv.update({pr:_npv})
 
                 #Append to general spreadsheet
                 spreadsheet_cases.append(spreadsheet)
-                
-                #Append to dict of general npv
-                npv_cases.update({case:npv})
+
+        #NPV of all the cases and rates at once
+        prate = np.atleast_1d(prate)
+        npv = npv_matrix([i['free_cash_flow'] for i in spreadsheet_cases], prate=prate, pyr=pyr)
+        for i, spreadsheet in enumerate(spreadsheet_cases):
+            npv_cases.update({spreadsheet['case'].iloc[0]:dict(zip(prate,npv[i]))})
                 
         return pd.concat(spreadsheet_cases,axis=0), npv_cases
 
+    def get_npv(
+        self,
+        cases:str=None,
+        income:list=['income'],
+        opex:list=['var_opex','fix_opex'],
+        capex:list=['capex'],
+        prate=0,
+        pyr=12
+    ):
+        """get_npv [Net present value of the free cash flow of the cases at the discount rates]
+
+        Returns
+        -------
+        pd.DataFrame
+            [NPV indexed by case with a column by rate]
+        """
+        _, npv_cases = self.get_fcf(cases=cases, income=income, opex=opex, capex=capex, prate=prate, pyr=pyr)
+        npv = pd.DataFrame.from_dict(npv_cases, orient='index')
+        npv.index.name = 'case'
+        return npv
+
 class WellsGroup:
     def __init__(self,*args,**kwargs):
         _well_list = []
@@ -1417,6 +1655,7 @@ class WellsGroup:
         self.wells = _well_list 
         self.crs = kwargs.pop('crs', None)
         self.surfaces = kwargs.pop('surfaces', None)
+        self._forecast_cache = {}
 
     @property
     def wells(self):
@@ -2335,35 +2574,36 @@ class WellsGroup:
 
             self.add_well(_well)
 
-    def schedule_forecast(self,
-        cases=None,
-        wells:list=None,
-        start_date=None, 
-        end_date=None,
-        cash_name = {'capex':'capex','income':'income','var_opex':'var_opex','fix_opex':'fix_opex'},
-        fq_estimate = 'D',
-        fq_output = None,
-        **kwargs):
+    def clear_forecast_cache(self):
+        """clear_forecast_cache [Remove the cached forecasts of the well cases]"""
+        self._forecast_cache = {}
+
+    def _well_cases(self, cases, wells=None):
+        """_well_cases [Schedule cases of each well given a case, a list of cases or a dict
+        of cases by well. Only the cases found in the well schedule are kept]
 
+        Returns
+        -------
+        dict
+            [Cases by well name]
+        """
         if wells is None:
             _well_list = []
             for key in self.wells:
                 _well_list.append(key)
         else:
             _well_list = wells
-            
-        
 
-        forecast_df = pd.DataFrame()
+        well_cases = {}
         for well in _well_list:
             if self.wells[well].schedule is None:
                 continue
             if isinstance(cases,(str,list)):
-                well_cases = cases
+                _cases = input_to_list(cases)
             elif isinstance(cases,dict):
                 try:
                     assert isinstance(cases[well],(str,list))
-                    well_cases = cases[well]
+                    _cases = input_to_list(cases[well])
                 except KeyError:
                     print(f'{well} was not found in dict cases')
                     continue
@@ -2371,22 +2611,152 @@ class WellsGroup:
                     print(f'None value passed to well case. Error found {e}')
                     continue
             else:
-                well_cases=None
-            _f= self.wells[well].schedule_forecast(
-                cases=well_cases,
-                start_date=start_date, 
-                end_date=end_date,
-                cash_name=cash_name, 
-                fq_estimate = fq_estimate,
-                fq_output = fq_output,
-                **kwargs
-            )
-            if _f is not None:
-                forecast_df = pd.concat([forecast_df,_f],axis=0, ignore_index=False).fillna(0)
+                _cases = list(self.wells[well].schedule.keys())
+            well_cases[well] = [i for i in _cases if i in self.wells[well].schedule.keys()]
+        return well_cases
 
-        return forecast_df
+    def _forecast_well_cases(self, well_cases, kwargs, processes=None, chunksize=1, memoize=True):
+        """_forecast_well_cases [Forecast of every (well, case) pair. The pairs not found in the
+        cache are grouped by well and forecasted in a process pool. The cashflows estimated
+        by the workers are added to the wells]
+
+        Parameters
+        ----------
+        well_cases : dict
+            [Cases by well name]
+        kwargs : dict
+            [Keyword arguments of Well.schedule_forecast]
+        processes : int, optional
+            [Worker processes. If 1 the wells are forecasted serially], by default None
+        memoize : bool, optional
+            [Reuse the forecasts of the pairs whose schedule did not change], by default True
+
+        Returns
+        -------
+        dict
+            [Forecast by (well, case). None if the case has no forecast]
+        """
+        if memoize:
+            if getattr(self,'_forecast_cache',None) is None:
+                self.clear_forecast_cache()
+            cache = self._forecast_cache
+        else:
+            cache = {}
+
+        kw_key = sorted(kwargs.items())
+        keys = {}
+        missing = {}
+        for well, cases in well_cases.items():
+            for case in cases:
+                key = well_case_key(self.wells[well], case, kw_key)
+                keys[(well, case)] = key
+                if key not in cache:
+                    missing.setdefault(well, []).append(case)
+
+        tasks = []
+        for well, cases in missing.items():
+            if processes == 1:
+                tasks.append((self.wells[well], cases, kwargs))
+            else:
+                #Send the well without its periods cache
+                _well = copy(self.wells[well])
+                _well._schedule_cache = {}
+                tasks.append((_well, cases, kwargs))
+
+        if processes == 1 or len(tasks) <= 1:
+            results = map(_well_cases_forecast, tasks)
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                results = list(executor.map(_well_cases_forecast, tasks, chunksize=chunksize))
 
-    def scenarios_maker(self,cases=None, wells=None, reduce=1):
+        for name, forecasts, cashflows in results:
+            current = self.wells[name].cashflow or {}
+            for case, _f in forecasts.items():
+                cache[keys[(name, case)]] = _f
+                if case in cashflows and cashflows[case] is not current.get(case):
+                    self.wells[name].add_cashflow(cashflows[case], case=case)
+
+        return {pair: cache[key] for pair, key in keys.items()}
+
+    def schedule_forecast(self,
+        cases=None,
+        wells:list=None,
+        start_date=None, 
+        end_date=None,
+        cash_name = {'capex':'capex','income':'income','var_opex':'var_opex','fix_opex':'fix_opex'},
+        fq_estimate = 'D',
+        fq_output = None,
+        processes = None,
+        chunksize = 1,
+        memoize = True,
+        **kwargs):
+        """schedule_forecast [Forecast the schedule cases of the wells and add their cashflows.
+
+        Each (well, case) pair is forecasted once and cached by its schedule, so calling again
+        with cases that share pairs only forecasts the new ones. The wells are dispatched to a
+        process pool and the forecasts are concatenated at the end.]
+
+        Parameters
+        ----------
+        cases : [str, list, dict], optional
+            [Schedule cases. A dict gives the cases by well. If None all the cases], by default None
+        wells : list, optional
+            [Wells names. If None all the wells], by default None
+        processes : int, optional
+            [Worker processes. If 1 the wells are forecasted serially], by default None
+        chunksize : int, optional
+            [Wells sent to each worker at once], by default 1
+        memoize : bool, optional
+            [Reuse the forecasts of the well cases whose schedule did not change], by default True
+
+        Returns
+        -------
+        pd.DataFrame
+            [Forecast of the wells]
+        """
+        well_cases = self._well_cases(cases, wells=wells)
+        forecast_kw = dict(
+            start_date=start_date, 
+            end_date=end_date,
+            cash_name=cash_name, 
+            fq_estimate = fq_estimate,
+            fq_output = fq_output,
+            **kwargs
+        )
+        forecasts = self._forecast_well_cases(
+            well_cases, forecast_kw, processes=processes, chunksize=chunksize, memoize=memoize
+        )
+        return self._concat_forecasts(well_cases, forecasts)
+
+    @staticmethod
+    def _concat_forecasts(well_cases, forecasts):
+        """_concat_forecasts [Concatenate the forecasts of the cases of each well once]"""
+        forecast_list = []
+        for well, cases in well_cases.items():
+            for case in sorted(set(cases)):
+                _f = forecasts[(well, case)]
+                if _f is not None:
+                    forecast_list.append(_f)
+        if len(forecast_list) == 0:
+            return pd.DataFrame()
+        return pd.concat(forecast_list,axis=0, ignore_index=False).fillna(0)
+
+    def scenarios_maker(self,cases=None, wells=None, reduce=1, as_array=False):
+        """scenarios_maker [Scenarios of the combinations of the wells cases by a full
+        factorial or a generalized subset design if reduce > 1]
+
+        Parameters
+        ----------
+        as_array : bool, optional
+            [Return the scenarios as an array of cases positions instead of a list of
+            dicts. Used by scenarios_summary], by default False
+
+        Returns
+        -------
+        list or tuple
+            [List of dicts of case by well. If as_array the (scenarios, wells) int array
+            and the dict of cases by well of its columns]
+        """
         
         assert isinstance(reduce,int) and reduce >= 1
         
@@ -2398,6 +2768,7 @@ class WellsGroup:
             _well_list = wells
                    
         _cases_list = []
+        _scenario_wells = []
         
         levels = []
         
@@ -2414,26 +2785,232 @@ class WellsGroup:
                 _well_cases.extend(cases)
             elif isinstance(cases,dict):
                 assert isinstance(cases[well],(str,list))
-                if isinstance(cases,str):
-                    _well_cases.append(cases)
-                elif isinstance(cases,list):
-                    _well_cases.extend(cases)
+                if isinstance(cases[well],str):
+                    _well_cases.append(cases[well])
+                elif isinstance(cases[well],list):
+                    _well_cases.extend(cases[well])
             
             _well_cases = [i for i in _well_cases if i in self.wells[well].schedule.keys()]
             _cases_list.append(_well_cases)
+            _scenario_wells.append(well)
             levels.append(len(_well_cases))
         
         # Escenarios Array
         escenarios_array = ed.fullfact(levels) if reduce==1 else ed.gsd(levels,reduce)
 
+        if as_array:
+            return np.asarray(escenarios_array, dtype=np.int64), dict(zip(_scenario_wells,_cases_list))
+
         scenarios_list = []
         for escenario in escenarios_array:
-            esc = {_well_list[i]:_cases_list[i][int(v)] for i,v in enumerate(escenario)}
+            esc = {_scenario_wells[i]:_cases_list[i][int(v)] for i,v in enumerate(escenario)}
 
             scenarios_list.append(esc)
         
         return scenarios_list
-    
+
+    def scenarios_arrays(
+        self,
+        well_cases:dict,
+        start_date=None, 
+        end_date=None,
+        cash_name = {'capex':'capex','income':'income','var_opex':'var_opex','fix_opex':'fix_opex'},
+        fq_estimate = 'D',
+        fq_output = None,
+        income:list=['income'],
+        opex:list=['var_opex','fix_opex'],
+        capex:list=['capex'],
+        rate:str='qo',
+        volume:str='vo',
+        processes = None,
+        memoize = True,
+        **kwargs
+        ):
+        """scenarios_arrays [Forecast and cashflow of every (well, case) pair stacked in
+        (well, case, period) arrays on a common period axis. The pairs are forecasted once
+        with schedule_forecast. The last case of every well is an empty case of zeros used
+        by the scenarios that do not include the well]
+
+        Parameters
+        ----------
+        well_cases : dict
+            [Cases by well name. The case position in the list is its index in the arrays]
+        income, opex, capex : list, optional
+            [Cash names of the free cash flow]
+        rate : str, optional
+            [Rate column of the forecast], by default 'qo'
+        volume : str, optional
+            [Volume column of the forecast], by default 'vo'
+
+        Returns
+        -------
+        dict
+            [wells, cases, periods and the rate, volume and fcf arrays]
+        """
+        forecast_kw = dict(
+            start_date = start_date,
+            end_date = end_date,
+            cash_name = cash_name,
+            fq_estimate = fq_estimate,
+            fq_output = fq_output,
+            **kwargs
+        )
+        forecasts = self._forecast_well_cases(
+            well_cases, forecast_kw, processes=processes, memoize=memoize
+        )
+
+        #Series of each pair by period
+        cash_names = [i for i in (income or []) + (opex or []) + (capex or [])]
+        series = {}
+        freq = None
+        for well, cases in well_cases.items():
+            for case in cases:
+                _f = forecasts[(well, case)]
+                _rate = _volume = _fcf = None
+                if _f is not None and rate in _f.columns:
+                    _g = _f.groupby('time')[[rate, volume]].sum()
+                    _rate, _volume = _g[rate], _g[volume]
+                    freq = _g.index.freq if freq is None else freq
+                    assert _g.index.freq == freq, 'The wells forecasts must have the same output frequency'
+                cashflow = self.wells[well].cashflow
+                if cashflow is not None and case in cashflow:
+                    _c = [cashflow[case][i].cashflow() for i in cash_names if i in cashflow[case]]
+                    if len(_c) > 0:
+                        _fcf = pd.concat(_c, axis=1).fillna(0).sum(axis=1)
+                series[(well, case)] = (_rate, _volume, _fcf)
+
+        periods_list = [i.index for s in series.values() for i in s if i is not None]
+        assert len(periods_list) > 0, 'No forecast found'
+        ordinals = np.concatenate([np.asarray(i.asi8) for i in periods_list])
+        freq = periods_list[0].freq if freq is None else freq
+        periods = pd.period_range(
+            start=pd.Period(ordinal=int(ordinals.min()), freq=freq), 
+            end=pd.Period(ordinal=int(ordinals.max()), freq=freq), 
+            freq=freq, 
+            name='time'
+        )
+
+        n_cases = max(len(i) for i in well_cases.values()) + 1
+        shape = (len(well_cases), n_cases, periods.shape[0])
+        arrays = {name:np.zeros(shape) for name in ['rate','volume','fcf']}
+        for w, (well, cases) in enumerate(well_cases.items()):
+            for c, case in enumerate(cases):
+                for name, s in zip(['rate','volume','fcf'], series[(well, case)]):
+                    if s is not None:
+                        arrays[name][w, c, np.asarray(s.index.asi8) - periods[0].ordinal] += s.values
+
+        arrays.update({
+            'wells': list(well_cases.keys()),
+            'cases': list(well_cases.values()),
+            'periods': periods
+        })
+        return arrays
+
+    def scenarios_summary(
+        self,
+        scenarios=None,
+        cases=None,
+        wells:list=None,
+        reduce:int=1,
+        arrays:dict=None,
+        prate=0,
+        pyr=12,
+        chunksize:int=10000,
+        **kwargs
+        ):
+        """scenarios_summary [EUR, NPV at several rates and peak rate of every scenario. Each
+        (well, case) forecast and cashflow is estimated once and stacked in
+        (well, case, period) arrays. EUR and NPV are linear, so they are summed from the
+        totals of each pair. The peak rate is evaluated by indexing the rate array in chunks
+        of scenarios. The NPV is discounted from the first period of all the forecasts]
+
+        Parameters
+        ----------
+        scenarios : [list, tuple], optional
+            [List of dicts of case by well, or the tuple of the cases positions array and the
+            cases by well given by scenarios_maker(as_array=True). If None the full factorial
+            of the cases], by default None
+        cases : [str, list, dict], optional
+            [Cases of each well], by default None
+        reduce : int, optional
+            [Reduction of the design if scenarios is None], by default 1
+        arrays : dict, optional
+            [Arrays of scenarios_arrays. If None they are estimated], by default None
+        prate : [float, list], optional
+            [Nominal yearly discount rates in percentage], by default 0
+        pyr : int, optional
+            [Periods per year], by default 12
+        chunksize : int, optional
+            [Scenarios evaluated at once], by default 10000
+        kwargs : 
+            [Keyword arguments of scenarios_arrays]
+
+        Returns
+        -------
+        pd.DataFrame
+            [Summary indexed by scenario]
+        """
+        if scenarios is None:
+            scenarios, well_cases = self.scenarios_maker(cases=cases, wells=wells, reduce=reduce, as_array=True)
+        elif isinstance(scenarios,tuple):
+            scenarios, well_cases = scenarios
+        else:
+            assert isinstance(scenarios,list)
+            well_cases = {}
+            scenarios_cases = []
+            for scenario in scenarios:
+                _cases = self._well_cases(scenario, wells=[i for i in scenario if i in self.wells])
+                for well, c in _cases.items():
+                    well_cases.setdefault(well, [])
+                    well_cases[well].extend([i for i in c if i not in well_cases[well]])
+                scenarios_cases.append(_cases)
+
+            #Positions of the cases. Wells not in a scenario take the empty case
+            scenarios_array = np.array(
+                [[len(well_cases[w]) for w in well_cases] for _ in scenarios_cases], dtype=np.int64
+            ).reshape(len(scenarios_cases), len(well_cases))
+            for i, _cases in enumerate(scenarios_cases):
+                for j, well in enumerate(well_cases):
+                    if well in _cases and len(_cases[well]) > 0:
+                        scenarios_array[i, j] = well_cases[well].index(_cases[well][0])
+            scenarios = scenarios_array
+
+        if arrays is None:
+            arrays = self.scenarios_arrays(well_cases, **kwargs)
+        scenarios = np.asarray(scenarios, dtype=np.int64)
+        assert scenarios.ndim == 2 and scenarios.shape[1] == len(arrays['wells'])
+
+        #Totals of each (well, case) pair
+        prate = np.atleast_1d(prate)
+        factor = discount_factor_matrix([perrate(pr,pyr=pyr) for pr in prate], arrays['periods'].shape[0])
+        eur_wc = arrays['volume'].sum(axis=2)
+        npv_wc = arrays['fcf'] @ factor.T
+
+        n = scenarios.shape[0]
+        wells_idx = np.arange(scenarios.shape[1])
+        eur = np.zeros(n)
+        npv = np.zeros((n, prate.shape[0]))
+        peak = np.zeros(n)
+        peak_time = np.zeros(n, dtype=np.int64)
+        for start in range(0, n, chunksize):
+            idx = scenarios[start:start + chunksize]
+            eur[start:start + chunksize] = eur_wc[wells_idx, idx].sum(axis=1)
+            npv[start:start + chunksize] = npv_wc[wells_idx, idx].sum(axis=1)
+
+            #Rate of the scenarios by period, accumulated by well to keep (chunk, period) memory
+            total_rate = np.zeros((idx.shape[0], arrays['periods'].shape[0]))
+            for w in wells_idx:
+                total_rate += arrays['rate'][w, idx[:,w]]
+            peak[start:start + chunksize] = total_rate.max(axis=1)
+            peak_time[start:start + chunksize] = total_rate.argmax(axis=1)
+
+        summary = pd.DataFrame({'eur':eur}, index=pd.RangeIndex(n, name='scenario'))
+        for i, pr in enumerate(prate):
+            summary[f'npv_{pr}'] = npv[:,i]
+        summary['peak_rate'] = peak
+        summary['peak_time'] = arrays['periods'][peak_time]
+        return summary
+
     def scenarios_forecast(
         self,
         scenarios=None,
@@ -2443,21 +3020,44 @@ class WellsGroup:
         cash_name = {'capex':'capex','income':'income','var_opex':'var_opex','fix_opex':'fix_opex'},
         fq_estimate = 'D',
         fq_output = None,
+        processes = None,
+        chunksize = 1,
+        memoize = True,
         **kwargs
         ):
+        """scenarios_forecast [Forecast of each scenario, a dict of cases by well. The unique
+        (well, case) pairs of all the scenarios are forecasted once and shared by the scenarios]
+
+        Returns
+        -------
+        pd.DataFrame
+            [Forecast of the scenarios with the scenario column]
+        """
         assert isinstance(scenarios,list)
-        
+
+        forecast_kw = dict(
+            start_date = start_date,
+            end_date = end_date,
+            cash_name = cash_name,
+            fq_estimate = fq_estimate,
+            fq_output = fq_output,
+            **kwargs
+        )
+
+        #Unique (well, case) pairs of all the scenarios are forecasted once
+        scenarios_cases = [self._well_cases(scenario, wells=wells) for scenario in scenarios]
+        unique_cases = {}
+        for well_cases in scenarios_cases:
+            for well, cases in well_cases.items():
+                unique_cases.setdefault(well, [])
+                unique_cases[well].extend([i for i in cases if i not in unique_cases[well]])
+        forecasts = self._forecast_well_cases(
+            unique_cases, forecast_kw, processes=processes, chunksize=chunksize, memoize=memoize
+        )
+
         scenarios_list = []
-        for i,scenario in enumerate(scenarios):
-            scenario_df = self.schedule_forecast(
-                cases = scenario,
-                wells = wells,
-                start_date = start_date,
-                end_date = end_date,
-                cash_name = cash_name,
-                fq_estimate = fq_estimate,
-                fq_output = fq_output
-            )
+        for i,well_cases in enumerate(scenarios_cases):
+            scenario_df = self._concat_forecasts(well_cases, forecasts)
             scenario_df['scenario'] = i 
             scenarios_list.append(scenario_df)
         
@@ -2582,13 +3182,7 @@ class WellsGroup:
             
             #NPV         
             prate = np.atleast_1d(prate)
-            npv = {}
-            for pr in prate:
-                prn = perrate(pr,pyr=pyr)
-                
-                prate_series = pd.Series(np.full(spreadsheet.shape[0],prn), index=spreadsheet.index)
-                _npv = timevalue(spreadsheet['free_cash_flow'], prate_series)
-                npv.update({pr:_npv})
+            npv = dict(zip(prate, npv_matrix([spreadsheet['free_cash_flow']], prate=prate, pyr=pyr)[0]))
                 
             return spreadsheet, npv
 
@@ -2596,6 +3190,66 @@ class WellsGroup:
             print('No FCF Found')
 
 
+    def get_npv(self,
+        cases=None,
+        wells:list=None, 
+        income:list=['income'],
+        opex:list=['var_opex','fix_opex'],
+        capex:list=['capex'],
+        prate=0,
+        pyr=12
+    ):
+        """get_npv [Net present value of every (well, case) free cash flow at every discount
+        rate. The free cash flows are stacked in a matrix and discounted in one product]
+
+        Parameters
+        ----------
+        cases : [str, list, dict], optional
+            [Cases. A dict gives the cases by well. If None all the cases], by default None
+        prate : [float, list], optional
+            [Nominal yearly discount rates in percentage], by default 0
+
+        Returns
+        -------
+        pd.DataFrame
+            [NPV indexed by well and case with a column by rate]
+        """
+        if wells is None:
+            _well_list = []
+            for well in self.wells:
+                _well_list.append(well)
+        else:
+            _well_list = wells
+
+        fcf_list = []
+        index = []
+        for w in _well_list:
+            if self.wells[w].cashflow is None:
+                continue
+            _cases = cases[w] if isinstance(cases,dict) else cases
+            _cases = [i for i in input_to_list(_cases if _cases is not None else list(self.wells[w].cashflow.keys())) if i in self.wells[w].cashflow.keys()]
+            if len(_cases) == 0:
+                continue
+            spreadsheet, _ = self.wells[w].get_fcf(
+                cases=_cases,
+                income=income, 
+                opex=opex,
+                capex=capex, 
+                prate=[],
+                pyr=pyr
+            )
+            for case, fcf in spreadsheet.groupby('case', sort=False):
+                fcf_list.append(fcf['free_cash_flow'])
+                index.append((w, case))
+
+        prate = np.atleast_1d(prate)
+        npv = npv_matrix(fcf_list, prate=prate, pyr=pyr)
+        return pd.DataFrame(
+            npv, 
+            index=pd.MultiIndex.from_tuples(index, names=['well','case']), 
+            columns=prate
+        )
+
     def save(self,file):
         with open(file, 'wb') as f:
             pickle.dump(self, f)